@@ -4,6 +4,7 @@ from rest_framework import serializers
 
 from bookings.models import Schedule
 from bookings.serializers import ScheduleSerializer
+from buses.layout import layout_for_bus
 from buses.models import Bus, Operator
 
 from .models import AdminAuditLog
@@ -72,10 +73,7 @@ class AdminBusPreviewSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_seat_map(self, obj):
-        try:
-            return json.loads(obj.seat_map_json or "{}")
-        except Exception:
-            return {}
+        return layout_for_bus(obj).data
 
     def get_features(self, obj):
         try:
@@ -183,10 +181,7 @@ class AdminOperatorSerializer(serializers.ModelSerializer):
         if qs is None:
             return out
         for b in qs.all().order_by("registration_no"):
-            try:
-                sm = json.loads(b.seat_map_json or "{}")
-            except Exception:
-                sm = {}
+            sm = layout_for_bus(b).data
             try:
                 feats = json.loads(b.features_json or "[]")
             except Exception:
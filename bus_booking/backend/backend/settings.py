@@ -39,6 +39,25 @@ RAZORPAY_VERIFY_WEBHOOK = os.getenv('RAZORPAY_VERIFY_WEBHOOK', 'true').lower() =
 
 REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
 SEAT_HOLD_TTL_SECONDS = 10 * 60
+# Unpaid PENDING bookings hold their seats this long before `expire_holds` marks them EXPIRED
+BOOKING_PAYMENT_TTL_SECONDS = int(os.getenv('BOOKING_PAYMENT_TTL_SECONDS', str(30 * 60)))
+# Safety-net TTL for cached per-schedule seat-occupancy bitmaps (bookings/occupancy.py)
+SEAT_OCCUPANCY_CACHE_SECONDS = int(os.getenv('SEAT_OCCUPANCY_CACHE_SECONDS', '300'))
+# Rendered seat-map payloads, keyed by per-schedule inventory version (bookings/seat_map.py)
+SEAT_MAP_CACHE_SECONDS = int(os.getenv('SEAT_MAP_CACHE_SECONDS', '600'))
+SEAT_LAYOUT_CACHE_SECONDS = int(os.getenv('SEAT_LAYOUT_CACHE_SECONDS', str(24 * 60 * 60)))
+# Dynamic seat-price ladders, keyed by per-schedule inventory version (bookings/dynamic_pricing.py)
+PRICE_LADDER_CACHE_SECONDS = int(os.getenv('PRICE_LADDER_CACHE_SECONDS', '600'))
+# Idempotency-Key replay window for create-payment / reserve (common/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+# Look-back window for the nightly autocomplete popularity rollup (bookings/popularity.py)
+POPULARITY_WINDOW_DAYS = int(os.getenv('POPULARITY_WINDOW_DAYS', '90'))
+# Searches counted in the cache per route per day before they are written to RouteSearchDay
+POPULARITY_SEARCH_FLUSH_EVERY = int(os.getenv('POPULARITY_SEARCH_FLUSH_EVERY', '100'))
+# Connecting-journey search (bookings/journeys.py): feasible layover window and result cache
+JOURNEY_MIN_LAYOVER_MINUTES = int(os.getenv('JOURNEY_MIN_LAYOVER_MINUTES', '30'))
+JOURNEY_MAX_LAYOVER_MINUTES = int(os.getenv('JOURNEY_MAX_LAYOVER_MINUTES', str(6 * 60)))
+JOURNEY_CACHE_SECONDS = int(os.getenv('JOURNEY_CACHE_SECONDS', '300'))
 
 # OTP / SMS (optional). Set SMS_PROVIDER=twilio or msg91 and add keys to send real SMS.
 SMS_PROVIDER = os.getenv('SMS_PROVIDER', '')  # '', 'twilio', 'msg91'
@@ -242,10 +261,22 @@ AUTH_USER_MODEL = 'users.User'
 AUTHENTICATION_BACKENDS = [
     'users.backends.CaseInsensitiveBackend',
     'django.contrib.auth.backends.ModelBackend',
-]# Cache for OTP storage (use Redis in production for multi-worker)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'OPTIONS': {'MAX_ENTRIES': 10000},
+]# Cache for OTP storage, seat-map inventory versions / payloads, occupancy, price ladders,
+# Idempotency-Key replays and index versions. It must be shared by every process (web
+# workers, expire_holds, rollup_popularity), so setting REDIS_URL switches it to Redis.
+# Without REDIS_URL each process keeps its own in-memory cache: single-process dev only.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ego',
+        }
     }
-}
\ No newline at end of file
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
\ No newline at end of file
@@ -5,9 +5,13 @@ from .models import (
     DroppingPoint,
     Reservation,
     Booking,
+    BookingSeat,
     Payment,
     BusRating,
     OperatorSale,
+    FareRule,
+    Promo,
+    PromoRedemption,
 )
 
 
@@ -30,6 +34,66 @@ class OperatorSaleAdmin(admin.ModelAdmin):
     ordering = ("-confirmed_at", "-id")
 
 
+@admin.register(FareRule)
+class FareRuleAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "operator",
+        "offer_style",
+        "seat_type",
+        "min_load_pct",
+        "max_load_pct",
+        "min_hours_before",
+        "max_hours_before",
+        "adjust_pct",
+        "active",
+    )
+    list_filter = ("active", "seat_type", "offer_style", "operator")
+    search_fields = ("name",)
+    raw_id_fields = ("operator",)
+
+
+@admin.register(Promo)
+class PromoAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "code",
+        "title",
+        "funded_by",
+        "operator",
+        "route",
+        "seat_type",
+        "valid_from",
+        "valid_until",
+        "discount_pct",
+        "discount_flat",
+        "uses",
+        "max_uses",
+        "active",
+    )
+    list_filter = ("active", "funded_by", "seat_type", "operator")
+    search_fields = ("code", "title")
+    raw_id_fields = ("operator", "route")
+    readonly_fields = ("uses",)
+
+
+@admin.register(PromoRedemption)
+class PromoRedemptionAdmin(admin.ModelAdmin):
+    list_display = ("id", "promo", "booking_id", "user", "discount", "funded_by", "status")
+    list_filter = ("status", "funded_by")
+    search_fields = ("booking__id", "promo__code")
+    raw_id_fields = ("booking", "promo", "user")
+
+
+@admin.register(BookingSeat)
+class BookingSeatAdmin(admin.ModelAdmin):
+    list_display = ("id", "schedule", "seat_no", "booking_id", "gender", "status")
+    list_filter = ("status",)
+    search_fields = ("booking__id", "seat_no")
+    raw_id_fields = ("booking", "schedule")
+
+
 admin.site.register(Schedule)
 admin.site.register(BoardingPoint)
 admin.site.register(DroppingPoint)
@@ -6,5 +6,5 @@ class BookingsConfig(AppConfig):
     name = "bookings"
 
     def ready(self):
-        # Register signal handlers (OperatorSale sync).
-        from . import signals  # noqa: F401
+        # Register signal handlers (OperatorSale sync) and deploy checks (shared cache).
+        from . import checks, signals  # noqa: F401
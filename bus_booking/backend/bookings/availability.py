@@ -0,0 +1,233 @@
+"""
+Denormalized availability on Schedule: seats_total, seats_available, min_fare, max_fare.
+
+Search listings filter and sort on these columns instead of computing occupancy per
+schedule. `refresh_availability()` recomputes them under the schedule row lock, so two
+recounts of one schedule cannot interleave. Paths that change occupancy (via
+`occupancy.invalidate_occupancy`) and bus layout edits use `refresh_availability_on_commit()`:
+the recount runs after the writer's transaction commits, once per schedule however many
+changes it made (one shared on-commit callback per transaction), so holds and bookings
+never wait on the row lock. Schedule saves refresh inline.
+
+min_fare / max_fare are the current dynamic prices; `fares_valid_until` stores when they
+stop being current (the price ladder's next step). FareRule edits mark the affected
+schedules due at once, and the expiry sweeper recounts due schedules
+(`refresh_due_fares()`), so the stored range follows what the seat map charges.
+`reconcile_availability()` (management command `reconcile_availability`) re-derives every
+upcoming schedule as a safety net.
+"""
+from __future__ import annotations
+
+import logging
+import weakref
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from buses.layout import layout_for_bus
+from common.dates import local_day_range
+
+from .lock import lock_schedule_row
+from .models import LIVE_BOOKING_STATUSES, BookingSeat, Reservation, Schedule
+from .dynamic_pricing import build_price_ladder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+MAX_BATCH_SCHEDULES = 100
+MAX_FARE_CALENDAR_DAYS = 62
+CENTS = Decimal("0.01")
+# Schedule columns maintained here, in the order compute_availability() returns them.
+AVAILABILITY_FIELDS = (
+    "seats_total", "seats_available", "min_fare", "max_fare", "fares_valid_until",
+)
+
+
+def occupied_seat_labels(schedule_id: int, now=None) -> set[str]:
+    """Seats held by an active reservation or a live booking (one query)."""
+    now = now or timezone.now()
+    held = Reservation.objects.filter(
+        schedule_id=schedule_id, status="PENDING", expires_at__gt=now
+    ).values_list("seat_no", flat=True)
+    booked = BookingSeat.objects.filter(
+        schedule_id=schedule_id, status__in=LIVE_BOOKING_STATUSES
+    ).values_list("seat_no", flat=True)
+    return set(held.union(booked))
+
+
+def compute_availability(schedule, occupied: set[str]) -> tuple:
+    """
+    AVAILABILITY_FIELDS values for a schedule with its bus loaded. The fares are the
+    current dynamic price range, evaluated uncached so it sees this transaction's writes;
+    fares_valid_until is when the ladder's next price step begins (None = no step ahead).
+    """
+    layout = layout_for_bus(schedule.bus)
+    total = len(layout.bookable)
+    taken = sum(1 for lb in occupied if lb in layout.bookable_index)
+    ladder = build_price_ladder(schedule)
+    min_fare, max_fare = ladder.price_range(layout.bookable)
+    until = ladder.valid_until()
+    valid_until = datetime.fromtimestamp(until, tz=dt_timezone.utc) if until is not None else None
+    return total, max(total - taken, 0), min_fare, max_fare, valid_until
+
+
+def refresh_availability(schedule_id: int) -> tuple | None:
+    """Recompute and store one schedule's AVAILABILITY_FIELDS; returns the new values."""
+    with transaction.atomic():
+        lock_schedule_row(schedule_id)
+        schedule = Schedule.objects.select_related("bus").filter(pk=schedule_id).first()
+        if schedule is None:
+            return None
+        values = compute_availability(schedule, occupied_seat_labels(schedule_id))
+        if tuple(getattr(schedule, f) for f in AVAILABILITY_FIELDS) != values:
+            Schedule.objects.filter(pk=schedule_id).update(**dict(zip(AVAILABILITY_FIELDS, values)))
+        return values
+
+
+def refresh_availability_on_commit(schedule_id: int) -> None:
+    """
+    Recount one schedule once the current transaction commits (immediately outside one).
+    All schedules queued in one transaction share a single on-commit callback, so each is
+    recounted once. The connection only keeps a weak reference to that callback: when the
+    transaction rolls back Django drops it, and the next transaction starts a fresh queue.
+    """
+    connection = transaction.get_connection()
+    ref = getattr(connection, "_availability_recount", None)
+    recount = ref() if ref is not None else None
+    if recount is not None:
+        recount.schedule_ids.add(schedule_id)
+        return
+
+    schedule_ids = {schedule_id}
+
+    def recount():
+        connection._availability_recount = None
+        for pk in sorted(schedule_ids):
+            try:
+                refresh_availability(pk)
+            except Exception:
+                # Logged, not raised at the committed writer; reconcile fixes drift.
+                logger.exception("Availability recount failed for schedule %s", pk)
+
+    recount.schedule_ids = schedule_ids
+    connection._availability_recount = weakref.ref(recount)
+    transaction.on_commit(recount)
+
+
+def reconcile_availability(
+    batch_size: int = DEFAULT_BATCH_SIZE, include_past: bool = False
+) -> dict:
+    """
+    Re-derive availability for every schedule departing from yesterday on (or all with
+    include_past) and fix rows that drifted. Returns counts for logging.
+    """
+    qs = Schedule.objects.order_by("pk")
+    if not include_past:
+        qs = qs.filter(departure_dt__gte=timezone.now() - timedelta(days=1))
+    checked = fixed = 0
+    last_pk = 0
+    while True:
+        ids = list(qs.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        for pk in ids:
+            before = Schedule.objects.filter(pk=pk).values_list(*AVAILABILITY_FIELDS).first()
+            after = refresh_availability(pk)
+            checked += 1
+            if after is not None and before != after:
+                fixed += 1
+        last_pk = ids[-1]
+        if len(ids) < batch_size:
+            break
+    result = {"checked": checked, "fixed": fixed}
+    logger.info("reconcile_availability: %s", result)
+    return result
+
+
+def refresh_due_fares(now=None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Recount upcoming schedules whose stored fares are stale (a price step began or a fare
+    rule changed). Each recount stores the next step, so a schedule is due once per step.
+    Returns the number recounted.
+    """
+    now = now or timezone.now()
+    qs = Schedule.objects.filter(fares_valid_until__lte=now, departure_dt__gt=now).order_by("pk")
+    total = 0
+    last_pk = 0
+    while True:
+        ids = list(qs.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        for pk in ids:
+            refresh_availability(pk)
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+        last_pk = ids[-1]
+    return total
+
+
+def batch_availability(schedule_ids) -> list[dict]:
+    """
+    Availability for many ACTIVE schedules in one query (search result cards), in the
+    order requested; unknown / inactive ids are left out.
+    """
+    rows = Schedule.objects.filter(pk__in=schedule_ids, status="ACTIVE").values(
+        "id", "seats_total", "seats_available", "min_fare", "max_fare"
+    )
+    by_id = {r["id"]: r for r in rows}
+    out = []
+    for pk in schedule_ids:
+        r = by_id.get(pk)
+        if r is None:
+            continue
+        out.append({
+            "schedule_id": pk,
+            "seats_total": r["seats_total"],
+            "seats_available": r["seats_available"],
+            "min_fare": str(r["min_fare"]) if r["min_fare"] is not None else None,
+            "max_fare": str(r["max_fare"]) if r["max_fare"] is not None else None,
+        })
+    return out
+
+
+def fare_calendar(route_id: int, start, days: int) -> list[dict]:
+    """
+    Per local day from `start` for `days` days: bookable ACTIVE trips on the route, cheapest
+    seat among trips with seats left, and total seats left. One grouped query over the
+    denormalized columns (index seek on status + route + departure_dt); days without trips
+    are included with zero trips.
+    """
+    end = start + timedelta(days=days - 1)
+    rows = (
+        Schedule.objects.filter(
+            status="ACTIVE",
+            route_id=route_id,
+            departure_dt__gt=timezone.now(),
+            **local_day_range("departure_dt", start, end),
+        )
+        .annotate(day=TruncDate("departure_dt", tzinfo=timezone.get_current_timezone()))
+        .values("day")
+        .annotate(
+            trips=Count("id"),
+            min_fare=Min("min_fare", filter=Q(seats_available__gt=0)),
+            seats_available=Sum("seats_available"),
+        )
+        .order_by()
+    )
+    by_day = {r["day"]: r for r in rows}
+    out = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        r = by_day.get(d) or {}
+        min_fare = r.get("min_fare")
+        out.append({
+            "date": d.isoformat(),
+            "trips": r.get("trips", 0),
+            # Aggregates come back unscaled on some backends; match Schedule.min_fare.
+            "min_fare": str(Decimal(min_fare).quantize(CENTS)) if min_fare is not None else None,
+            "seats_available": r.get("seats_available") or 0,
+        })
+    return out
@@ -0,0 +1,156 @@
+"""
+Booking state machine: seat hold -> checkout -> confirmation, expiry or cancellation.
+
+    Reservation (hold)  PENDING -> CONFIRMED | EXPIRED | CANCELLED
+    Booking             PENDING -> CONFIRMED | EXPIRED | CANCELLED | REFUNDED
+                        EXPIRED -> CONFIRMED (paid late, seats still free) | REFUNDED
+                        CONFIRMED -> CANCELLED | REFUNDED
+                        CANCELLED -> REFUNDED (paid after a newer checkout replaced it)
+
+Checkout links the passenger's live holds to the new booking (Reservation.booking), so
+later transitions find them by booking id instead of re-matching (schedule, seats, user).
+
+A transition is one transaction. The booking moves with a single conditional UPDATE by id
+(`status = <status the caller saw>`); that UPDATE holds the booking row lock until commit,
+so two transitions of one booking serialize and the second changes nothing (returns False).
+In the same transaction the new status is mirrored onto the BookingSeat rows (the live-seat
+constraint refuses to confirm seats that were taken again), the linked live holds, the
+promo redemption and the OperatorSale, and the schedule's occupancy is invalidated.
+"""
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, BookingSeat, OperatorSale, Reservation
+from .occupancy import invalidate_occupancy
+from .promos import platform_discount, settle_promo_redemptions
+
+# Target status -> statuses a booking may move to it from.
+BOOKING_TRANSITIONS = {
+    "CONFIRMED": ("PENDING", "EXPIRED"),
+    "EXPIRED": ("PENDING",),
+    "CANCELLED": ("PENDING", "CONFIRMED"),
+    "REFUNDED": ("PENDING", "CONFIRMED", "EXPIRED", "CANCELLED"),
+}
+# What a linked PENDING / CONFIRMED hold becomes when its booking moves.
+HOLD_STATUS_FOR = {
+    "CONFIRMED": "CONFIRMED",
+    "EXPIRED": "EXPIRED",
+    "CANCELLED": "CANCELLED",
+    "REFUNDED": "CANCELLED",
+}
+
+
+class InvalidTransition(ValueError):
+    """The booking's status does not allow the requested transition."""
+
+
+def link_holds(booking: Booking, seats) -> int:
+    """Attach the passenger's live, unlinked holds on these seats to a new booking."""
+    return Reservation.objects.filter(
+        schedule_id=booking.schedule_id,
+        seat_no__in=[str(s) for s in seats],
+        reserved_by_id=booking.user_id,
+        status="PENDING",
+        expires_at__gt=timezone.now(),
+        booking__isnull=True,
+    ).update(booking=booking)
+
+
+def sync_operator_sale(booking: Booking) -> None:
+    """Keep OperatorSale in line with a confirmed / refunded / cancelled booking."""
+    if booking.status == "CONFIRMED":
+        try:
+            seats = json.loads(booking.seats or "[]")
+        except Exception:
+            seats = []
+        n = len(seats) if seats else 1
+        op_id = booking.schedule.bus.operator_id
+        # Platform-funded promo discounts are still the operator's revenue.
+        gross = Decimal(str(booking.amount)) + platform_discount(booking)
+        sale, created = OperatorSale.objects.get_or_create(
+            booking=booking,
+            defaults={
+                "operator_id": op_id,
+                "schedule_id": booking.schedule_id,
+                "gross_amount": gross,
+                "seat_count": max(1, n),
+                "currency": "INR",
+                "confirmed_at": timezone.now(),
+                "reversal_status": "",
+            },
+        )
+        if not created:
+            OperatorSale.objects.filter(pk=sale.pk).update(
+                operator_id=op_id,
+                schedule_id=booking.schedule_id,
+                gross_amount=gross,
+                seat_count=max(1, n),
+                reversal_status="",
+            )
+    elif booking.status in ("REFUNDED", "CANCELLED"):
+        OperatorSale.objects.filter(booking=booking).update(reversal_status=booking.status)
+
+
+def _follow(booking_ids, to: str, keep_holds: bool = False) -> None:
+    """Mirror a booking status change onto seats, holds and promo redemptions."""
+    BookingSeat.objects.filter(booking_id__in=booking_ids).update(status=to)
+    holds = Reservation.objects.filter(booking_id__in=booking_ids)
+    if keep_holds:
+        holds.filter(status="PENDING").update(booking=None)
+    else:
+        holds.filter(status__in=("PENDING", "CONFIRMED")).exclude(
+            status=HOLD_STATUS_FOR[to]
+        ).update(status=HOLD_STATUS_FOR[to])
+    settle_promo_redemptions(booking_ids, to)
+
+
+def transition(booking: Booking, to: str, *, keep_holds: bool = False, **fields) -> bool:
+    """
+    Move `booking` from its loaded status to `to`, setting `fields` in the same UPDATE.
+    Returns False (nothing changed) if the booking was moved by someone else meanwhile;
+    raises InvalidTransition for a move the state machine does not allow. The instance
+    is updated on success. `keep_holds` unlinks the booking's PENDING holds instead of
+    ending them, so a replacement checkout can take them over. The BookingSeat update
+    raises IntegrityError (and everything rolls back) when confirming seats that are
+    live on another booking.
+    """
+    source = booking.status
+    if source not in BOOKING_TRANSITIONS.get(to, ()):
+        raise InvalidTransition(f"Booking is already {source.lower()}.")
+    with transaction.atomic():
+        if not Booking.objects.filter(pk=booking.pk, status=source).update(status=to, **fields):
+            return False
+        _follow([booking.pk], to, keep_holds)
+        booking.status = to
+        for name, value in fields.items():
+            setattr(booking, name, value)
+        sync_operator_sale(booking)
+        invalidate_occupancy(booking.schedule_id)
+    return True
+
+
+def confirm_booking(booking: Booking, payment_id: str = "") -> bool:
+    """PENDING / EXPIRED -> CONFIRMED after a successful payment."""
+    return transition(booking, "CONFIRMED", payment_id=payment_id)
+
+
+def expire_bookings(booking_ids) -> list[int]:
+    """
+    PENDING -> EXPIRED for many unpaid bookings at once (the sweeper's batches).
+    Returns the ids actually expired; others had already moved on.
+    """
+    with transaction.atomic():
+        ids = list(
+            Booking.objects.select_for_update()
+            .filter(pk__in=list(booking_ids), status__in=BOOKING_TRANSITIONS["EXPIRED"])
+            .values_list("id", flat=True)
+        )
+        if ids:
+            Booking.objects.filter(pk__in=ids).update(status="EXPIRED")
+            _follow(ids, "EXPIRED")
+    return ids
@@ -90,17 +90,13 @@ def cancellation_allowed(booking: "Booking", by: str = "passenger") -> tuple[boo
 # ─── seat release ─────────────────────────────────────────────────────────────
 
 def release_seats(booking: "Booking") -> None:
-    """Mark reservations for cancelled booking's seats as CANCELLED."""
+    """Drop the passenger's Redis holds on a cancelled booking's seats (its DB holds follow the booking)."""
     try:
         seats = json.loads(booking.seats or "[]")
         if not seats:
             return
-        from .models import Reservation
-        Reservation.objects.filter(
-            schedule=booking.schedule,
-            seat_no__in=seats,
-            reserved_by=booking.user,
-        ).update(status="CANCELLED")
+        from .lock import release_seats as release_redis_holds
+        release_redis_holds(booking.schedule_id, seats, booking.user_id)
     except Exception as e:
         logger.error("release_seats failed for booking %s: %s", booking.id, e)
 
@@ -156,12 +152,12 @@ def cancel_booking(
     Cancel a booking end-to-end:
       1. Validate
       2. Calculate refund
-      3. Initiate Razorpay refund
-      4. Release seats
-      5. Update booking status
-      6. Update OperatorSale
+      3. Move the booking to CANCELLED / REFUNDED (booking_state.transition: seats, holds,
+         promo and OperatorSale follow in the same transaction)
+      4. Initiate Razorpay refund
+      5. Release Redis holds
     Returns a summary dict.
-    Raises ValueError on validation failure.
+    Raises ValueError on validation failure, or if the booking was cancelled concurrently.
     """
     allowed, msg = cancellation_allowed(booking, by=by)
     if not allowed:
@@ -174,26 +170,27 @@ def cancel_booking(
     else:
         refund_amount, tier = calculate_refund_amount(booking)
 
+    # The transition comes first: of two concurrent cancellations only one gets here and refunds.
+    from .booking_state import transition
+    new_status = "REFUNDED" if refund_amount > 0 else "CANCELLED"
+    moved = transition(
+        booking,
+        new_status,
+        cancelled_at=timezone.now(),
+        cancelled_by=by,
+        cancellation_reason=reason or "",
+        refund_amount=refund_amount,
+    )
+    if not moved:
+        raise ValueError("Booking was already cancelled.")
+
     refund_id = initiate_razorpay_refund(booking, refund_amount)
+    if refund_id:
+        from .models import Booking
+        Booking.objects.filter(pk=booking.pk).update(refund_id=refund_id)
+        booking.refund_id = refund_id
     release_seats(booking)
 
-    now = timezone.now()
-    new_status = "REFUNDED" if refund_amount > 0 else "CANCELLED"
-    booking.status = new_status
-    booking.cancelled_at = now
-    booking.cancelled_by = by
-    booking.cancellation_reason = reason or ""
-    booking.refund_amount = refund_amount
-    booking.refund_id = refund_id or ""
-    booking.save()
-
-    # Sync OperatorSale
-    try:
-        from .models import OperatorSale
-        OperatorSale.objects.filter(booking=booking).update(reversal_status=new_status)
-    except Exception as e:
-        logger.error("OperatorSale sync failed after cancel for booking %s: %s", booking.id, e)
-
     return {
         "booking_id": booking.id,
         "status": new_status,
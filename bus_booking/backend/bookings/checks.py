@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Seat-map versions and hold state live in the cache; it must be shared across processes."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache") or backend.endswith("DummyCache"):
+        return [
+            Warning(
+                "The default cache is per-process, so seat-map ETags, occupancy and "
+                "Idempotency-Key replays are not shared between workers and expire_holds.",
+                hint="Set REDIS_URL to use the shared Redis cache.",
+                id="bookings.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,228 @@
+"""
+Occupancy-driven dynamic pricing.
+
+FareRule rows adjust seat prices by load factor (share of bookable seats sold), hours to
+departure and seat type, optionally scoped to one operator and one offer style. For one
+schedule at one inventory version the load factor is fixed, so prices can only change when
+the departure crosses an hours bound of some rule. The matching rules are therefore
+evaluated once into a PriceLadder: the instants at which prices change and, per step, the
+label -> price map for every seat. Each map is built in one pass over the layout with one
+precomputed factor per seat type (the FareTable base prices are reused, not re-parsed).
+
+Ladders are cached per schedule against the inventory version (bookings/inventory.py), so a
+hold, booking, fare or rule change rebuilds on the next read. The seat map and
+CreatePaymentView read the same ladder and pick the step for the current time, so they
+quote identical prices. Holds do not count as sold: a passenger's own hold cannot move the
+price they are about to pay.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from buses.layout import layout_for_bus
+
+from .inventory import get_inventory_version, inventory_version_key
+from .models import LIVE_BOOKING_STATUSES, BookingSeat, FareRule
+from .pricing import CENTS, fare_table
+
+PRICE_LADDER_CACHE_PREFIX = "priceladder:v1:"
+PRICE_LADDER_CACHE_TTL = getattr(settings, "PRICE_LADDER_CACHE_SECONDS", 10 * 60)
+# Bounds on the summed adjustment of all rules matching one seat, in percent.
+MIN_ADJUST_PCT = Decimal("-90")
+MAX_ADJUST_PCT = Decimal("300")
+
+_RULE_FIELDS = (
+    "seat_type", "min_load_pct", "max_load_pct", "min_hours_before", "max_hours_before",
+    "adjust_pct",
+)
+
+
+def price_ladder_cache_key(schedule_id: int) -> str:
+    return f"{PRICE_LADDER_CACHE_PREFIX}{schedule_id}"
+
+
+class PriceLadder:
+    """
+    Seat prices for one schedule state. Step i starts at boundaries[i - 1] (epoch seconds;
+    step 0 is "now") and prices seats with seat_maps[i], or extra_maps[i] / fallbacks[i] for
+    labels that are not seats in the layout.
+    """
+
+    __slots__ = ("boundaries", "seat_maps", "extra_maps", "fallbacks")
+
+    def __init__(self, boundaries, seat_maps, extra_maps, fallbacks):
+        self.boundaries = boundaries
+        self.seat_maps = seat_maps
+        self.extra_maps = extra_maps
+        self.fallbacks = fallbacks
+
+    def to_cache(self) -> tuple:
+        return (self.boundaries, self.seat_maps, self.extra_maps, self.fallbacks)
+
+    def _step(self, now=None) -> int:
+        return bisect_right(self.boundaries, (now or timezone.now()).timestamp())
+
+    def _lookup(self, i: int, seat_label) -> Decimal:
+        label = str(seat_label or "").strip()
+        price = self.seat_maps[i].get(label) or self.extra_maps[i].get(label)
+        return Decimal(price or self.fallbacks[i])
+
+    def valid_until(self, now=None) -> float | None:
+        """Epoch seconds at which the current prices change (None = not before a rebuild)."""
+        i = self._step(now)
+        return self.boundaries[i] if i < len(self.boundaries) else None
+
+    def seat_prices(self, now=None) -> dict[str, str]:
+        """Bookable label -> price string (the seat map's `seat_fares`). Read-only."""
+        return self.seat_maps[self._step(now)]
+
+    def price(self, seat_label, now=None) -> Decimal:
+        return self._lookup(self._step(now), seat_label)
+
+    def total(self, seat_labels, now=None) -> Decimal:
+        i = self._step(now)
+        return sum((self._lookup(i, s) for s in seat_labels), Decimal("0.00")).quantize(CENTS)
+
+    def price_range(self, seat_labels, now=None) -> tuple[Decimal | None, Decimal | None]:
+        i = self._step(now)
+        prices = [
+            self._lookup(i, lb) for lb in seat_labels if lb is not None and str(lb).strip()
+        ]
+        if not prices:
+            return None, None
+        return min(prices), max(prices)
+
+
+def schedule_rules(schedule) -> list:
+    """Active rules for the schedule's operator and offer style (one query)."""
+    return list(
+        FareRule.objects.filter(active=True)
+        .filter(Q(operator__isnull=True) | Q(operator_id=schedule.bus.operator_id))
+        .filter(offer_style__in=("", schedule.operator_offer_style or ""))
+        .values_list(*_RULE_FIELDS, named=True)
+    )
+
+
+def sold_seat_count(schedule, layout) -> int:
+    """Layout seats on live (PENDING / CONFIRMED) bookings; holds are not counted."""
+    return sum(
+        1
+        for seat_no in BookingSeat.objects.filter(
+            schedule_id=schedule.pk, status__in=LIVE_BOOKING_STATUSES
+        ).values_list("seat_no", flat=True)
+        if seat_no in layout.bookable_index
+    )
+
+
+def _within(value, low, high) -> bool:
+    return (low is None or value >= low) and (high is None or value < high)
+
+
+def _apply(price: Decimal, pct: Decimal) -> str:
+    if not pct:
+        return str(price)
+    return str((price * (100 + pct) / 100).quantize(CENTS, rounding=ROUND_HALF_UP))
+
+
+def build_price_ladder(schedule, now=None) -> PriceLadder:
+    """
+    Evaluate the schedule's rules at its current load factor, without the cache (so it
+    sees the caller's uncommitted writes). `schedule.bus` is loaded if needed.
+    """
+    now = now or timezone.now()
+    table = fare_table(schedule)
+    layout = layout_for_bus(schedule.bus)
+    # (label, seat type, base price) once per bookable label, first occurrence winning.
+    seats = []
+    seen = set()
+    for i, lb in enumerate(layout.labels):
+        label = (lb or "").strip()
+        seat_type = layout.types[i] if i < len(layout.types) else None
+        if not label or seat_type in ("aisle", "blank") or label in seen:
+            continue
+        seen.add(label)
+        seats.append((label, seat_type or "", table.price(label)))
+    # Overrides for labels that are not seats of this layout keep pricing as before.
+    extras = [(lb, price) for lb, price in table.overrides.items() if lb not in seen]
+
+    rules = schedule_rules(schedule)
+    if rules:
+        total = len(layout.bookable)
+        load = 100 * sold_seat_count(schedule, layout) / total if total else 0
+        rules = [r for r in rules if _within(load, r.min_load_pct, r.max_load_pct)]
+    if not rules:
+        return PriceLadder(
+            (),
+            ({label: str(price) for label, _, price in seats},),
+            ({lb: str(price) for lb, price in extras},),
+            (str(table.base),),
+        )
+
+    departure = schedule.departure_dt
+    bounds = set()
+    for r in rules:
+        for hours in (r.min_hours_before, r.max_hours_before):
+            if hours is not None:
+                at = departure - timedelta(hours=hours)
+                if at > now:
+                    bounds.add(at.timestamp())
+    boundaries = tuple(sorted(bounds))
+    seat_types = {seat_type for _, seat_type, _ in seats} | {""}
+
+    seat_maps, extra_maps, fallbacks = [], [], []
+    by_pcts = {}
+    for start in (now.timestamp(),) + boundaries:
+        hours_left = (departure.timestamp() - start) / 3600
+        # "More than min and at most max hours away", so each step is exact from its start.
+        live = [
+            r for r in rules
+            if (r.min_hours_before is None or hours_left > r.min_hours_before)
+            and (r.max_hours_before is None or hours_left <= r.max_hours_before)
+        ]
+        pcts = tuple(
+            (t, min(max(
+                sum((r.adjust_pct for r in live if r.seat_type in ("", t)), Decimal("0")),
+                MIN_ADJUST_PCT,
+            ), MAX_ADJUST_PCT))
+            for t in sorted(seat_types)
+        )
+        step = by_pcts.get(pcts)
+        if step is None:
+            pct_of = dict(pcts)
+            generic = pct_of[""]
+            step = (
+                {label: _apply(price, pct_of[t]) for label, t, price in seats},
+                {lb: _apply(price, generic) for lb, price in extras},
+                _apply(table.base, generic),
+            )
+            by_pcts[pcts] = step
+        seat_maps.append(step[0])
+        extra_maps.append(step[1])
+        fallbacks.append(step[2])
+    return PriceLadder(boundaries, tuple(seat_maps), tuple(extra_maps), tuple(fallbacks))
+
+
+def price_ladder(schedule) -> PriceLadder:
+    """Ladder for the schedule's current inventory version (built and cached on a miss)."""
+    vkey, pkey = inventory_version_key(schedule.pk), price_ladder_cache_key(schedule.pk)
+    try:
+        got = cache.get_many([vkey, pkey])
+    except Exception:
+        got = {}
+    version = get_inventory_version(schedule.pk, got.get(vkey))
+    entry = got.get(pkey)
+    if entry is not None and entry[0] == version:
+        return PriceLadder(*entry[1])
+    ladder = build_price_ladder(schedule)
+    try:
+        cache.set(pkey, (version, ladder.to_cache()), PRICE_LADDER_CACHE_TTL)
+    except Exception:
+        pass
+    return ladder
@@ -0,0 +1,72 @@
+"""
+Per-schedule inventory version.
+
+A counter in the Django cache that changes whenever anything shown on a schedule's seat map
+changes: holds, bookings, fares / schedule fields, bus layout or route-pattern stops. Cached
+seat-map payloads and their ETags are keyed on it, so an unchanged poll is one cache lookup.
+
+Missing counters are (re)initialised from the wall clock in milliseconds, so a version that
+was evicted never comes back with a value a client may already hold.
+"""
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+INVENTORY_VERSION_PREFIX = "inv:v1:"
+INVENTORY_VERSION_TTL = getattr(settings, "INVENTORY_VERSION_TTL_SECONDS", 24 * 60 * 60)
+
+
+def inventory_version_key(schedule_id: int) -> str:
+    return f"{INVENTORY_VERSION_PREFIX}{schedule_id}"
+
+
+def _fresh_version() -> int:
+    return int(time.time() * 1000)
+
+
+def get_inventory_version(schedule_id: int, cached=None) -> int:
+    """Current version; `cached` is a value already fetched (e.g. via cache.get_many)."""
+    if cached is not None:
+        return int(cached)
+    key = inventory_version_key(schedule_id)
+    v = cache.get(key)
+    if v is None:
+        v = _fresh_version()
+        if not cache.add(key, v, INVENTORY_VERSION_TTL):
+            v = cache.get(key) or v
+    return int(v)
+
+
+def bump_inventory_version_now(schedule_id: int) -> None:
+    """Move to a new version immediately (outside a write transaction)."""
+    key = inventory_version_key(schedule_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), INVENTORY_VERSION_TTL)
+    except Exception:
+        pass
+
+
+def bump_inventory_version(schedule_id: int) -> None:
+    """Move the schedule to a new version once the current transaction commits."""
+    transaction.on_commit(lambda: bump_inventory_version_now(schedule_id))
+
+
+def reset_inventory_versions(schedule_ids) -> None:
+    """Drop versions for many schedules at once (bus layout / route-pattern edits)."""
+    keys = [inventory_version_key(sid) for sid in schedule_ids]
+    if not keys:
+        return
+
+    def _drop():
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            pass
+
+    transaction.on_commit(_drop)
@@ -0,0 +1,199 @@
+"""
+Connecting journeys (one transfer) for city pairs without a convenient direct bus.
+
+The route graph comes from the in-process city index: Route rows are edges between canonical
+cities (`destinations_by_origin`). Transfer cities are those reachable from the origin whose
+own routes reach the destination. Transfers happen at Route endpoints, where schedules carry
+real arrival / departure times (RoutePatternStop has no per-stop timings).
+
+For a search date, two queries fetch the candidate first legs (departing that local day) and
+second legs (departing up to JOURNEY_MAX_LAYOVER_MINUTES after the day ends). Second legs are
+grouped per transfer city into departure-time-sorted arrays; each first leg finds its feasible
+onward departures with bisect over [arrival + min layover, arrival + max layover].
+
+Results are cached per (origin cities, destination cities, date) under a global schedule
+version that Schedule / Route saves bump (signals.py), with a short TTL as a backstop for
+seats and fares, which change without a Schedule save.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from common.city_index import get_city_index
+from common.dates import local_day_range
+from common.models import Route
+
+from .models import Schedule
+
+JOURNEY_CACHE_PREFIX = "journeys:v1:"
+JOURNEY_VERSION_KEY = "journeys:version"
+JOURNEY_CACHE_SECONDS = getattr(settings, "JOURNEY_CACHE_SECONDS", 300)
+MIN_LAYOVER = timedelta(minutes=getattr(settings, "JOURNEY_MIN_LAYOVER_MINUTES", 30))
+MAX_LAYOVER = timedelta(minutes=getattr(settings, "JOURNEY_MAX_LAYOVER_MINUTES", 6 * 60))
+MAX_CONNECTIONS = 20
+# Onward options kept per first leg, so one early bus cannot fill the whole result list.
+MAX_ONWARD_PER_LEG = 3
+
+_LEG_FIELDS = (
+    "id", "route_id", "route__origin_city_id", "route__destination_city_id",
+    "departure_dt", "arrival_dt", "min_fare", "seats_available",
+)
+
+
+def get_journey_version():
+    try:
+        return cache.get(JOURNEY_VERSION_KEY) or 0
+    except Exception:
+        return 0
+
+
+def invalidate_journeys() -> None:
+    """After commit, orphan every cached journey search (they key on this version)."""
+
+    def _bump():
+        try:
+            if not cache.add(JOURNEY_VERSION_KEY, 1, None):
+                cache.incr(JOURNEY_VERSION_KEY)
+        except Exception:
+            pass
+
+    transaction.on_commit(_bump)
+
+
+def _leg_payload(row, names) -> dict:
+    return {
+        "schedule_id": row["id"],
+        "route_id": row["route_id"],
+        "origin": names.get(row["route__origin_city_id"], ""),
+        "destination": names.get(row["route__destination_city_id"], ""),
+        "departure_dt": timezone.localtime(row["departure_dt"]).isoformat(),
+        "arrival_dt": timezone.localtime(row["arrival_dt"]).isoformat(),
+        "min_fare": str(row["min_fare"]) if row["min_fare"] is not None else None,
+        "seats_available": row["seats_available"],
+    }
+
+
+def plan_connections(origin_ids, destination_ids, day, names=None) -> list[dict]:
+    """
+    One-transfer journeys from any of `origin_ids` to any of `destination_ids` departing on
+    local `day`, earliest arrival first (then cheaper, then shorter).
+    """
+    index = get_city_index()
+    names = names if names is not None else index.names
+    origin_ids, destination_ids = set(origin_ids), set(destination_ids)
+    hubs = set()
+    for o in origin_ids:
+        for h in index.destinations_by_origin.get(o, ()):
+            if h in origin_ids or h in destination_ids:
+                continue
+            if index.destinations_by_origin.get(h, set()) & destination_ids:
+                hubs.add(h)
+    if not hubs:
+        return []
+
+    now = timezone.now()
+    bookable = Schedule.objects.filter(status="ACTIVE", seats_available__gt=0)
+    first_legs = list(
+        bookable.filter(
+            route_id__in=Route.objects.filter(
+                origin_city_id__in=origin_ids, destination_city_id__in=hubs
+            ).values("id"),
+            departure_dt__gt=now,
+            **local_day_range("departure_dt", day, day),
+        ).values(*_LEG_FIELDS)
+    )
+    if not first_legs:
+        return []
+    latest_arrival = max(r["arrival_dt"] for r in first_legs)
+    second_legs = bookable.filter(
+        route_id__in=Route.objects.filter(
+            origin_city_id__in=hubs, destination_city_id__in=destination_ids
+        ).values("id"),
+        departure_dt__gte=min(r["arrival_dt"] for r in first_legs) + MIN_LAYOVER,
+        departure_dt__lte=latest_arrival + MAX_LAYOVER,
+    ).values(*_LEG_FIELDS)
+
+    # Per transfer city: onward legs sorted by departure, plus the bare departure array.
+    onward = defaultdict(list)
+    for r in second_legs:
+        onward[r["route__origin_city_id"]].append(r)
+    departures = {}
+    for hub, rows in onward.items():
+        rows.sort(key=lambda r: r["departure_dt"])
+        departures[hub] = [r["departure_dt"] for r in rows]
+
+    found = []
+    for leg1 in first_legs:
+        hub = leg1["route__destination_city_id"]
+        deps = departures.get(hub)
+        if not deps:
+            continue
+        lo = bisect_left(deps, leg1["arrival_dt"] + MIN_LAYOVER)
+        hi = bisect_right(deps, leg1["arrival_dt"] + MAX_LAYOVER)
+        for leg2 in onward[hub][lo:min(hi, lo + MAX_ONWARD_PER_LEG)]:
+            fares = (leg1["min_fare"], leg2["min_fare"])
+            total = None if None in fares else fares[0] + fares[1]
+            found.append((leg2["arrival_dt"], total, leg1, leg2))
+
+    found.sort(key=lambda f: (
+        f[0], f[1] is None, f[1] or 0, f[0] - f[2]["departure_dt"], f[2]["id"], f[3]["id"]
+    ))
+    out = []
+    for arrival, total, leg1, leg2 in found[:MAX_CONNECTIONS]:
+        out.append({
+            "transfer_city": names.get(leg1["route__destination_city_id"], ""),
+            "departure_dt": timezone.localtime(leg1["departure_dt"]).isoformat(),
+            "arrival_dt": timezone.localtime(arrival).isoformat(),
+            "duration_minutes": int((arrival - leg1["departure_dt"]).total_seconds() // 60),
+            "layover_minutes": int(
+                (leg2["departure_dt"] - leg1["arrival_dt"]).total_seconds() // 60
+            ),
+            "min_fare": str(total) if total is not None else None,
+            "legs": [_leg_payload(leg1, names), _leg_payload(leg2, names)],
+        })
+    return out
+
+
+def search_journeys(origin_text, destination_text, day) -> dict:
+    """
+    Cached journey search: direct route ids for the pair (if any) and one-transfer
+    connections departing on `day`.
+    """
+    index = get_city_index()
+    origin_ids = index.city_ids(origin_text, pool=index.origins)
+    destination_ids = index.city_ids(destination_text, pool=index.destinations)
+    if not origin_ids or not destination_ids:
+        return {"direct_route_ids": [], "connections": []}
+    key = "%s%s:%s:%s:%s" % (
+        JOURNEY_CACHE_PREFIX,
+        get_journey_version(),
+        ",".join(map(str, sorted(origin_ids))),
+        ",".join(map(str, sorted(destination_ids))),
+        day.isoformat(),
+    )
+    try:
+        hit = cache.get(key)
+    except Exception:
+        hit = None
+    if hit is not None:
+        return hit
+    result = {
+        "direct_route_ids": list(
+            Route.objects.filter(
+                origin_city_id__in=origin_ids, destination_city_id__in=destination_ids
+            ).order_by("id").values_list("id", flat=True)
+        ),
+        "connections": plan_connections(origin_ids, destination_ids, day, index.names),
+    }
+    try:
+        cache.set(key, result, JOURNEY_CACHE_SECONDS)
+    except Exception:
+        pass
+    return result
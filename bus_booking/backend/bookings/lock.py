@@ -1,5 +1,3 @@
-import json
-import time
 from django.conf import settings
 
 try:
@@ -11,60 +9,100 @@ except Exception:
     _redis = None
     REDIS_OK = False
 
+# All-or-nothing hold. KEYS = seat keys, ARGV = [owner token, ttl ms].
+# Returns 0 when every seat is now held by the owner, else the 1-based index of the first seat
+# held by someone else (nothing is written in that case). Seats already held by the same
+# owner are re-held with a fresh TTL, so a retried reserve extends the hold rather than fails.
+_HOLD_LUA = """
+for i, k in ipairs(KEYS) do
+    local cur = redis.call('GET', k)
+    if cur and cur ~= ARGV[1] then
+        return i
+    end
+end
+for _, k in ipairs(KEYS) do
+    redis.call('SET', k, ARGV[1], 'PX', ARGV[2])
+end
+return 0
+"""
+
+# Delete only the seats whose value is the owner token. Returns the number released.
+_RELEASE_LUA = """
+local n = 0
+for _, k in ipairs(KEYS) do
+    if redis.call('GET', k) == ARGV[1] then
+        n = n + redis.call('DEL', k)
+    end
+end
+return n
+"""
+
+if REDIS_OK:
+    _hold_script = _redis.register_script(_HOLD_LUA)
+    _release_script = _redis.register_script(_RELEASE_LUA)
+
+
 def seat_key(schedule_id: int, seat_no: str) -> str:
     return f"res:{schedule_id}:{seat_no}"
 
+
+def hold_owner(user_id) -> str:
+    """Owner token stored as the value of each seat key."""
+    return f"user:{user_id}"
+
+
+def _keys(schedule_id: int, seats: list) -> tuple[list, list]:
+    uniq = list(dict.fromkeys(str(s) for s in seats))
+    return uniq, [seat_key(schedule_id, s) for s in uniq]
+
+
 def try_hold_seats(schedule_id: int, seats: list, user_id: int, ttl=None):
     """
     Atomically try to hold all seats. Returns (ok, failed_seat or None).
-    Uses SET NX with TTL. On any failure, releases acquired seats.
+    One server-side script checks and acquires every seat key; on conflict nothing is written.
+    (None, None) means Redis is unavailable and the caller should fall back to DB checks.
     """
     if not REDIS_OK:
         return (None, None)  # signal fallback
 
     ttl = ttl or settings.SEAT_HOLD_TTL_SECONDS
-    acquired = []
-    try:
-        pipe = _redis.pipeline()
-        now = int(time.time())
-        val = json.dumps({"user": user_id, "ts": now})
-        # try all
-        for s in seats:
-            k = seat_key(schedule_id, s)
-            # SET NX PX
-            # redis-py: set(name, value, nx=True, ex=seconds)
-            pipe.set(k, val, nx=True, ex=ttl)
-        results = pipe.execute()
-        for idx, ok in enumerate(results):
-            if ok:
-                acquired.append(seats[idx])
-            else:
-                # Failed on this seat
-                failed = seats[idx]
-                # release acquired
-                if acquired:
-                    p2 = _redis.pipeline()
-                    for s in acquired:
-                        p2.delete(seat_key(schedule_id, s))
-                    p2.execute()
-                return (False, failed)
+    uniq, keys = _keys(schedule_id, seats)
+    if not keys:
         return (True, None)
+    try:
+        failed_idx = int(_hold_script(keys=keys, args=[hold_owner(user_id), int(ttl * 1000)]))
     except Exception:
-        # On error, best-effort cleanup
-        if acquired:
-            p2 = _redis.pipeline()
-            for s in acquired:
-                p2.delete(seat_key(schedule_id, s))
-            p2.execute()
         return (None, None)
+    if failed_idx:
+        return (False, uniq[failed_idx - 1])
+    return (True, None)
+
 
-def release_seats(schedule_id: int, seats: list):
+def release_seats(schedule_id: int, seats: list, user_id: int) -> int:
+    """Release seats held by this user; other users' holds are left untouched. Returns count."""
     if not REDIS_OK:
-        return
+        return 0
+    _, keys = _keys(schedule_id, seats)
+    if not keys:
+        return 0
     try:
-        pipe = _redis.pipeline()
-        for s in seats:
-            pipe.delete(seat_key(schedule_id, s))
-        pipe.execute()
+        return int(_release_script(keys=keys, args=[hold_owner(user_id)]))
     except Exception:
-        pass
\ No newline at end of file
+        return 0
+
+
+def lock_schedule_row(schedule_id: int) -> None:
+    """
+    Serialize DB-fallback reservers for one schedule; call inside transaction.atomic().
+    Uses SELECT ... FOR UPDATE on the Schedule row. SQLite has no row locks, so a no-op
+    UPDATE takes the database write lock for the rest of the transaction instead.
+    """
+    from django.db import connection
+    from django.db.models import F
+
+    from .models import Schedule
+
+    if connection.vendor == "sqlite":
+        Schedule.objects.filter(pk=schedule_id).update(id=F("id"))
+    else:
+        list(Schedule.objects.select_for_update().filter(pk=schedule_id).values_list("id", flat=True))
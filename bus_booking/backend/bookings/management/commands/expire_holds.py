@@ -0,0 +1,52 @@
+"""
+Expire lapsed seat holds and unpaid PENDING bookings (see bookings/sweeper.py).
+
+Cron:    python manage.py expire_holds --purge-days 7
+Worker:  python manage.py expire_holds --interval 60
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.sweeper import DEFAULT_BATCH_SIZE, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark expired reservations / abandoned PENDING bookings as EXPIRED and release their "
+        "seats; recount schedules whose fares are due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows updated per transaction (default %d)." % DEFAULT_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            default=0,
+            help="Also delete EXPIRED/CANCELLED reservations older than this many days (0 = keep).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Run forever, sweeping every N seconds (0 = single pass).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        interval = options["interval"]
+        while True:
+            result = sweep(batch_size=batch_size, purge_days=options["purge_days"])
+            self.stdout.write(
+                "Expired %(reservations_expired)d reservation(s), %(bookings_expired)d booking(s); "
+                "purged %(reservations_purged)d old reservation(s); "
+                "refreshed fares of %(fares_refreshed)d schedule(s)." % result
+            )
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,34 @@
+"""
+Re-derive Schedule.seats_total / seats_available / min_fare / max_fare (see bookings/availability.py).
+
+Cron:  python manage.py reconcile_availability
+       python manage.py reconcile_availability --all   # include past departures
+"""
+from django.core.management.base import BaseCommand
+
+from bookings.availability import DEFAULT_BATCH_SIZE, reconcile_availability
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized seat availability / fare range on schedules and fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Schedule ids fetched per batch (default %d)." % DEFAULT_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Include schedules that departed more than a day ago.",
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile_availability(
+            batch_size=max(1, options["batch_size"]), include_past=options["all"]
+        )
+        self.stdout.write(
+            "Checked %(checked)d schedule(s); fixed %(fixed)d drifted row(s)." % result
+        )
@@ -0,0 +1,29 @@
+"""
+Nightly city popularity rollup for autocomplete ranking (see bookings/popularity.py).
+
+Cron:  python manage.py rollup_popularity
+       python manage.py rollup_popularity --days 30   # shorter look-back window
+"""
+from django.core.management.base import BaseCommand
+
+from bookings.popularity import POPULARITY_WINDOW_DAYS, rollup_popularity
+
+
+class Command(BaseCommand):
+    help = "Recompute city / city-pair popularity from recent confirmed bookings and searches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=POPULARITY_WINDOW_DAYS,
+            help="Look-back window in days (default %d)." % POPULARITY_WINDOW_DAYS,
+        )
+
+    def handle(self, *args, **options):
+        result = rollup_popularity(window_days=max(1, options["days"]))
+        self.stdout.write(
+            "Flushed %(searches_flushed)d search(es); scored %(pairs)d city pair(s); "
+            "purged %(search_days_purged)d old search day(s)."
+            % result
+        )
@@ -0,0 +1,83 @@
+# Normalized per-seat booking rows + backfill from Booking.seats JSON.
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LIVE = ("PENDING", "CONFIRMED")
+
+
+def _gender(value):
+    g = str(value or "").strip().upper()
+    if g in ("M", "MALE"):
+        return "M"
+    if g in ("F", "FEMALE"):
+        return "F"
+    return ""
+
+
+def backfill_booking_seats(apps, schema_editor):
+    Booking = apps.get_model("bookings", "Booking")
+    BookingSeat = apps.get_model("bookings", "BookingSeat")
+    live_taken = set()
+    rows = []
+    for b in Booking.objects.order_by("id").only(
+        "id", "schedule_id", "seats", "passenger_details", "status"
+    ):
+        try:
+            seats = json.loads(b.seats or "[]")
+        except Exception:
+            seats = []
+        try:
+            details = json.loads(b.passenger_details or "{}")
+        except Exception:
+            details = {}
+        if not isinstance(details, dict):
+            details = {}
+        for s in dict.fromkeys(str(x) for x in seats):
+            if b.status in LIVE:
+                # Legacy double-bookings: the oldest live booking keeps the seat row.
+                if (b.schedule_id, s) in live_taken:
+                    continue
+                live_taken.add((b.schedule_id, s))
+            p = details.get(s)
+            rows.append(
+                BookingSeat(
+                    schedule_id=b.schedule_id,
+                    seat_no=s,
+                    booking_id=b.id,
+                    gender=_gender(p.get("gender")) if isinstance(p, dict) else "",
+                    status=b.status,
+                )
+            )
+    BookingSeat.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_demo_bus_seat_layouts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seat_no', models.CharField(max_length=10)),
+                ('gender', models.CharField(blank=True, default='', max_length=1)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('REFUNDED', 'Refunded')], default='PENDING', max_length=20)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_rows', to='bookings.booking')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_seats', to='bookings.schedule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['schedule', 'status'], name='bookings_bseat_sched_st_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_booking_seats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bookingseat',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('PENDING', 'CONFIRMED'))), fields=('schedule', 'seat_no'), name='bookings_bseat_live_seat_uniq'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Booking payment deadline + (status, expires_at) indexes for the expire_holds sweeper.
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_pending_expiry(apps, schema_editor):
+    Booking = apps.get_model("bookings", "Booking")
+    ttl = timedelta(seconds=getattr(settings, "BOOKING_PAYMENT_TTL_SECONDS", 30 * 60))
+    for b in Booking.objects.filter(status="PENDING", expires_at__isnull=True).only("id", "created_at"):
+        Booking.objects.filter(pk=b.pk).update(expires_at=b.created_at + ttl)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0017_booking_seat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('REFUNDED', 'Refunded'), ('EXPIRED', 'Expired')], default='PENDING', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='bookingseat',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('REFUNDED', 'Refunded'), ('EXPIRED', 'Expired')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'expires_at'], name='bookings_bkg_status_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expires_at'], name='bookings_res_status_exp_idx'),
+        ),
+        migrations.RunPython(backfill_pending_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Denormalized seats_total / seats_available / min_fare on Schedule for search listings.
+
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _bookable_labels(seat_map_json):
+    """Same rule as buses.layout.CompiledLayout.bookable (kept inline: migrations are frozen)."""
+    try:
+        layout = json.loads(seat_map_json or "{}")
+    except Exception:
+        layout = {}
+    if not isinstance(layout, dict):
+        layout = {}
+    rows = layout.get("rows") or 10
+    cols = layout.get("cols") or 4
+    labels = layout.get("labels") or [
+        f"{r}{chr(65 + c)}" for r in range(1, rows + 1) for c in range(cols)
+    ]
+    out = []
+    for lb in list(labels)[: rows * cols]:
+        lb = str(lb).strip() if lb is not None else ""
+        if lb and lb not in out:
+            out.append(lb)
+    return out
+
+
+def _min_fare(schedule, labels):
+    if not labels:
+        return None
+    try:
+        overrides = json.loads(schedule.seat_fares_json or "{}")
+    except Exception:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        overrides = {}
+    prices = []
+    for lb in labels:
+        price = Decimal(schedule.fare)
+        if lb in overrides:
+            try:
+                price = Decimal(str(overrides[lb])).quantize(Decimal("0.01"))
+            except (InvalidOperation, TypeError, ValueError):
+                pass
+        prices.append(price)
+    return min(prices).quantize(Decimal("0.01"))
+
+
+def backfill_availability(apps, schema_editor):
+    Schedule = apps.get_model("bookings", "Schedule")
+    Reservation = apps.get_model("bookings", "Reservation")
+    BookingSeat = apps.get_model("bookings", "BookingSeat")
+    now = timezone.now()
+    for schedule in Schedule.objects.select_related("bus").iterator():
+        labels = _bookable_labels(schedule.bus.seat_map_json)
+        occupied = set(
+            Reservation.objects.filter(
+                schedule_id=schedule.pk, status="PENDING", expires_at__gt=now
+            ).values_list("seat_no", flat=True)
+        )
+        occupied.update(
+            BookingSeat.objects.filter(
+                schedule_id=schedule.pk, status__in=("PENDING", "CONFIRMED")
+            ).values_list("seat_no", flat=True)
+        )
+        total = len(labels)
+        Schedule.objects.filter(pk=schedule.pk).update(
+            seats_total=total,
+            seats_available=max(total - len(occupied.intersection(labels)), 0),
+            min_fare=_min_fare(schedule, labels),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_expiry_sweep_indexes'),
+        ('buses', '0004_operator_kyc_review'),
+        ('common', '0002_route_pattern'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='min_fare',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='seats_available',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='seats_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['route', 'departure_dt', 'seats_available', 'min_fare'], name='bookings_sched_avail_idx'),
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Composite indexes for day-range schedule search (status, route, departure_dt) and per-bus lookups.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0019_schedule_availability'),
+        ('buses', '0004_operator_kyc_review'),
+        ('common', '0004_popularity_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['status', 'route', 'departure_dt'], name='bookings_sched_status_rt_dep'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['bus', 'departure_dt'], name='bookings_sched_bus_dep_idx'),
+        ),
+    ]
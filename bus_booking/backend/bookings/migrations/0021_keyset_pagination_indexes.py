@@ -0,0 +1,45 @@
+# Composite indexes matching the keyset pagination orderings (common/pagination.py).
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0020_schedule_search_indexes'),
+        ('buses', '0004_operator_kyc_review'),
+        ('common', '0005_route_stop_pairs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='busrating',
+            name='bookings_busrating_bus_created',
+        ),
+        migrations.RemoveIndex(
+            model_name='operatorsale',
+            name='bookings_osale_op_cf_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='operatorsale',
+            name='bookings_osale_op_rev_cf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='busrating',
+            index=models.Index(fields=['bus', '-created_at', '-id'], name='bookings_busrating_bus_cr_id'),
+        ),
+        migrations.AddIndex(
+            model_name='operatorsale',
+            index=models.Index(fields=['operator', '-confirmed_at', '-id'], name='bookings_osale_op_cf_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operatorsale',
+            index=models.Index(fields=['operator', 'reversal_status', '-confirmed_at', '-id'], name='bookings_osale_op_rev_cf_id'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['status', 'departure_dt', 'id'], name='bookings_sched_status_dep_id'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# FareRule: rule-based dynamic seat pricing (bookings/dynamic_pricing.py).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0021_keyset_pagination_indexes'),
+        ('buses', '0005_bus_layout_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=80)),
+                ('offer_style', models.CharField(blank=True, default='', max_length=24)),
+                ('seat_type', models.CharField(blank=True, default='', max_length=20)),
+                ('min_load_pct', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_load_pct', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('min_hours_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_hours_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('adjust_pct', models.DecimalField(decimal_places=2, help_text='Percent added to the seat price, e.g. 15 = +15%, -20 = 20% off.', max_digits=6)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('operator', models.ForeignKey(blank=True, help_text='Blank = every operator.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fare_rules', to='buses.operator')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
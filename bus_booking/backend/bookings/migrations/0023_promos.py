@@ -0,0 +1,78 @@
+# Promo codes / automatic offers with atomic usage counters (bookings/promos.py).
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0022_fare_rules'),
+        ('buses', '0005_bus_layout_kind'),
+        ('common', '0005_route_stop_pairs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='Promo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(blank=True, default='', max_length=32)),
+                ('title', models.CharField(blank=True, default='', max_length=160)),
+                ('funded_by', models.CharField(choices=[('PLATFORM', 'Platform'), ('OPERATOR', 'Operator')], default='PLATFORM', max_length=10)),
+                ('seat_type', models.CharField(blank=True, default='', max_length=20)),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('discount_pct', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('discount_flat', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_uses', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_uses_per_user', models.PositiveIntegerField(blank=True, null=True)),
+                ('uses', models.PositiveIntegerField(default=0, editable=False)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('operator', models.ForeignKey(blank=True, help_text="Only this operator's trips. Required for operator-funded promos.", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promos', to='buses.operator')),
+                ('route', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promos', to='common.route')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PromoRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('discount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('funded_by', models.CharField(choices=[('PLATFORM', 'Platform'), ('OPERATOR', 'Operator')], max_length=10)),
+                ('status', models.CharField(choices=[('RESERVED', 'Reserved'), ('USED', 'Used'), ('RELEASED', 'Released')], default='RESERVED', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='promo_redemption', to='bookings.booking')),
+                ('promo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='redemptions', to='bookings.promo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promo_redemptions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PromoUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('promo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_usages', to='bookings.promo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promo_usages', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='promo',
+            constraint=models.UniqueConstraint(condition=models.Q(('code', ''), _negated=True), fields=('code',), name='bookings_promo_code_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='promousage',
+            constraint=models.UniqueConstraint(fields=('promo', 'user'), name='bookings_promo_usage_uniq'),
+        ),
+    ]
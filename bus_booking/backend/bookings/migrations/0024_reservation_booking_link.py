@@ -0,0 +1,41 @@
+# Link seat holds to the booking made from them (bookings/booking_state.py).
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_live_bookings(apps, schema_editor):
+    # Holds of bookings still in flight used to be matched by (schedule, seat, user).
+    Booking = apps.get_model('bookings', 'Booking')
+    Reservation = apps.get_model('bookings', 'Reservation')
+    live = Booking.objects.filter(status__in=('PENDING', 'CONFIRMED')).values_list(
+        'id', 'schedule_id', 'user_id', 'seats'
+    )
+    for booking_id, schedule_id, user_id, seats_raw in live.iterator():
+        try:
+            seats = [str(s) for s in json.loads(seats_raw or '[]')]
+        except Exception:
+            continue
+        if seats:
+            Reservation.objects.filter(
+                schedule_id=schedule_id, reserved_by_id=user_id, seat_no__in=seats,
+                booking__isnull=True,
+            ).update(booking_id=booking_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0023_promos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='bookings.booking'),
+        ),
+        migrations.RunPython(link_live_bookings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Stored max_fare next to min_fare, and when both go stale (bookings/availability.py).
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_upcoming_fares_due(apps, schema_editor):
+    # The next expire_holds pass (or reconcile_availability) fills in both bounds.
+    Schedule = apps.get_model('bookings', 'Schedule')
+    now = timezone.now()
+    Schedule.objects.filter(departure_dt__gt=now).update(fares_valid_until=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0024_reservation_booking_link'),
+        ('buses', '0005_bus_layout_kind'),
+        ('common', '0006_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='fares_valid_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='max_fare',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['fares_valid_until'], name='bookings_sched_fares_due_idx'),
+        ),
+        migrations.RunPython(mark_upcoming_fares_due, migrations.RunPython.noop),
+    ]
@@ -37,11 +37,34 @@ class Schedule(models.Model):
     seat_fares_json = models.TextField(default="{}", blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     archived = models.BooleanField(default=False)
+    # Denormalized for search listings; maintained by bookings/availability.py
+    seats_total = models.PositiveIntegerField(default=0)
+    seats_available = models.PositiveIntegerField(default=0)
+    min_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # When min_fare / max_fare go stale: the next dynamic price step, or a fare rule edit
+    fares_valid_until = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['departure_dt']
         indexes = [
             models.Index(fields=['route', 'departure_dt']),
+            models.Index(
+                fields=['route', 'departure_dt', 'seats_available', 'min_fare'],
+                name='bookings_sched_avail_idx',
+            ),
+            # Public search: status='ACTIVE' + route + departure day range
+            models.Index(
+                fields=['status', 'route', 'departure_dt'], name='bookings_sched_status_rt_dep'
+            ),
+            # Expiry sweeper: schedules whose stored fares are due for a recount
+            models.Index(fields=['fares_valid_until'], name='bookings_sched_fares_due_idx'),
+            # Operator exports / duplicate-departure checks per bus
+            models.Index(fields=['bus', 'departure_dt'], name='bookings_sched_bus_dep_idx'),
+            # Keyset pagination of the public list without a route: (departure_dt, id)
+            models.Index(
+                fields=['status', 'departure_dt', 'id'], name='bookings_sched_status_dep_id'
+            ),
         ]
 
     def __str__(self):
@@ -102,27 +125,39 @@ class Reservation(models.Model):
     reserved_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reservations')
     expires_at = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    # Set at checkout: the booking these holds became (see bookings/booking_state.py)
+    booking = models.ForeignKey(
+        'Booking', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['schedule', 'seat_no']),
+            models.Index(fields=['status', 'expires_at'], name='bookings_res_status_exp_idx'),
         ]
 
     def is_active(self):
         return self.status == 'PENDING' and self.expires_at > timezone.now()
 
+# Booking / BookingSeat statuses that still occupy a seat on the bus.
+LIVE_BOOKING_STATUSES = ('PENDING', 'CONFIRMED')
+
+
 class Booking(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
         ('CONFIRMED', 'Confirmed'),
         ('CANCELLED', 'Cancelled'),
         ('REFUNDED', 'Refunded'),
+        ('EXPIRED', 'Expired'),   # unpaid PENDING booking swept after expires_at
     )
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
     schedule = models.ForeignKey(Schedule, on_delete=models.PROTECT, related_name='bookings')
     seats = models.TextField(default=list)  # e.g., ["1A","1B"]
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Promo discount already taken off `amount` (see PromoRedemption)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     payment_id = models.CharField(max_length=100, blank=True)
     ticket_file = models.CharField(max_length=255, blank=True)  # Path to generated ticket PDF
@@ -134,17 +169,52 @@ class Booking(models.Model):
     whatsapp_opt_in = models.BooleanField(default=False)
     passenger_details = models.TextField(blank=True, default="{}")  # JSON: {"1A": {"gender": "F"}, ...}
     created_at = models.DateTimeField(auto_now_add=True)
+    # Payment deadline for PENDING bookings; past this the sweeper releases the seats
+    expires_at = models.DateTimeField(null=True, blank=True)
     # Cancellation
     cancelled_at = models.DateTimeField(null=True, blank=True)
-    cancelled_by = models.CharField(max_length=20, blank=True)  # 'passenger' | 'operator' | 'admin'
+    cancelled_by = models.CharField(max_length=20, blank=True)  # 'passenger' | 'operator' | 'admin' | 'system'
     cancellation_reason = models.CharField(max_length=255, blank=True)
     refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     refund_id = models.CharField(max_length=100, blank=True)  # Razorpay refund ID
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='bookings_bkg_status_exp_idx'),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.user} - {self.status}"
 
 
+class BookingSeat(models.Model):
+    """
+    One row per seat on a booking (normalized copy of Booking.seats).
+    Kept in sync via signals; the partial unique constraint lets the database refuse a second
+    live booking for the same seat even when the Redis hold layer is unavailable.
+    """
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='booking_seats')
+    seat_no = models.CharField(max_length=10)
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='seat_rows')
+    gender = models.CharField(max_length=1, blank=True, default='')  # 'M' | 'F' | ''
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES, default='PENDING')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schedule', 'seat_no'],
+                condition=models.Q(status__in=LIVE_BOOKING_STATUSES),
+                name='bookings_bseat_live_seat_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['schedule', 'status'], name='bookings_bseat_sched_st_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.seat_no} on schedule {self.schedule_id} ({self.status})"
+
+
 class BusRating(models.Model):
     """One rating per booking, after the passenger has completed the trip."""
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='bus_rating')
@@ -156,7 +226,8 @@ class BusRating(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['bus', '-created_at'], name='bookings_busrating_bus_created'),
+            # Keyset pagination of a bus's reviews: (created_at, id) descending
+            models.Index(fields=['bus', '-created_at', '-id'], name='bookings_busrating_bus_cr_id'),
         ]
 
     def __str__(self):
@@ -212,12 +283,167 @@ class OperatorSale(models.Model):
         verbose_name_plural = "Operator sales"
         ordering = ["-confirmed_at", "-id"]
         indexes = [
-            models.Index(fields=["operator", "-confirmed_at"], name="bookings_osale_op_cf_idx"),
+            # Keyset pagination of sales lists: (confirmed_at, id) descending
             models.Index(
-                fields=["operator", "reversal_status", "-confirmed_at"],
-                name="bookings_osale_op_rev_cf_idx",
+                fields=["operator", "-confirmed_at", "-id"], name="bookings_osale_op_cf_id_idx"
+            ),
+            models.Index(
+                fields=["operator", "reversal_status", "-confirmed_at", "-id"],
+                name="bookings_osale_op_rev_cf_id",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Sale {self.id} booking={self.booking_id} ₹{self.gross_amount}"
+
+class FareRule(models.Model):
+    """
+    Dynamic pricing rule (see bookings/dynamic_pricing.py). Every active rule matching a seat
+    adds its `adjust_pct` to that seat's price; blank filters and bounds match anything.
+    """
+
+    operator = models.ForeignKey(
+        "buses.Operator",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="fare_rules",
+        help_text="Blank = every operator.",
+    )
+    name = models.CharField(max_length=80, blank=True, default="")
+    # Matches Schedule.operator_offer_style (e.g. "last_minute"); blank = any schedule
+    offer_style = models.CharField(max_length=24, blank=True, default="")
+    # Seat type from the bus layout: seater, sleeper, semi_sleeper; blank = any seat
+    seat_type = models.CharField(max_length=20, blank=True, default="")
+    # Load factor band (percent of bookable seats sold): min <= load < max
+    min_load_pct = models.PositiveSmallIntegerField(null=True, blank=True)
+    max_load_pct = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Applies while departure is more than `min` and at most `max` hours away
+    min_hours_before = models.PositiveIntegerField(null=True, blank=True)
+    max_hours_before = models.PositiveIntegerField(null=True, blank=True)
+    adjust_pct = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        help_text="Percent added to the seat price, e.g. 15 = +15%, -20 = 20% off.",
+    )
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.name or f"Fare rule {self.id} ({self.adjust_pct:+}%)"
+
+
+class Promo(models.Model):
+    """
+    Promo code (passenger enters `code`) or automatic offer (blank code), evaluated at
+    checkout by bookings/promos.py. Blank filters match anything. Exactly one of
+    `discount_pct` / `discount_flat` is set. `uses` is an atomic counter (conditional
+    UPDATE), never a count of redemption rows.
+    """
+
+    FUNDED_BY_CHOICES = (
+        ("PLATFORM", "Platform"),
+        ("OPERATOR", "Operator"),
+    )
+
+    code = models.CharField(max_length=32, blank=True, default="")  # stored upper-case
+    title = models.CharField(max_length=160, blank=True, default="")  # e.g. "₹100 OFF"
+    funded_by = models.CharField(max_length=10, choices=FUNDED_BY_CHOICES, default="PLATFORM")
+    operator = models.ForeignKey(
+        "buses.Operator",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="promos",
+        help_text="Only this operator's trips. Required for operator-funded promos.",
+    )
+    route = models.ForeignKey(
+        Route, on_delete=models.CASCADE, null=True, blank=True, related_name="promos"
+    )
+    # Seat type from the bus layout: seater, sleeper, semi_sleeper; blank = any seat
+    seat_type = models.CharField(max_length=20, blank=True, default="")
+    # Local departure dates the promo applies to (inclusive)
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+    discount_pct = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    # Flat amount off the booking
+    discount_flat = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_discount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Minimum price of the eligible seats in the booking
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_uses = models.PositiveIntegerField(null=True, blank=True)
+    max_uses_per_user = models.PositiveIntegerField(null=True, blank=True)
+    uses = models.PositiveIntegerField(default=0, editable=False)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["code"], condition=~models.Q(code=""), name="bookings_promo_code_uniq"
             ),
         ]
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if (self.discount_pct is None) == (self.discount_flat is None):
+            raise ValidationError("Set exactly one of discount_pct or discount_flat.")
+        if self.funded_by == "OPERATOR" and not self.operator_id:
+            raise ValidationError({"operator": "Operator-funded promos need an operator."})
+
+    def save(self, *args, **kwargs):
+        self.code = (self.code or "").strip().upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.code or self.title or f"Offer {self.id}"
+
+
+class PromoUsage(models.Model):
+    """Per-user use counter for promos with max_uses_per_user (atomic, like Promo.uses)."""
+
+    promo = models.ForeignKey(Promo, on_delete=models.CASCADE, related_name="user_usages")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="promo_usages"
+    )
+    uses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["promo", "user"], name="bookings_promo_usage_uniq"),
+        ]
+
+
+class PromoRedemption(models.Model):
+    """
+    The promo applied to one booking. RESERVED at checkout (counted against the caps),
+    USED once the booking is confirmed, RELEASED (uncounted) if it expires or is cancelled
+    before that.
+    """
+
+    STATUS_CHOICES = (
+        ("RESERVED", "Reserved"),
+        ("USED", "Used"),
+        ("RELEASED", "Released"),
+    )
+
+    booking = models.OneToOneField(
+        Booking, on_delete=models.CASCADE, related_name="promo_redemption"
+    )
+    promo = models.ForeignKey(Promo, on_delete=models.PROTECT, related_name="redemptions")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="promo_redemptions"
+    )
+    discount = models.DecimalField(max_digits=10, decimal_places=2)
+    funded_by = models.CharField(max_length=10, choices=Promo.FUNDED_BY_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="RESERVED")
+    created_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return f"Sale {self.id} booking={self.booking_id} ₹{self.gross_amount}"
\ No newline at end of file
+        return f"{self.promo} on booking {self.booking_id} ({self.status})"
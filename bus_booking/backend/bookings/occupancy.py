@@ -0,0 +1,228 @@
+"""
+Per-schedule seat-occupancy index.
+
+Occupancy is stored as compact bitmaps over the bus layout's bookable seat positions
+(row-major, aisles skipped): one bit per seat for "occupied", plus "female" / "male"
+bitmaps for the adjacent-seat gender rule. Snapshots live in the Django cache (Redis in
+production) keyed by schedule, so hot seat maps are answered without touching the DB.
+
+The index is rebuilt from Reservation + BookingSeat rows on a miss. Writers call
+`invalidate_occupancy()` (signals do this for saves; bulk `.update()` paths call it
+directly). Snapshots are stamped with the schedule's inventory version read before the
+rebuild, so one built from rows a writer was about to replace (and stored after that
+writer's invalidation) is a miss under the new version. A snapshot also carries the
+earliest hold expiry and rebuilds itself once that hold has lapsed.
+"""
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from buses.layout import layout_for_bus
+
+from .inventory import bump_inventory_version, get_inventory_version, inventory_version_key
+
+OCCUPANCY_CACHE_PREFIX = "occ:v3:"
+OCCUPANCY_TTL = getattr(settings, "SEAT_OCCUPANCY_CACHE_SECONDS", 5 * 60)
+
+
+def occupancy_cache_key(schedule_id: int) -> str:
+    return f"{OCCUPANCY_CACHE_PREFIX}{schedule_id}"
+
+
+def _pack(index: dict[str, int], n: int, labels) -> bytes:
+    buf = bytearray((n + 7) // 8)
+    for lb in labels:
+        i = index.get(lb)
+        if i is not None:
+            buf[i >> 3] |= 1 << (i & 7)
+    return bytes(buf)
+
+
+def _unpack(bits: bytes, ordered: tuple[str, ...]) -> list[str]:
+    out = []
+    for byte_i, byte in enumerate(bits):
+        if not byte:
+            continue
+        base = byte_i << 3
+        for bit in range(8):
+            if byte & (1 << bit) and base + bit < len(ordered):
+                out.append(ordered[base + bit])
+    return out
+
+
+class SeatOccupancy:
+    """Immutable occupancy snapshot for one schedule."""
+
+    __slots__ = (
+        "layout_fingerprint", "occupied_bits", "female_bits", "male_bits", "extra", "next_expiry",
+        "_ordered", "_index", "_neighbor_masks",
+    )
+
+    def __init__(self, layout_fingerprint, occupied_bits, female_bits, male_bits, extra, next_expiry):
+        self.layout_fingerprint = layout_fingerprint
+        self.occupied_bits = occupied_bits
+        self.female_bits = female_bits
+        self.male_bits = male_bits
+        # Occupied labels that are not in the current layout: label -> 'M' | 'F' | ''
+        self.extra = extra
+        # Epoch seconds of the earliest live hold expiry (None = no expiring holds)
+        self.next_expiry = next_expiry
+        self._ordered = ()
+        self._index = {}
+        self._neighbor_masks = ()
+
+    def _bind(self, layout) -> "SeatOccupancy":
+        self._ordered, self._index = layout.bookable, layout.bookable_index
+        self._neighbor_masks = layout.neighbor_masks
+        return self
+
+    def to_cache(self) -> tuple:
+        return (
+            self.layout_fingerprint, self.occupied_bits, self.female_bits, self.male_bits,
+            self.extra, self.next_expiry,
+        )
+
+    def is_stale(self, fingerprint: str) -> bool:
+        if self.layout_fingerprint != fingerprint:
+            return True
+        return self.next_expiry is not None and time.time() >= self.next_expiry
+
+    def _bit(self, bits: bytes, label: str) -> bool:
+        i = self._index.get(label)
+        if i is None:
+            return False
+        return bool(bits[i >> 3] & (1 << (i & 7)))
+
+    def is_occupied(self, label: str) -> bool:
+        return self._bit(self.occupied_bits, label) or label in self.extra
+
+    def gender(self, label: str):
+        if self._bit(self.female_bits, label):
+            return "F"
+        if self._bit(self.male_bits, label):
+            return "M"
+        return self.extra.get(label) or None
+
+    def occupied_labels(self) -> set[str]:
+        return set(_unpack(self.occupied_bits, self._ordered)) | set(self.extra)
+
+    def occupied_count(self) -> int:
+        return sum(bin(b).count("1") for b in self.occupied_bits) + len(self.extra)
+
+    def occupied_and_genders(self) -> tuple[set[str], dict[str, str]]:
+        """Same shape as seat_rules.get_occupied_and_seat_genders()."""
+        seat_gender = {lb: "F" for lb in _unpack(self.female_bits, self._ordered)}
+        seat_gender.update((lb, "M") for lb in _unpack(self.male_bits, self._ordered))
+        seat_gender.update((lb, g) for lb, g in self.extra.items() if g)
+        return self.occupied_labels(), seat_gender
+
+    def bookable_for(self) -> dict[str, list[str]]:
+        """
+        Seat label -> genders that may book it: [] when occupied, ['F'] when a horizontal
+        neighbour is booked by a female passenger (male-next-to-female rule), else ['M', 'F'].
+        Worked out on the bitmaps: OR of the neighbour masks of every female seat.
+        """
+        occupied = int.from_bytes(self.occupied_bits, "little")
+        female = int.from_bytes(self.female_bits, "little")
+        male_blocked = 0
+        masks = self._neighbor_masks
+        while female:
+            low = female & -female
+            male_blocked |= masks[low.bit_length() - 1]
+            female ^= low
+        out = {}
+        for i, lb in enumerate(self._ordered):
+            bit = 1 << i
+            if occupied & bit or lb in self.extra:
+                out[lb] = []
+            elif male_blocked & bit:
+                out[lb] = ["F"]
+            else:
+                out[lb] = ["M", "F"]
+        return out
+
+
+def build_occupancy(schedule) -> SeatOccupancy:
+    """Rebuild the snapshot from the DB (active holds + live BookingSeat rows)."""
+    from .models import LIVE_BOOKING_STATUSES, BookingSeat, Reservation
+
+    now = timezone.now()
+    occupied = set()
+    next_expiry = None
+    for seat_no, expires_at in Reservation.objects.filter(
+        schedule_id=schedule.pk, status="PENDING", expires_at__gt=now
+    ).values_list("seat_no", "expires_at"):
+        occupied.add(seat_no)
+        ts = expires_at.timestamp()
+        if next_expiry is None or ts < next_expiry:
+            next_expiry = ts
+    seat_gender = {}
+    for seat_no, gender in BookingSeat.objects.filter(
+        schedule_id=schedule.pk, status__in=LIVE_BOOKING_STATUSES
+    ).values_list("seat_no", "gender"):
+        occupied.add(seat_no)
+        if gender in ("M", "F"):
+            seat_gender[seat_no] = gender
+
+    layout = layout_for_bus(schedule.bus)
+    index = layout.bookable_index
+    n = len(index)
+    extra = {s: seat_gender.get(s, "") for s in occupied if s not in index}
+    snap = SeatOccupancy(
+        layout.fingerprint,
+        _pack(index, n, occupied),
+        _pack(index, n, (s for s, g in seat_gender.items() if g == "F")),
+        _pack(index, n, (s for s, g in seat_gender.items() if g == "M")),
+        extra,
+        next_expiry,
+    )
+    return snap._bind(layout)
+
+
+def schedule_occupancy(schedule) -> SeatOccupancy:
+    """
+    Cached occupancy snapshot; rebuilds on miss, inventory version or layout change, or
+    lapsed hold.
+    """
+    layout = layout_for_bus(schedule.bus)
+    vkey, key = inventory_version_key(schedule.pk), occupancy_cache_key(schedule.pk)
+    try:
+        got = cache.get_many([vkey, key])
+        version = get_inventory_version(schedule.pk, got.get(vkey))
+    except Exception:
+        got, version = {}, None
+    entry = got.get(key)
+    if entry is not None and version is not None and entry[0] == version:
+        snap = SeatOccupancy(*entry[1])._bind(layout)
+        if not snap.is_stale(layout.fingerprint):
+            return snap
+    snap = build_occupancy(schedule)
+    if version is not None:
+        try:
+            cache.set(key, (version, snap.to_cache()), OCCUPANCY_TTL)
+        except Exception:
+            pass
+    return snap
+
+
+def invalidate_occupancy(schedule_id: int) -> None:
+    """
+    Drop the cached snapshot once the current transaction commits (next read rebuilds),
+    move the schedule to a new inventory version and queue an availability recount.
+    """
+    from .availability import refresh_availability_on_commit
+
+    def _drop():
+        try:
+            cache.delete(occupancy_cache_key(schedule_id))
+        except Exception:
+            pass
+
+    transaction.on_commit(_drop)
+    bump_inventory_version(schedule_id)
+    refresh_availability_on_commit(schedule_id)
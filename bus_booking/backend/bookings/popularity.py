@@ -0,0 +1,164 @@
+"""
+Popularity rollup for city autocomplete.
+
+Schedule searches are counted per route per day with one `cache.incr` (Redis in
+production, shared by every process; no DB write on the search request). The counter holds
+searches not yet written to RouteSearchDay: the search that takes it to
+SEARCH_FLUSH_EVERY moves it into the day's row (one `F()` increment), so at most one search
+in SEARCH_FLUSH_EVERY writes. A nightly `python manage.py rollup_popularity`:
+
+  1. flushes the remaining counters of today and yesterday into RouteSearchDay
+  2. counts CONFIRMED bookings and searches in the last POPULARITY_WINDOW_DAYS per
+     origin → destination city pair (two grouped queries)
+  3. rewrites CityPairPopularity / CityPopularity and rebuilds the city index, which
+     ranks suggestions by these scores (other processes see the new CityPopularity rows,
+     see common/city_index.py)
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from common.city_index import invalidate_city_index
+from common.models import CityPairPopularity, CityPopularity, Route, RouteSearchDay
+
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+POPULARITY_WINDOW_DAYS = getattr(settings, "POPULARITY_WINDOW_DAYS", 90)
+# One confirmed booking counts as much as this many searches.
+BOOKING_WEIGHT = getattr(settings, "POPULARITY_BOOKING_WEIGHT", 10.0)
+SEARCH_COUNTER_PREFIX = "popsearch:v2:"
+SEARCH_COUNTER_TTL = 3 * 24 * 60 * 60
+SEARCH_FLUSH_EVERY = getattr(settings, "POPULARITY_SEARCH_FLUSH_EVERY", 100)
+FLUSH_BATCH = 500
+
+
+def search_counter_key(day, route_id: int) -> str:
+    return f"{SEARCH_COUNTER_PREFIX}{day:%Y%m%d}:{route_id}"
+
+
+def record_route_search(route_id) -> None:
+    """Count one schedule search for this route today (cache only, but every Nth search)."""
+    try:
+        route_id = int(route_id)
+    except (TypeError, ValueError):
+        return
+    day = timezone.localdate()
+    key = search_counter_key(day, route_id)
+    try:
+        pending = 1 if cache.add(key, 1, SEARCH_COUNTER_TTL) else cache.incr(key)
+    except Exception:
+        return
+    if pending >= SEARCH_FLUSH_EVERY:
+        _flush_counter(key, route_id, day, pending)
+
+
+def _flush_counter(key: str, route_id: int, day, pending: int) -> int:
+    """Move `pending` counted searches from the cache into RouteSearchDay; returns the count."""
+    try:
+        left = cache.decr(key, pending)
+        if left < 0:
+            # A concurrent flush already took some of them: give those back and take the rest.
+            cache.incr(key, -left)
+            pending += left
+    except Exception:
+        return 0
+    if pending <= 0:
+        return 0
+    rows = RouteSearchDay.objects.filter(route_id=route_id, day=day)
+    try:
+        if not rows.update(searches=F("searches") + pending):
+            try:
+                with transaction.atomic():
+                    RouteSearchDay.objects.create(route_id=route_id, day=day, searches=pending)
+            except IntegrityError:
+                # Another flush created the day's row first (or the route does not exist).
+                rows.update(searches=F("searches") + pending)
+    except DatabaseError as e:
+        logger.warning("Search count flush failed for route %s: %s", route_id, e)
+        return 0
+    return pending
+
+
+def flush_search_counters(days=None) -> int:
+    """Write the cached search counters of `days` (default yesterday and today) to the DB."""
+    today = timezone.localdate()
+    days = days or (today - timedelta(days=1), today)
+    route_ids = list(Route.objects.values_list("id", flat=True))
+    flushed = 0
+    for day in days:
+        for i in range(0, len(route_ids), FLUSH_BATCH):
+            keys = {search_counter_key(day, rid): rid for rid in route_ids[i:i + FLUSH_BATCH]}
+            try:
+                counts = cache.get_many(list(keys))
+            except Exception:
+                counts = {}
+            for key, n in counts.items():
+                if n and n > 0:
+                    flushed += _flush_counter(key, keys[key], day, int(n))
+    return flushed
+
+
+def rollup_popularity(window_days: int = POPULARITY_WINDOW_DAYS) -> dict:
+    """Recompute CityPairPopularity / CityPopularity; returns counts for logging."""
+    flushed = flush_search_counters()
+    since = timezone.now() - timedelta(days=window_days)
+
+    bookings = defaultdict(int)
+    for row in (
+        Booking.objects.filter(status="CONFIRMED", created_at__gte=since)
+        .values("schedule__route__origin_city_id", "schedule__route__destination_city_id")
+        .annotate(n=Count("id"))
+    ):
+        pair = (row["schedule__route__origin_city_id"], row["schedule__route__destination_city_id"])
+        bookings[pair] += row["n"]
+    searches = defaultdict(int)
+    for row in (
+        RouteSearchDay.objects.filter(day__gte=since.date())
+        .values("route__origin_city_id", "route__destination_city_id")
+        .annotate(n=Sum("searches"))
+    ):
+        pair = (row["route__origin_city_id"], row["route__destination_city_id"])
+        searches[pair] += row["n"] or 0
+
+    pairs = []
+    origin_score = defaultdict(float)
+    destination_score = defaultdict(float)
+    for pair in set(bookings) | set(searches):
+        o, d = pair
+        if o is None or d is None:
+            continue
+        score = BOOKING_WEIGHT * bookings[pair] + searches[pair]
+        pairs.append(CityPairPopularity(
+            origin_city_id=o, destination_city_id=d,
+            bookings=bookings[pair], searches=searches[pair], score=score,
+        ))
+        origin_score[o] += score
+        destination_score[d] += score
+
+    with transaction.atomic():
+        CityPairPopularity.objects.all().delete()
+        CityPairPopularity.objects.bulk_create(pairs)
+        CityPopularity.objects.all().delete()
+        CityPopularity.objects.bulk_create(
+            CityPopularity(
+                city_id=cid,
+                origin_score=origin_score.get(cid, 0.0),
+                destination_score=destination_score.get(cid, 0.0),
+            )
+            for cid in set(origin_score) | set(destination_score)
+        )
+        purged = RouteSearchDay.objects.filter(day__lt=since.date()).delete()[0]
+        invalidate_city_index()
+    result = {"searches_flushed": flushed, "pairs": len(pairs), "search_days_purged": purged}
+    logger.info("rollup_popularity: %s", result)
+    return result
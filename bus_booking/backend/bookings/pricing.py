@@ -1,59 +1,77 @@
-"""Per-seat fare helpers (schedule base fare + optional overrides)."""
+"""
+Per-seat fare helpers (schedule base fare + optional overrides).
+
+`Schedule.seat_fares_json` is parsed once per distinct (fare, seat_fares_json) pair into a
+FareTable: base fare and per-label overrides resolved to Decimal. Tables are
+content-addressed (an edited fare is simply a new key) and held in a per-process LRU, like
+compiled seat layouts (buses/layout.py).
+
+These are the operator-set base prices; FareRule adjustments on top of them (load factor,
+hours to departure, seat type) and every price quoted to passengers (seat map, checkout,
+search min/max fare) come from dynamic_pricing.PriceLadder.
+
+Treat FareTable instances as read-only: they are shared.
+"""
 import json
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 
+CENTS = Decimal("0.01")
 
-def seat_fares_dict_from_schedule(schedule) -> dict[str, str]:
-    """Parse Schedule.seat_fares_json into a dict of label -> price string."""
-    raw = getattr(schedule, "seat_fares_json", None) or "{}"
-    if isinstance(raw, dict):
-        return {str(k): str(v) for k, v in raw.items()}
+
+def _to_price(value) -> Decimal | None:
     try:
-        d = json.loads(raw)
-        if isinstance(d, dict):
-            return {str(k): str(v) for k, v in d.items()}
-    except Exception:
-        pass
-    return {}
-
-
-def fare_for_seat(schedule, seat_label: str) -> Decimal:
-    """Price for one bookable seat label; falls back to schedule.fare."""
-    label = (seat_label or "").strip()
-    if not label:
-        return Decimal(schedule.fare)
-    overrides = seat_fares_dict_from_schedule(schedule)
-    if label in overrides:
-        try:
-            return Decimal(str(overrides[label])).quantize(Decimal("0.01"))
-        except (InvalidOperation, TypeError, ValueError):
-            pass
-    return Decimal(schedule.fare)
-
-
-def total_fare_for_seats(schedule, seat_labels: list[str]) -> Decimal:
-    total = Decimal("0.00")
-    for s in seat_labels:
-        total += fare_for_seat(schedule, s)
-    return total.quantize(Decimal("0.01"))
-
-
-def merged_seat_fare_map(
-    schedule, labels: list, types: list | None
-) -> dict[str, str]:
-    """
-    Full map bookable label -> price string for seat-map API.
-    labels/types are parallel row-major lists from bus layout.
-    """
-    out: dict[str, str] = {}
-    for i, lb in enumerate(labels):
-        label = (lb or "").strip()
-        if not label:
-            continue
-        t = None
-        if types and i < len(types):
-            t = types[i]
-        if t in ("aisle", "blank"):
-            continue
-        out[label] = str(fare_for_seat(schedule, label))
-    return out
+        return Decimal(str(value)).quantize(CENTS)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+class FareTable:
+    """Compiled prices for one (fare, seat_fares_json) pair."""
+
+    __slots__ = ("base", "raw_overrides", "overrides")
+
+    def __init__(self, fare, seat_fares_json):
+        self.base = _to_price(fare) or Decimal("0.00")
+        raw = {}
+        if isinstance(seat_fares_json, dict):
+            raw = seat_fares_json
+        else:
+            try:
+                parsed = json.loads(seat_fares_json or "{}")
+                if isinstance(parsed, dict):
+                    raw = parsed
+            except Exception:
+                pass
+        # As stored (label -> price string), for operator edit screens and comparisons.
+        self.raw_overrides = {str(k): str(v) for k, v in raw.items()}
+        # Valid overrides only; an unparseable price falls back to the base fare.
+        self.overrides = {}
+        for label, value in self.raw_overrides.items():
+            price = _to_price(value)
+            if price is not None:
+                self.overrides[label] = price
+
+    def price(self, seat_label) -> Decimal:
+        """Price for one seat label; falls back to the base fare."""
+        label = str(seat_label or "").strip()
+        return self.overrides.get(label, self.base) if label else self.base
+
+
+@lru_cache(maxsize=1024)
+def _compile_fare_table(fare: str, seat_fares_json: str) -> FareTable:
+    return FareTable(fare, seat_fares_json)
+
+
+def fare_table(schedule) -> FareTable:
+    """FareTable for a schedule's current fare and seat overrides."""
+    raw = getattr(schedule, "seat_fares_json", None) or "{}"
+    if not isinstance(raw, str):
+        # Unsaved instance holding a dict assigned in code.
+        return FareTable(schedule.fare, raw)
+    return _compile_fare_table(str(schedule.fare), raw)
+
+
+def seat_fares_dict_from_schedule(schedule) -> dict[str, str]:
+    """Schedule.seat_fares_json as a dict of label -> price string (a fresh copy)."""
+    return dict(fare_table(schedule).raw_overrides)
@@ -0,0 +1,320 @@
+"""
+Promo codes and automatic offers (Promo rows), applied at checkout.
+
+Active promos are compiled into an in-process PromoIndex: codes in a dict, automatic offers
+bucketed by route (plus an "any route" bucket). Candidates for a (route, departure day)
+are filtered from those buckets once and memoized, so checkout looks at the few promos that
+can apply instead of querying. The index is rebuilt after Promo rows change, with the same
+shared-version scheme as the city index (common/city_index.py).
+
+One promo per booking: a valid code the passenger enters, otherwise the automatic offer
+with the largest discount that still has uses left (overall and for this passenger).
+Discounts apply to the current (dynamic) prices of the seats of the promo's seat type.
+
+Usage caps are atomic counters: Promo.uses and PromoUsage.uses move by one with a
+conditional UPDATE (`uses < cap`), inside the checkout transaction, so concurrent
+checkouts cannot overshoot a cap. If an automatic offer runs out between selection and
+redemption, checkout falls back to the next best offer (or none); only an entered code
+that ran out fails the checkout. A booking's PromoRedemption is RESERVED at checkout,
+becomes USED when the booking is confirmed and RELEASED (counters given back) if the
+booking expires or is cancelled before that.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from buses.layout import layout_for_bus
+
+from .models import Promo, PromoRedemption, PromoUsage
+from .pricing import CENTS
+
+PROMO_INDEX_VERSION_KEY = "promoidx:version"
+PROMO_INDEX_CHECK_SECONDS = getattr(settings, "PROMO_INDEX_CHECK_SECONDS", 5)
+# Memoized (route, day) candidate lists kept per index before starting over.
+MAX_MEMO_ENTRIES = 4096
+
+_RULE_FIELDS = (
+    "id", "code", "title", "funded_by", "operator_id", "route_id", "seat_type",
+    "valid_from", "valid_until", "discount_pct", "discount_flat", "max_discount",
+    "min_amount", "max_uses", "max_uses_per_user",
+)
+
+
+class PromoUnavailable(ValueError):
+    """A cap was reached (or the promo withdrawn) between quote and checkout."""
+
+
+def normalize_code(code) -> str:
+    return str(code or "").strip().upper()
+
+
+class PromoRule:
+    """Compiled, read-only form of one active Promo row."""
+
+    __slots__ = _RULE_FIELDS
+
+    def __init__(self, **values):
+        for name in _RULE_FIELDS:
+            setattr(self, name, values[name])
+
+    def valid_on(self, day) -> bool:
+        return (self.valid_from is None or self.valid_from <= day) and (
+            self.valid_until is None or day <= self.valid_until
+        )
+
+    def applies_to(self, route_id, operator_id, day) -> bool:
+        return (
+            (self.route_id is None or self.route_id == route_id)
+            and (self.operator_id is None or self.operator_id == operator_id)
+            and self.valid_on(day)
+        )
+
+    def discount_for(self, eligible_total: Decimal) -> Decimal:
+        """Discount on `eligible_total`; zero below min_amount."""
+        if eligible_total <= 0:
+            return Decimal("0.00")
+        if self.min_amount is not None and eligible_total < self.min_amount:
+            return Decimal("0.00")
+        if self.discount_pct is not None:
+            off = eligible_total * self.discount_pct / 100
+        else:
+            off = self.discount_flat or Decimal("0")
+        if self.max_discount is not None:
+            off = min(off, self.max_discount)
+        return min(off, eligible_total).quantize(CENTS)
+
+    def payload(self) -> dict:
+        return {"id": self.id, "code": self.code, "title": self.title, "funded_by": self.funded_by}
+
+
+class PromoIndex:
+    """Immutable snapshot of active promos: codes and per-route automatic offers."""
+
+    def __init__(self, rules):
+        self.by_code: dict[str, PromoRule] = {}
+        self.auto_by_route: dict[int | None, list[PromoRule]] = defaultdict(list)
+        for rule in rules:
+            if rule.code:
+                self.by_code[rule.code] = rule
+            else:
+                self.auto_by_route[rule.route_id].append(rule)
+        self._memo: dict[tuple, tuple[PromoRule, ...]] = {}
+
+    def offers(self, route_id, day) -> tuple[PromoRule, ...]:
+        """Automatic offers for a route on a local departure day (memoized)."""
+        key = (route_id, day)
+        hit = self._memo.get(key)
+        if hit is None:
+            hit = tuple(
+                r for r in self.auto_by_route.get(route_id, []) + self.auto_by_route.get(None, [])
+                if r.valid_on(day)
+            )
+            if len(self._memo) >= MAX_MEMO_ENTRIES:
+                self._memo.clear()
+            self._memo[key] = hit
+        return hit
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "checked": 0.0, "dirty": True}
+
+
+def _shared_version():
+    try:
+        return cache.get(PROMO_INDEX_VERSION_KEY)
+    except Exception:
+        return None
+
+
+def get_promo_index() -> PromoIndex:
+    """Current index for this process, rebuilding if Promo rows changed."""
+    now = time.monotonic()
+    st = _state
+    fresh = not st["dirty"] and st["index"] is not None
+    if fresh and now - st["checked"] < PROMO_INDEX_CHECK_SECONDS:
+        return st["index"]
+    version = _shared_version()
+    if fresh and version == st["version"]:
+        st["checked"] = now
+        return st["index"]
+    with _lock:
+        if st["dirty"] or st["index"] is None or version != st["version"]:
+            st["dirty"] = False
+            rows = Promo.objects.filter(active=True).values(*_RULE_FIELDS)
+            st["index"] = PromoIndex(PromoRule(**row) for row in rows)
+            st["version"] = version
+        st["checked"] = now
+    return st["index"]
+
+
+def invalidate_promo_index() -> None:
+    """After commit, mark this process stale and tell other processes to rebuild."""
+
+    def _bump():
+        _state["dirty"] = True
+        try:
+            if not cache.add(PROMO_INDEX_VERSION_KEY, 1, None):
+                cache.incr(PROMO_INDEX_VERSION_KEY)
+        except Exception:
+            pass
+
+    transaction.on_commit(_bump)
+
+
+def _eligible_total(rule: PromoRule, ladder, seats, seat_type_of) -> Decimal:
+    return sum(
+        (ladder.price(s) for s in seats if not rule.seat_type or seat_type_of(s) == rule.seat_type),
+        Decimal("0.00"),
+    )
+
+
+def _with_uses_left(rules, user_id) -> list[PromoRule]:
+    """
+    Rules that are below max_uses and, for this user, below max_uses_per_user. The counters
+    are read fresh (at most two queries); the index carries no counters, since uses given
+    back by expired bookings do not rebuild it.
+    """
+    capped = [r.id for r in rules if r.max_uses is not None]
+    uses = dict(Promo.objects.filter(pk__in=capped).values_list("id", "uses")) if capped else {}
+    per_user = [r.id for r in rules if r.max_uses_per_user is not None]
+    mine = {}
+    if per_user and user_id is not None:
+        mine = dict(
+            PromoUsage.objects.filter(promo_id__in=per_user, user_id=user_id).values_list(
+                "promo_id", "uses"
+            )
+        )
+    return [
+        r for r in rules
+        if (r.max_uses is None or uses.get(r.id, r.max_uses) < r.max_uses)
+        and (r.max_uses_per_user is None or mine.get(r.id, 0) < r.max_uses_per_user)
+    ]
+
+
+def select_promo(
+    schedule, seats, ladder, code="", user_id=None, exclude=()
+) -> tuple[PromoRule | None, Decimal]:
+    """
+    (promo, discount) for these seats at the ladder's current prices: the entered `code`,
+    or else the best automatic offer with uses left for `user_id` and not in `exclude`
+    ((None, 0) if none applies). Raises ValueError for a code that does not exist or does
+    not apply to this booking.
+    """
+    index = get_promo_index()
+    day = timezone.localtime(schedule.departure_dt).date()
+    operator_id = schedule.bus.operator_id
+    layout = layout_for_bus(schedule.bus)
+
+    def seat_type_of(label):
+        i = layout.index.get(str(label or "").strip())
+        return layout.types[i] if i is not None and i < len(layout.types) else ""
+
+    code = normalize_code(code)
+    if code:
+        rule = index.by_code.get(code)
+        if rule is None or not rule.applies_to(schedule.route_id, operator_id, day):
+            raise ValueError("This promo code is not valid for this trip.")
+        discount = rule.discount_for(_eligible_total(rule, ladder, seats, seat_type_of))
+        if not discount:
+            raise ValueError("This promo code does not apply to the selected seats.")
+        return rule, discount
+
+    offers = [
+        rule for rule in index.offers(schedule.route_id, day)
+        if rule.id not in exclude
+        and (rule.operator_id is None or rule.operator_id == operator_id)
+    ]
+    best, best_discount = None, Decimal("0.00")
+    for rule in _with_uses_left(offers, user_id):
+        discount = rule.discount_for(_eligible_total(rule, ladder, seats, seat_type_of))
+        if discount > best_discount:
+            best, best_discount = rule, discount
+    return best, best_discount
+
+
+def redeem_promo(rule: PromoRule, booking, discount: Decimal) -> PromoRedemption:
+    """
+    Count one use against the promo's caps and record it on the booking. Call inside the
+    checkout transaction; raises PromoUnavailable (roll back) when a cap is already reached.
+    """
+    promos = Promo.objects.filter(pk=rule.id, active=True)
+    if rule.max_uses is not None:
+        promos = promos.filter(uses__lt=rule.max_uses)
+    if not promos.update(uses=F("uses") + 1):
+        raise PromoUnavailable("This offer is no longer available.")
+    if rule.max_uses_per_user is not None:
+        usage, _ = PromoUsage.objects.get_or_create(promo_id=rule.id, user_id=booking.user_id)
+        if not PromoUsage.objects.filter(
+            pk=usage.pk, uses__lt=rule.max_uses_per_user
+        ).update(uses=F("uses") + 1):
+            raise PromoUnavailable("You have already used this offer.")
+    return PromoRedemption.objects.create(
+        booking=booking,
+        promo_id=rule.id,
+        user_id=booking.user_id,
+        discount=discount,
+        funded_by=rule.funded_by,
+    )
+
+
+def redeem_best_promo(
+    rule: PromoRule | None, discount: Decimal, booking, schedule, seats, ladder
+) -> tuple[PromoRule | None, Decimal]:
+    """
+    Redeem the promo select_promo chose; returns the (promo, discount) actually applied.
+    An entered code that hit a cap raises PromoUnavailable. An automatic offer that did is
+    skipped for the next best offer, or none, so a used-up offer never blocks checkout.
+    """
+    tried = set()
+    while rule is not None:
+        try:
+            # Savepoint: a cap hit after Promo.uses moved must give that use back.
+            with transaction.atomic():
+                redeem_promo(rule, booking, discount)
+            return rule, discount
+        except PromoUnavailable:
+            if rule.code:
+                raise
+            tried.add(rule.id)
+            rule, discount = select_promo(
+                schedule, seats, ladder, user_id=booking.user_id, exclude=tried
+            )
+    return None, Decimal("0.00")
+
+
+def settle_promo_redemptions(booking_ids, status: str) -> None:
+    """
+    Follow booking status changes: CONFIRMED marks RESERVED redemptions USED; EXPIRED /
+    CANCELLED / REFUNDED release RESERVED ones and give their uses back. Idempotent.
+    """
+    reserved = PromoRedemption.objects.filter(booking_id__in=booking_ids, status="RESERVED")
+    if status == "CONFIRMED":
+        reserved.update(status="USED")
+        return
+    if status not in ("EXPIRED", "CANCELLED", "REFUNDED"):
+        return
+    for pk, promo_id, user_id in reserved.values_list("id", "promo_id", "user_id"):
+        # Only the caller that flips the row gives the uses back.
+        if not PromoRedemption.objects.filter(pk=pk, status="RESERVED").update(status="RELEASED"):
+            continue
+        Promo.objects.filter(pk=promo_id, uses__gt=0).update(uses=F("uses") - 1)
+        PromoUsage.objects.filter(promo_id=promo_id, user_id=user_id, uses__gt=0).update(
+            uses=F("uses") - 1
+        )
+
+
+def platform_discount(booking) -> Decimal:
+    """Discount on this booking funded by the platform (owed to the operator)."""
+    redemption = PromoRedemption.objects.filter(
+        booking_id=booking.pk, funded_by="PLATFORM"
+    ).exclude(status="RELEASED").values_list("discount", flat=True).first()
+    return redemption or Decimal("0.00")
@@ -0,0 +1,211 @@
+"""
+Seat-map payload for ScheduleSeatMapView, cached per schedule inventory version.
+
+The payload has two halves:
+  - static: bus layout (rows, cols, labels, types, orientations, decks) and route stops.
+    It is content-addressed by `layout_hash` and served by SeatLayoutView with
+    long-lived cache headers.
+  - dynamic: occupancy, gender hints, per-seat `bookable_for` and current fares (from the
+    dynamic price ladder), tagged with that `layout_hash`.
+
+Both are stored as (version, next_expiry, dynamic, static) under one cache key; a poll
+fetches that entry and the current inventory version in a single `get_many`. If both
+match (and no hold has lapsed nor a dynamic price step begun since the render), the cached
+payload, or a 304 for a matching If-None-Match, is returned without touching the DB.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.exceptions import NotFound
+
+from buses.layout import layout_for_bus
+from buses.models import Bus
+from common.models import RoutePattern, RoutePatternStop
+
+from .inventory import bump_inventory_version_now, get_inventory_version, inventory_version_key
+from .models import Schedule
+from .occupancy import schedule_occupancy
+from .dynamic_pricing import price_ladder
+
+SEAT_MAP_CACHE_PREFIX = "seatmap:v2:"
+SEAT_MAP_CACHE_TTL = getattr(settings, "SEAT_MAP_CACHE_SECONDS", 10 * 60)
+SEAT_LAYOUT_CACHE_PREFIX = "seatlayout:v1:"
+SEAT_LAYOUT_CACHE_TTL = getattr(settings, "SEAT_LAYOUT_CACHE_SECONDS", 24 * 60 * 60)
+
+
+def seat_map_cache_key(schedule_id: int) -> str:
+    return f"{SEAT_MAP_CACHE_PREFIX}{schedule_id}"
+
+
+def seat_layout_cache_key(lhash: str) -> str:
+    return f"{SEAT_LAYOUT_CACHE_PREFIX}{lhash}"
+
+
+def seat_map_etag(schedule_id: int, version: int, include_layout: bool = True) -> str:
+    kind = "sm" if include_layout else "smo"
+    return f'W/"{kind}-{schedule_id}-{version}"'
+
+
+def build_layout_payload(bus, route_pattern=None) -> dict:
+    """Static part of the seat map: bus layout plus route-pattern stops."""
+    route_stops = []
+    if route_pattern is not None:
+        for st in route_pattern.stops.all():
+            route_stops.append({
+                'order': st.order,
+                'name': st.name,
+                'lat': str(st.lat) if st.lat is not None else None,
+                'lng': str(st.lng) if st.lng is not None else None,
+            })
+    payload = {'layout': layout_for_bus(bus).to_payload(), 'route_stops': route_stops}
+    if route_pattern is not None:
+        payload['route_pattern_name'] = route_pattern.name
+    return payload
+
+
+def layout_hash(bus_id: int, route_pattern_id, static: dict) -> str:
+    """
+    Content-addressed id for a static layout payload: "<bus>-<pattern or 0>-<digest>".
+    The ids let a cache miss be rebuilt; the digest changes whenever the content does.
+    """
+    raw = json.dumps(static, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return f"{bus_id}-{route_pattern_id or 0}-{hashlib.sha1(raw).hexdigest()[:16]}"
+
+
+def _remember_layout(lhash: str, static: dict) -> None:
+    try:
+        cache.add(seat_layout_cache_key(lhash), static, SEAT_LAYOUT_CACHE_TTL)
+    except Exception:
+        pass
+
+
+def build_seat_map_payload(schedule) -> tuple[dict, dict, float | None]:
+    """
+    Render the seat map as (dynamic, static, next_expiry): occupancy / fares referencing
+    `layout_hash`, the static layout payload, and when it goes stale (next hold expiry or
+    next dynamic price step).
+    """
+    pattern = schedule.route_pattern if schedule.route_pattern_id else None
+    static = build_layout_payload(schedule.bus, pattern)
+    lhash = layout_hash(schedule.bus_id, schedule.route_pattern_id, static)
+    _remember_layout(lhash, static)
+    occupancy = schedule_occupancy(schedule)
+    occupied, seat_gender = occupancy.occupied_and_genders()
+    occupied_details = [{'label': s, 'gender': seat_gender.get(s)} for s in sorted(occupied)]
+    prices = price_ladder(schedule)
+    dynamic = {
+        'layout_hash': lhash,
+        'occupied': list(occupied),
+        'occupied_details': occupied_details,
+        'fare': str(schedule.fare),
+        'seat_fares': prices.seat_prices(),
+        'bookable_for': occupancy.bookable_for(),
+    }
+    # Re-render when a hold lapses or a dynamic price step begins, whichever comes first.
+    expiries = [t for t in (occupancy.next_expiry, prices.valid_until()) if t is not None]
+    return dynamic, static, min(expiries) if expiries else None
+
+
+def _load_schedule(pk: int):
+    schedule = (
+        Schedule.objects.select_related('bus', 'route_pattern')
+        .prefetch_related(
+            Prefetch(
+                'route_pattern__stops',
+                queryset=RoutePatternStop.objects.order_by('order'),
+            )
+        )
+        .filter(pk=pk)
+        .first()
+    )
+    if not schedule:
+        raise NotFound('Schedule not found')
+    if schedule.status != 'ACTIVE':
+        raise NotFound('Schedule is not available')
+    return schedule
+
+
+def cached_seat_map(pk: int, include_layout: bool = True) -> tuple[str, dict]:
+    """
+    (etag, payload) for an ACTIVE schedule; raises NotFound otherwise.
+    With include_layout=False only the dynamic part is returned (clients fetch the static
+    layout once via `layout_hash`).
+    """
+    vkey, pkey = inventory_version_key(pk), seat_map_cache_key(pk)
+    try:
+        got = cache.get_many([vkey, pkey])
+    except Exception:
+        got = {}
+    version = get_inventory_version(pk, got.get(vkey))
+    entry = got.get(pkey)
+    dynamic = static = None
+    if entry is not None:
+        e_version, next_expiry, dynamic, static = entry
+        if e_version != version:
+            dynamic = None
+        elif next_expiry is not None and time.time() >= next_expiry:
+            # A hold lapsed or a price step began since this render: move to a new version so clients refetch.
+            bump_inventory_version_now(pk)
+            version = get_inventory_version(pk)
+            dynamic = None
+
+    if dynamic is None:
+        schedule = _load_schedule(pk)
+        dynamic, static, next_expiry = build_seat_map_payload(schedule)
+        try:
+            cache.set(pkey, (version, next_expiry, dynamic, static), SEAT_MAP_CACHE_TTL)
+        except Exception:
+            pass
+    etag = seat_map_etag(pk, version, include_layout)
+    if include_layout:
+        return etag, {**static, **dynamic}
+    return etag, dynamic
+
+
+def cached_layout(lhash: str) -> dict:
+    """Static layout payload by hash; raises NotFound for unknown or superseded hashes."""
+    try:
+        static = cache.get(seat_layout_cache_key(lhash))
+    except Exception:
+        static = None
+    if static is not None:
+        return static
+    try:
+        bus_id, pattern_id, _ = lhash.split('-', 2)
+        bus_id, pattern_id = int(bus_id), int(pattern_id)
+    except ValueError:
+        raise NotFound('Layout not found')
+    bus = Bus.objects.filter(pk=bus_id).first()
+    pattern = None
+    if pattern_id:
+        pattern = (
+            RoutePattern.objects.prefetch_related(
+                Prefetch('stops', queryset=RoutePatternStop.objects.order_by('order'))
+            )
+            .filter(pk=pattern_id)
+            .first()
+        )
+    if bus is None or (pattern_id and pattern is None):
+        raise NotFound('Layout not found')
+    static = build_layout_payload(bus, pattern)
+    if layout_hash(bus_id, pattern_id, static) != lhash:
+        raise NotFound('Layout not found')
+    _remember_layout(lhash, static)
+    return static
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get('If-None-Match') or ''
+    if not header:
+        return False
+    candidates = {c.strip() for c in header.split(',')}
+    if '*' in candidates:
+        return True
+    weak = etag[2:] if etag.startswith('W/') else etag
+    return etag in candidates or weak in candidates
@@ -2,15 +2,14 @@ import json
 
 from rest_framework import serializers
 from .models import Schedule, BoardingPoint, DroppingPoint, Reservation, Booking, Payment, BusRating
-from common.serializers import RouteSerializer, RoutePatternSlimSerializer
+from common.serializers import RouteSerializer, RoutePatternSlimSerializer, SparseFieldsetMixin
 from buses.models import Bus
-from buses.utils import infer_layout_kind
+from buses.utils import bus_features
 
 
 class BusSlimSerializer(serializers.ModelSerializer):
     operator_name = serializers.CharField(source='operator.name', read_only=True)
     features = serializers.SerializerMethodField()
-    layout_kind = serializers.SerializerMethodField()
 
     class Meta:
         model = Bus
@@ -21,15 +20,10 @@ class BusSlimSerializer(serializers.ModelSerializer):
         )
 
     def get_features(self, obj):
-        try:
-            return json.loads(obj.features_json or '[]')
-        except Exception:
-            return []
+        return bus_features(obj.features_json)
 
-    def get_layout_kind(self, obj):
-        return infer_layout_kind(obj.seat_map_json or '')
 
-class ScheduleSerializer(serializers.ModelSerializer):
+class ScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     route = RouteSerializer(read_only=True)
     route_pattern = RoutePatternSlimSerializer(read_only=True)
     bus = BusSlimSerializer(read_only=True)
@@ -40,9 +34,18 @@ class ScheduleSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'route', 'route_pattern', 'bus', 'departure_dt', 'arrival_dt', 'fare', 'status',
             'fare_original', 'operator_promo_title', 'operator_offer_style', 'platform_promo_title',
-            'platform_promo_line',
+            'platform_promo_line', 'seats_total', 'seats_available', 'min_fare',
         )
 
+    # ?view=card: what a search result card shows (no route / pattern stops; route is known).
+    FIELD_VIEWS = {
+        'card': (
+            'id', 'bus', 'departure_dt', 'arrival_dt', 'fare', 'fare_original', 'min_fare',
+            'seats_total', 'seats_available', 'operator_promo_title', 'operator_offer_style',
+            'platform_promo_line',
+        ),
+    }
+
     def get_platform_promo_line(self, obj):
         from django.conf import settings as dj_settings
         if obj.platform_promo_title:
@@ -101,11 +104,11 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = (
-            'id', 'user', 'schedule', 'seats', 'amount', 'status', 'payment_id',
+            'id', 'user', 'schedule', 'seats', 'amount', 'discount_amount', 'status', 'payment_id',
             'boarding_point', 'dropping_point', 'contact_phone', 'state_of_residence',
             'whatsapp_opt_in', 'created_at', 'passenger_details', 'passenger_display_name',
         )
-        read_only_fields = ('user', 'status', 'payment_id', 'created_at')
+        read_only_fields = ('user', 'status', 'payment_id', 'created_at', 'discount_amount')
 
     def get_passenger_details(self, obj):
         try:
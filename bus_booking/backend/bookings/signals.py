@@ -1,41 +1,179 @@
 import json
+from datetime import timedelta
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import Booking, OperatorSale
+from buses.models import Bus
+from common.models import Route, RoutePattern, RoutePatternStop
+
+from .availability import (
+    AVAILABILITY_FIELDS, refresh_availability, refresh_availability_on_commit,
+)
+from .booking_state import sync_operator_sale
+from .inventory import bump_inventory_version, reset_inventory_versions
+from .journeys import invalidate_journeys
+from .models import Booking, BookingSeat, FareRule, Promo, Reservation, Schedule
+from .occupancy import invalidate_occupancy
+from .promos import invalidate_promo_index, settle_promo_redemptions
 
 
 @receiver(post_save, sender=Booking)
 def sync_operator_sale_from_booking(sender, instance: Booking, **kwargs):
     """Keep OperatorSale in sync for confirmed / refunded / cancelled bookings."""
-    if instance.status == "CONFIRMED":
+    sync_operator_sale(instance)
+
+
+@receiver(post_save, sender=Booking)
+def sync_booking_seats_from_booking(sender, instance: Booking, created, **kwargs):
+    """
+    Create one BookingSeat per seat when a booking is created; mirror later status changes.
+    On create, an IntegrityError from the live-seat unique constraint means the seat is taken.
+    """
+    if created:
+        from .seat_rules import seat_genders_from_passenger_details
+
         try:
             seats = json.loads(instance.seats or "[]")
         except Exception:
             seats = []
-        n = len(seats) if seats else 1
-        op_id = instance.schedule.bus.operator_id
-        sale, created = OperatorSale.objects.get_or_create(
-            booking=instance,
-            defaults={
-                "operator_id": op_id,
-                "schedule_id": instance.schedule_id,
-                "gross_amount": instance.amount,
-                "seat_count": max(1, n),
-                "currency": "INR",
-                "confirmed_at": timezone.now(),
-                "reversal_status": "",
-            },
+        genders = seat_genders_from_passenger_details(instance.passenger_details)
+        BookingSeat.objects.bulk_create(
+            [
+                BookingSeat(
+                    schedule_id=instance.schedule_id,
+                    seat_no=str(s),
+                    booking=instance,
+                    gender=genders.get(str(s), ""),
+                    status=instance.status,
+                )
+                for s in dict.fromkeys(seats)
+            ]
         )
-        if not created:
-            OperatorSale.objects.filter(pk=sale.pk).update(
-                operator_id=op_id,
-                schedule_id=instance.schedule_id,
-                gross_amount=instance.amount,
-                seat_count=max(1, n),
-                reversal_status="",
+    else:
+        BookingSeat.objects.filter(booking=instance).exclude(status=instance.status).update(
+            status=instance.status
+        )
+
+
+@receiver(post_save, sender=Booking)
+def settle_booking_promo(sender, instance: Booking, created, **kwargs):
+    """Confirmed bookings keep their promo use; expired / cancelled ones give it back."""
+    if not created:
+        settle_promo_redemptions([instance.pk], instance.status)
+
+
+# Fields whose change frees or takes seats (for Bus: changes the seat layout).
+_OCCUPANCY_FIELDS = {
+    Booking: ("schedule_id", "seats", "status"),
+    Reservation: ("schedule_id", "seat_no", "status", "expires_at"),
+    Bus: ("seat_map_json",),
+}
+
+
+def _occupancy_state(sender, instance) -> tuple:
+    # __dict__ so deferred fields are not loaded just to be compared.
+    return tuple(instance.__dict__.get(f) for f in _OCCUPANCY_FIELDS[sender])
+
+
+def _occupancy_changed(sender, instance, created: bool) -> bool:
+    """Did this save touch the occupancy fields since load / the last save?"""
+    before = getattr(instance, "_loaded_occupancy", None)
+    instance._loaded_occupancy = after = _occupancy_state(sender, instance)
+    return created or before != after
+
+
+@receiver(post_init, sender=Booking)
+@receiver(post_init, sender=Reservation)
+@receiver(post_init, sender=Bus)
+def remember_occupancy_fields(sender, instance, **kwargs):
+    instance._loaded_occupancy = _occupancy_state(sender, instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Reservation)
+def invalidate_schedule_occupancy(sender, instance, created, **kwargs):
+    """A hold / booking save that frees or takes seats drops the cached occupancy bitmap."""
+    if _occupancy_changed(sender, instance, created):
+        invalidate_occupancy(instance.schedule_id)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Reservation)
+def invalidate_deleted_occupancy(sender, instance, **kwargs):
+    invalidate_occupancy(instance.schedule_id)
+
+
+@receiver(post_save, sender=Schedule)
+def bump_schedule_inventory_version(sender, instance: Schedule, created, **kwargs):
+    """Fare / status / pattern edits change the seat-map payload."""
+    if not created:
+        bump_inventory_version(instance.pk)
+
+
+@receiver(post_save, sender=Schedule)
+def refresh_schedule_availability(sender, instance: Schedule, **kwargs):
+    """Bus / fare edits change seats_total and the fare range."""
+    values = refresh_availability(instance.pk)
+    if values is not None:
+        for name, value in zip(AVAILABILITY_FIELDS, values):
+            setattr(instance, name, value)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def schedules_changed_for_journeys(sender, instance, **kwargs):
+    """Timetable or route graph edits invalidate cached connecting-journey searches."""
+    invalidate_journeys()
+
+
+@receiver(post_save, sender=Bus)
+def reset_bus_schedule_versions(sender, instance: Bus, created, **kwargs):
+    """Bus edits change its schedules' seat maps; seat layout edits also their seats_total."""
+    layout_changed = _occupancy_changed(sender, instance, created)
+    if not created:
+        reset_inventory_versions(instance.schedules.values_list("id", flat=True))
+        if layout_changed:
+            upcoming = instance.schedules.filter(
+                departure_dt__gte=timezone.now() - timedelta(days=1)
             )
-    elif instance.status in ("REFUNDED", "CANCELLED"):
-        OperatorSale.objects.filter(booking=instance).update(reversal_status=instance.status)
+            for schedule_id in upcoming.values_list("id", flat=True):
+                refresh_availability_on_commit(schedule_id)
+
+
+@receiver(post_save, sender=RoutePattern)
+@receiver(post_delete, sender=RoutePattern)
+@receiver(post_save, sender=RoutePatternStop)
+@receiver(post_delete, sender=RoutePatternStop)
+def reset_pattern_schedule_versions(sender, instance, **kwargs):
+    """Route stops are part of the seat-map payload."""
+    pattern_id = instance.pk if sender is RoutePattern else instance.pattern_id
+    reset_inventory_versions(
+        Schedule.objects.filter(route_pattern_id=pattern_id).values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=FareRule)
+@receiver(post_delete, sender=FareRule)
+def reprice_rule_schedules(sender, instance: FareRule, **kwargs):
+    """
+    Rule edits change current seat prices of upcoming trips. Dropping their versions is
+    enough for the seat map and payment (price ladders rebuild on the next read). Their
+    stored fare range is marked due in one UPDATE; the expiry sweeper recounts it
+    (availability.refresh_due_fares) instead of this request.
+    """
+    now = timezone.now()
+    schedules = Schedule.objects.filter(departure_dt__gte=now)
+    if instance.operator_id is not None:
+        schedules = schedules.filter(bus__operator_id=instance.operator_id)
+    reset_inventory_versions(schedules.values_list("id", flat=True))
+    schedules.update(fares_valid_until=now)
+
+
+@receiver(post_save, sender=Promo)
+@receiver(post_delete, sender=Promo)
+def promos_changed(sender, instance, **kwargs):
+    invalidate_promo_index()
@@ -0,0 +1,147 @@
+"""
+Expire lapsed seat holds and abandoned unpaid bookings.
+
+Run periodically via `python manage.py expire_holds` (cron) or `expire_holds --interval 60`
+(long-running worker). Each pass walks the (status, expires_at) indexes in batches:
+
+  - Reservation PENDING with expires_at <= now  → EXPIRED
+  - Booking PENDING with expires_at <= now and no successful payment → EXPIRED through
+    the booking state machine (booking_state.expire_bookings): its BookingSeat rows and
+    linked holds follow, freeing the seats, and its promo use is given back
+
+Redis holds owned by the affected users are released and occupancy caches invalidated.
+Upcoming schedules whose stored fare range went stale (a dynamic price step began or a fare
+rule changed) are recounted (availability.refresh_due_fares).
+Old EXPIRED / CANCELLED reservations and Idempotency-Key responses past their replay window
+are purged so the tables stay small.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from common.idempotency import purge_idempotency_keys
+
+from .availability import refresh_due_fares
+from .booking_state import expire_bookings
+from .lock import release_seats as release_redis_holds
+from .models import Booking, Reservation
+from .occupancy import invalidate_occupancy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _release_holds(holds: dict[tuple[int, int], set[str]]) -> None:
+    """holds: (schedule_id, user_id) -> seat labels."""
+    for (schedule_id, user_id), seats in holds.items():
+        release_redis_holds(schedule_id, sorted(seats), user_id)
+    for schedule_id in {sid for sid, _ in holds}:
+        invalidate_occupancy(schedule_id)
+
+
+def expire_stale_reservations(now=None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Mark lapsed PENDING reservations EXPIRED. Returns the number of rows expired."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Reservation.objects.filter(status="PENDING", expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", "schedule_id", "seat_no", "reserved_by_id")[:batch_size]
+            )
+            if not batch:
+                break
+            n = Reservation.objects.filter(
+                id__in=[r[0] for r in batch], status="PENDING"
+            ).update(status="EXPIRED")
+            total += n
+            # Don't release a seat the same user has since re-reserved.
+            still_held = set(
+                Reservation.objects.filter(
+                    status="PENDING",
+                    expires_at__gt=now,
+                    schedule_id__in={r[1] for r in batch},
+                    seat_no__in={r[2] for r in batch},
+                ).values_list("schedule_id", "seat_no", "reserved_by_id")
+            )
+            holds = defaultdict(set)
+            for _, sid, seat, uid in batch:
+                if (sid, seat, uid) not in still_held:
+                    holds[(sid, uid)].add(seat)
+            _release_holds(holds)
+        if len(batch) < batch_size:
+            break
+    return total
+
+
+def expire_abandoned_bookings(now=None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Mark unpaid PENDING bookings past expires_at EXPIRED and free their seats."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Booking.objects.filter(status="PENDING", expires_at__lte=now)
+                .exclude(payment__status="SUCCESS")
+                .order_by("expires_at")
+                .values_list("id", "schedule_id", "user_id", "seats")[:batch_size]
+            )
+            if not batch:
+                break
+            expired = set(expire_bookings([b[0] for b in batch]))
+            total += len(expired)
+            holds = defaultdict(set)
+            for booking_id, sid, uid, seats_raw in batch:
+                if booking_id not in expired:
+                    continue
+                try:
+                    seats = json.loads(seats_raw or "[]")
+                except Exception:
+                    seats = []
+                holds[(sid, uid)].update(str(s) for s in seats)
+            _release_holds(holds)
+        if len(batch) < batch_size:
+            break
+    return total
+
+
+def purge_old_reservations(older_than_days: int, now=None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Delete EXPIRED / CANCELLED reservations whose hold ended more than N days ago."""
+    if older_than_days <= 0:
+        return 0
+    cutoff = (now or timezone.now()) - timedelta(days=older_than_days)
+    total = 0
+    for status in ("EXPIRED", "CANCELLED"):
+        while True:
+            ids = list(
+                Reservation.objects.filter(status=status, expires_at__lte=cutoff)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += Reservation.objects.filter(id__in=ids).delete()[0]
+            if len(ids) < batch_size:
+                break
+    return total
+
+
+def sweep(batch_size: int = DEFAULT_BATCH_SIZE, purge_days: int = 0) -> dict:
+    """One full pass; returns counts for logging."""
+    now = timezone.now()
+    result = {
+        "reservations_expired": expire_stale_reservations(now, batch_size),
+        "bookings_expired": expire_abandoned_bookings(now, batch_size),
+        "reservations_purged": purge_old_reservations(purge_days, now, batch_size),
+        "idempotency_keys_purged": purge_idempotency_keys(now, batch_size),
+        "fares_refreshed": refresh_due_fares(now, batch_size),
+    }
+    logger.info("expire_holds sweep: %s", result)
+    return result
@@ -1,3 +1,324 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from buses.models import Bus, Operator
+from common.models import Route, RouteSearchDay
+
+from .availability import batch_availability, refresh_due_fares
+from .booking_state import expire_bookings, transition
+from .dynamic_pricing import price_ladder
+from .inventory import get_inventory_version
+from .layout_presets import LAYOUT_SEATER_2X2_AISLE
+from .models import Booking, BookingSeat, FareRule, Promo, Schedule
+from .occupancy import build_occupancy, occupancy_cache_key, schedule_occupancy
+from .popularity import flush_search_counters
+from .promos import (
+    PromoUnavailable, invalidate_promo_index, redeem_best_promo, select_promo,
+)
+
+
+class CheckoutTestCase(TestCase):
+    """One active schedule a few days out and a logged-in passenger."""
+
+    def setUp(self):
+        cache.clear()
+        # The promo index lives in the process; drop the previous test's.
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_promo_index()
+        operator = Operator.objects.create(
+            name='Test Travels', contact_info=json.dumps({}), kyc_status='APPROVED'
+        )
+        bus = Bus.objects.create(
+            operator=operator,
+            registration_no='KA01TT0001',
+            capacity=48,
+            seat_map_json=json.dumps(LAYOUT_SEATER_2X2_AISLE),
+        )
+        self.route = Route.objects.create(origin='Bengaluru', destination='Mysore')
+        departure = timezone.now() + timedelta(days=5)
+        self.schedule = Schedule.objects.create(
+            bus=bus,
+            route=self.route,
+            departure_dt=departure,
+            arrival_dt=departure + timedelta(hours=4),
+            fare='899.00',
+            status='ACTIVE',
+        )
+        self.user = self.make_user('rider')
+        self.client = self.client_for(self.user)
+
+    def make_promo(self, **fields):
+        # Promo changes reach the index after commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            return Promo.objects.create(**fields)
+
+    def make_user(self, username):
+        return get_user_model().objects.create_user(username=username, password='x')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def checkout(self, client, seats, **extra):
+        return client.post(
+            '/api/create-payment/',
+            {'schedule_id': self.schedule.id, 'seats': seats, **extra},
+            format='json',
+        )
+
+
+class AutoOfferCapTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.offer = self.make_promo(
+            title='100 OFF', route=self.route, discount_flat=Decimal('100.00'), max_uses=1
+        )
+
+    def test_used_up_offer_is_not_applied(self):
+        first = self.checkout(self.client, ['1A'])
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(Booking.objects.get(pk=first.data['booking_id']).discount_amount, 100)
+
+        second = self.checkout(self.client_for(self.make_user('late')), ['2A'])
+        self.assertEqual(second.status_code, 201)
+        booking = Booking.objects.get(pk=second.data['booking_id'])
+        self.assertEqual(booking.discount_amount, 0)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.uses, 1)
+
+    def test_per_user_cap_skips_offer_for_that_user_only(self):
+        self.offer.max_uses, self.offer.max_uses_per_user = None, 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offer.save()
+        self.assertEqual(self.checkout(self.client, ['1A']).status_code, 201)
+
+        again = self.checkout(self.client, ['2A'])
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(Booking.objects.get(pk=again.data['booking_id']).discount_amount, 0)
+
+        other = self.checkout(self.client_for(self.make_user('other')), ['3A'])
+        self.assertEqual(Booking.objects.get(pk=other.data['booking_id']).discount_amount, 100)
+
+    def test_offer_full_when_index_was_built_comes_back_when_uses_are_released(self):
+        first = self.checkout(self.client, ['1A'])
+        self.assertEqual(Booking.objects.get(pk=first.data['booking_id']).discount_amount, 100)
+        # A fresh index is built while the only use is reserved.
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_promo_index()
+        ladder = price_ladder(self.schedule)
+        self.assertEqual(select_promo(self.schedule, ['2A'], ladder), (None, 0))
+
+        expire_bookings([first.data['booking_id']])
+        rule, discount = select_promo(self.schedule, ['2A'], ladder)
+        self.assertEqual((rule.id, discount), (self.offer.id, 100))
+
+    def test_offer_used_up_after_selection_falls_back(self):
+        ladder = price_ladder(self.schedule)
+        rule, discount = select_promo(self.schedule, ['1A'], ladder, user_id=self.user.id)
+        self.assertEqual(rule.id, self.offer.id)
+        Promo.objects.filter(pk=self.offer.pk).update(uses=1)  # another checkout won the race
+        booking = Booking.objects.create(
+            user=self.user, schedule=self.schedule, seats='["1A"]', amount='799.00'
+        )
+        applied, applied_discount = redeem_best_promo(
+            rule, discount, booking, self.schedule, ['1A'], ladder
+        )
+        self.assertIsNone(applied)
+        self.assertEqual(applied_discount, 0)
+
+    def test_offer_used_up_during_checkout_with_client_amount_asks_again(self):
+        quoted = self.client.post(
+            '/api/promos/quote/',
+            {'schedule_id': self.schedule.id, 'seats': ['1A']},
+            format='json',
+        ).data
+        self.assertEqual(quoted['discount'], '100.00')
+        # The offer runs out between validating the client's amount and redeeming it.
+        with mock.patch(
+            'bookings.promos.redeem_promo', side_effect=PromoUnavailable('Promo has run out.')
+        ):
+            response = self.checkout(self.client, ['1A'], amount=quoted['amount'])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['expected'], quoted['subtotal'])
+        self.assertFalse(Booking.objects.exists())
+
+        # Without a client amount the checkout goes ahead at the recomputed price.
+        with mock.patch(
+            'bookings.promos.redeem_promo', side_effect=PromoUnavailable('Promo has run out.')
+        ):
+            response = self.checkout(self.client, ['1A'])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['amount'], int(Decimal(quoted['subtotal']) * 100))
+
+    def test_used_up_code_still_fails_checkout(self):
+        self.make_promo(code='ONCE', discount_flat=Decimal('50.00'), max_uses=1)
+        self.assertEqual(self.checkout(self.client, ['1A'], promo_code='ONCE').status_code, 201)
+        late = self.checkout(self.client_for(self.make_user('late')), ['2A'], promo_code='ONCE')
+        self.assertEqual(late.status_code, 409)
+        self.assertFalse(Booking.objects.filter(seats='["2A"]').exists())
+
+
+@override_settings(DEMO_PAYMENTS=True, RAZORPAY_VERIFY_WEBHOOK=False)
+@mock.patch('bookings.notifications.notify_booking_confirmed')
+@mock.patch('bookings.ticket_generator.save_ticket_to_booking', return_value='')
+class BookingTransitionTests(CheckoutTestCase):
+    def pay(self, response):
+        """Deliver the gateway's payment.captured webhook for a checkout response."""
+        return APIClient().post(
+            '/api/payment/webhook/',
+            {
+                'event': 'payment.captured',
+                'payload': {'payment': {'entity': {
+                    'id': f"pay_{response.data['booking_id']}",
+                    'order_id': response.data['order_id'],
+                }}},
+            },
+            format='json',
+        )
+
+    def seat_statuses(self, booking_id):
+        return list(BookingSeat.objects.filter(booking_id=booking_id).values_list('status', flat=True))
+
+    def test_paid_after_expiry_confirms_when_seats_are_free(self, *_):
+        checkout = self.checkout(self.client, ['1A', '1B'])
+        booking_id = checkout.data['booking_id']
+        self.assertEqual(expire_bookings([booking_id]), [booking_id])
+        self.assertEqual(self.seat_statuses(booking_id), ['EXPIRED', 'EXPIRED'])
+
+        self.assertEqual(self.pay(checkout).status_code, 200)
+        booking = Booking.objects.get(pk=booking_id)
+        self.assertEqual(booking.status, 'CONFIRMED')
+        self.assertEqual(booking.payment_id, f'pay_{booking_id}')
+        self.assertEqual(self.seat_statuses(booking_id), ['CONFIRMED', 'CONFIRMED'])
+
+    def test_paid_after_seats_were_resold_is_refunded(self, *_):
+        checkout = self.checkout(self.client, ['1A'])
+        booking_id = checkout.data['booking_id']
+        expire_bookings([booking_id])
+        resold = self.checkout(self.client_for(self.make_user('next')), ['1A'])
+        self.assertEqual(resold.status_code, 201)
+
+        response = self.pay(checkout)
+        self.assertTrue(response.data.get('refunded'))
+        booking = Booking.objects.get(pk=booking_id)
+        self.assertEqual(booking.status, 'REFUNDED')
+        self.assertEqual(booking.refund_id, 'refund_demo')
+        self.assertEqual(booking.refund_amount, booking.amount)
+        self.assertEqual(self.seat_statuses(booking_id), ['REFUNDED'])
+        self.assertEqual(self.seat_statuses(resold.data['booking_id']), ['PENDING'])
+
+    def test_cancel_confirmed_booking_refunds(self, *_):
+        checkout = self.checkout(self.client, ['3C'])
+        booking_id = checkout.data['booking_id']
+        self.pay(checkout)
+
+        response = self.client.post(f'/api/bookings/{booking_id}/cancel/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'REFUNDED')
+        booking = Booking.objects.get(pk=booking_id)
+        self.assertEqual(booking.status, 'REFUNDED')
+        self.assertEqual(booking.refund_id, 'refund_demo')
+        self.assertEqual(self.seat_statuses(booking_id), ['REFUNDED'])
+        # The seat can be booked again.
+        self.assertEqual(self.checkout(self.client, ['3C']).status_code, 201)
+
+    def test_transition_from_stale_status_changes_nothing(self, *_):
+        booking_id = self.checkout(self.client, ['4A']).data['booking_id']
+        stale = Booking.objects.get(pk=booking_id)
+        expire_bookings([booking_id])
+        self.assertFalse(transition(stale, 'CANCELLED', cancelled_by='passenger'))
+        self.assertEqual(Booking.objects.get(pk=booking_id).status, 'EXPIRED')
+
+
+class IdempotencyKeyTests(CheckoutTestCase):
+    def checkout_with_key(self, seats, key='checkout-1'):
+        return self.client.post(
+            '/api/create-payment/',
+            {'schedule_id': self.schedule.id, 'seats': seats},
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_first_response(self):
+        first = self.checkout_with_key(['5A'])
+        self.assertEqual(first.status_code, 201)
+        replay = self.checkout_with_key(['5A'])
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.data['booking_id'], first.data['booking_id'])
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 1)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self.assertEqual(self.checkout_with_key(['5A']).status_code, 201)
+        mismatch = self.checkout_with_key(['6A'])
+        self.assertEqual(mismatch.status_code, 422)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 1)
+
+
+class OccupancySnapshotTests(CheckoutTestCase):
+    def test_snapshot_built_before_a_write_is_not_served_after_it(self):
+        # A reader builds from the rows before the checkout commits...
+        version = get_inventory_version(self.schedule.pk)
+        before = build_occupancy(self.schedule)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.checkout(self.client, ['1A']).status_code, 201)
+        # ...and stores its snapshot after the checkout's invalidation ran.
+        cache.set(occupancy_cache_key(self.schedule.pk), (version, before.to_cache()))
+
+        self.assertTrue(schedule_occupancy(self.schedule).is_occupied('1A'))
+
+
+class SearchCountTests(CheckoutTestCase):
+    def search(self, **params):
+        return APIClient().get('/api/schedules/', {'route_id': self.route.id, **params})
+
+    def searches_stored(self):
+        row = RouteSearchDay.objects.filter(route=self.route).first()
+        return row.searches if row is not None else 0
+
+    @mock.patch('bookings.popularity.SEARCH_FLUSH_EVERY', 2)
+    def test_searches_are_counted_in_cache_and_flushed(self):
+        self.search()
+        self.assertEqual(self.searches_stored(), 0)
+        self.search()
+        self.assertEqual(self.searches_stored(), 2)
+        self.search()
+        self.search(cursor='not-a-first-page')
+        self.search(date='not-a-date')
+        self.assertEqual(flush_search_counters(), 1)
+        self.assertEqual(self.searches_stored(), 3)
+        self.assertEqual(flush_search_counters(), 0)
+
+
+class StoredFareRangeTests(CheckoutTestCase):
+    def fare_range(self):
+        [row] = batch_availability([self.schedule.pk])
+        return row['min_fare'], row['max_fare']
+
+    def test_fare_rule_edit_is_picked_up_by_the_sweeper(self):
+        self.schedule.seat_fares_json = json.dumps({'1A': '500.00'})
+        self.schedule.save()
+        self.assertEqual(self.fare_range(), ('500.00', '899.00'))
+
+        # +20% while the trip is more than 100 hours away (it is 120 now).
+        FareRule.objects.create(min_hours_before=100, adjust_pct=Decimal('20'))
+        self.assertEqual(self.fare_range(), ('500.00', '899.00'))
+        self.assertEqual(refresh_due_fares(), 1)
+        self.assertEqual(self.fare_range(), ('600.00', '1078.80'))
+        ladder = price_ladder(self.schedule)
+        self.assertEqual(self.fare_range(), (str(ladder.price('1A')), str(ladder.price('2A'))))
+
+        # Due again only when the price step at 100 hours before departure begins.
+        self.assertEqual(refresh_due_fares(), 0)
+        self.schedule.refresh_from_db()
+        self.assertEqual(
+            self.schedule.fares_valid_until, self.schedule.departure_dt - timedelta(hours=100)
+        )
@@ -1,23 +1,29 @@
 from django.urls import path
 from .views import (
-    ScheduleListView, BoardingPointListView, DroppingPointListView,
-    ScheduleSeatMapView, ScheduleTrackView,
+    ScheduleListView, ScheduleAvailabilityView, RouteFareCalendarView,
+    JourneySearchView, BoardingPointListView, DroppingPointListView,
+    ScheduleSeatMapView, SeatLayoutView, ScheduleTrackView,
     ReserveView, CreatePaymentView, PaymentWebhookView, BookingListView,
     BookingDetailView,
     TicketView, TicketDownloadView, SubmitBusRatingView, BusReviewListView,
-    BookingCancelView,
+    BookingCancelView, PromoQuoteView,
 )
 
 urlpatterns = [
     path('buses/<int:bus_id>/reviews/', BusReviewListView.as_view(), name='bus_reviews'),
     path('schedules/', ScheduleListView.as_view(), name='schedule_list'),
+    path('routes/<int:route_id>/fare-calendar/', RouteFareCalendarView.as_view(), name='route_fare_calendar'),
+    path('journeys/', JourneySearchView.as_view(), name='journey_search'),
+    path('schedules/availability/', ScheduleAvailabilityView.as_view(), name='schedule_availability'),
     path('schedules/<int:pk>/seat-map/', ScheduleSeatMapView.as_view(), name='schedule_seat_map'),
+    path('seat-layouts/<str:layout_hash>/', SeatLayoutView.as_view(), name='seat_layout'),
     path('schedules/<int:pk>/track/', ScheduleTrackView.as_view(), name='schedule_track'),
     path('bookings/', BookingListView.as_view(), name='booking_list'),
     path('bookings/<int:pk>/', BookingDetailView.as_view(), name='booking_detail'),
     path('boarding-points/', BoardingPointListView.as_view(), name='boarding_point_list'),
     path('dropping-points/', DroppingPointListView.as_view(), name='dropping_point_list'),
     path('reserve/', ReserveView.as_view(), name='reserve'),
+    path('promos/quote/', PromoQuoteView.as_view(), name='promo_quote'),
     path('create-payment/', CreatePaymentView.as_view(), name='create_payment'),
     path('payment/webhook/', PaymentWebhookView.as_view(), name='payment_webhook'),
     path('bookings/<int:pk>/cancel/', BookingCancelView.as_view(), name='booking_cancel'),
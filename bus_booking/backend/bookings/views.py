@@ -1,15 +1,24 @@
-from datetime import timedelta
+from datetime import date, timedelta
 from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from django.db.models import Case, IntegerField, Prefetch, Q, Value, When
 from rest_framework.views import APIView
 
-from common.models import RoutePatternStop
-from .models import Schedule, ScheduleLocation, BoardingPoint, DroppingPoint, Reservation, Booking, Payment, BusRating
+from common.dates import local_day
+from common.idempotency import idempotent
+from common.models import Route, RoutePatternStop
+from common.pagination import KeysetPagination, keyset_order_by
+from common.stop_pairs import patterns_serving
+from .models import (
+    LIVE_BOOKING_STATUSES, Schedule, ScheduleLocation, BoardingPoint, DroppingPoint, Reservation,
+    Booking, BookingSeat, Payment, BusRating,
+)
 from .rating_utils import refresh_bus_rating_aggregate
+from buses.layout import layout_for_bus
 from buses.models import Bus
 
 from .serializers import (
@@ -22,38 +31,211 @@ import razorpay
 from django.conf import settings
 from decimal import Decimal
 
-from .lock import try_hold_seats, release_seats
+from .lock import lock_schedule_row, try_hold_seats, release_seats
+from .booking_state import (
+    BOOKING_TRANSITIONS, InvalidTransition, confirm_booking, link_holds, transition,
+)
+from .availability import (
+    MAX_BATCH_SCHEDULES, MAX_FARE_CALENDAR_DAYS, batch_availability, fare_calendar,
+)
+from .occupancy import invalidate_occupancy
 from .seat_rules import (
     get_occupied_and_seat_genders,
-    layout_labels_and_cols_from_bus,
     male_reserved_seat_adjacent_to_female,
 )
-from .pricing import merged_seat_fare_map, total_fare_for_seats
+from .journeys import search_journeys
+from .popularity import record_route_search
+from .dynamic_pricing import price_ladder
+from .promos import PromoUnavailable, redeem_best_promo, select_promo
+from .seat_map import cached_layout, cached_seat_map, etag_matches
+
+# ?sort= values for ScheduleListView (columns maintained by bookings/availability.py)
+# Field tuples double as keyset cursors (common/pagination.py); NULL min_fare sorts last.
+SCHEDULE_LIST_ORDERINGS = {
+    'departure': ('departure_dt', 'id'),
+    'price': ('min_fare', 'departure_dt', 'id'),
+    'seats': ('-seats_available', 'departure_dt', 'id'),
+}
+
 
 class ScheduleListView(generics.ListAPIView):
     serializer_class = ScheduleSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self):
+        sort = (self.request.query_params.get('sort') or '').strip().lower()
+        return SCHEDULE_LIST_ORDERINGS.get(sort, SCHEDULE_LIST_ORDERINGS['departure'])
+
+    def requested_fields(self):
+        """?view=card or ?fields=a,b (top-level ScheduleSerializer fields); None = all."""
+        return ScheduleSerializer.fields_from_query(self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        qs = (
-            Schedule.objects.select_related('route', 'route_pattern', 'bus', 'bus__operator')
-            .prefetch_related(
+        fields = self.requested_fields()
+        wanted = set(fields) if fields is not None else {'route', 'route_pattern', 'bus'}
+        qs = Schedule.objects.filter(status='ACTIVE')
+        # Only join / prefetch what the requested nested serializers will read.
+        related = [f for f in ('route', 'route_pattern') if f in wanted]
+        if 'bus' in wanted:
+            related += ['bus', 'bus__operator']
+        if related:
+            qs = qs.select_related(*related)
+        if 'bus' in wanted:
+            # layout_kind is a column now; the seat map text is only needed for seat selection.
+            qs = qs.defer('bus__seat_map_json')
+        if 'route_pattern' in wanted:
+            qs = qs.prefetch_related(
                 Prefetch(
                     'route_pattern__stops',
                     queryset=RoutePatternStop.objects.order_by('order'),
                 )
             )
-            .filter(status='ACTIVE')
-        )
         route_id = self.request.query_params.get('route_id')
-        date = self.request.query_params.get('date')
+        day_raw = (self.request.query_params.get('date') or '').strip()
         if route_id:
             qs = qs.filter(route_id=route_id)
-        if date:
-            qs = qs.filter(departure_dt__date=date)
+        if day_raw:
+            try:
+                day = date.fromisoformat(day_raw)
+            except ValueError:
+                return qs.none()
+            qs = qs.filter(**local_day('departure_dt', day))
+        if route_id and not self.request.query_params.get(self.paginator.cursor_query_param):
+            # One search per results list, not per page.
+            record_route_search(route_id)
+        # Sub-route search: any pattern stopping at from_stop and later at to_stop.
+        from_stop = (self.request.query_params.get('from_stop') or '').strip()
+        to_stop = (self.request.query_params.get('to_stop') or '').strip()
+        if from_stop and to_stop:
+            qs = qs.filter(route_pattern_id__in=patterns_serving(from_stop, to_stop))
+        min_seats = (self.request.query_params.get('min_seats') or '').strip()
+        if min_seats.isdigit():
+            qs = qs.filter(seats_available__gte=int(min_seats))
+        sort = (self.request.query_params.get('sort') or '').strip().lower()
+        if sort in SCHEDULE_LIST_ORDERINGS:
+            qs = qs.order_by(*keyset_order_by(SCHEDULE_LIST_ORDERINGS[sort]))
         return qs
 
 
+class ScheduleAvailabilityView(APIView):
+    """
+    POST { "schedule_ids": [1, 2, ...] } -> seats left and min/max seat fare per schedule,
+    for search result cards in one round trip (reads the denormalized Schedule columns).
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        raw = request.data.get('schedule_ids')
+        if not isinstance(raw, list) or not raw:
+            return Response({'detail': 'schedule_ids[] required'}, status=400)
+        try:
+            ids = list(dict.fromkeys(int(x) for x in raw))
+        except (TypeError, ValueError):
+            return Response({'detail': 'schedule_ids must be integers'}, status=400)
+        if len(ids) > MAX_BATCH_SCHEDULES:
+            return Response(
+                {'detail': f'At most {MAX_BATCH_SCHEDULES} schedule_ids per request'}, status=400
+            )
+        return Response({'results': batch_availability(ids)})
+
+
+class PromoQuoteView(APIView):
+    """
+    POST { "schedule_id", "seats": [...], "promo_code"? } -> seat subtotal, promo discount and
+    the amount create-payment will charge (the entered code, else the best automatic offer).
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        seats = request.data.get('seats')
+        try:
+            schedule_id = int(request.data.get('schedule_id'))
+        except (TypeError, ValueError):
+            schedule_id = None
+        if schedule_id is None or not isinstance(seats, list) or not seats:
+            return Response({'detail': 'schedule_id and seats[] required'}, status=400)
+        schedule = (
+            Schedule.objects.select_related('bus').filter(pk=schedule_id, status='ACTIVE').first()
+        )
+        if schedule is None:
+            return Response({'detail': 'Schedule not found'}, status=404)
+        ladder = price_ladder(schedule)
+        try:
+            promo, discount = select_promo(
+                schedule, seats, ladder, request.data.get('promo_code'),
+                user_id=request.user.id if request.user.is_authenticated else None,
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        subtotal = ladder.total(seats)
+        return Response({
+            'subtotal': str(subtotal),
+            'discount': str(discount),
+            'amount': str(subtotal - discount),
+            'promo': promo.payload() if promo is not None else None,
+        })
+
+
+class RouteFareCalendarView(APIView):
+    """
+    GET ?from=YYYY-MM-DD&days=30 -> per day: active trips, min fare and seats left on the
+    route, for a flexible-date strip (one grouped query instead of one search per date).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, route_id):
+        route = get_object_or_404(Route, pk=route_id)
+        today = timezone.localdate()
+        start_raw = (request.query_params.get('from') or '').strip()
+        if start_raw:
+            try:
+                start = date.fromisoformat(start_raw)
+            except ValueError:
+                return Response({'detail': 'Invalid from. Use YYYY-MM-DD.'}, status=400)
+        else:
+            start = today
+        start = max(start, today)
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'detail': 'days must be an integer'}, status=400)
+        days = max(1, min(days, MAX_FARE_CALENDAR_DAYS))
+        return Response({
+            'route_id': route.pk,
+            'from': start.isoformat(),
+            'days': fare_calendar(route.pk, start, days),
+        })
+
+
+class JourneySearchView(APIView):
+    """
+    GET ?from=Bengaluru&to=Chennai&date=YYYY-MM-DD -> direct route ids for the city pair and
+    one-transfer connections (feasible layover at a Route endpoint) departing that day.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        origin = (request.query_params.get('from') or '').strip()
+        destination = (request.query_params.get('to') or '').strip()
+        if not origin or not destination:
+            return Response({'detail': 'from and to are required'}, status=400)
+        day_raw = (request.query_params.get('date') or '').strip()
+        if day_raw:
+            try:
+                day = date.fromisoformat(day_raw)
+            except ValueError:
+                return Response({'detail': 'Invalid date. Use YYYY-MM-DD.'}, status=400)
+        else:
+            day = timezone.localdate()
+        result = search_journeys(origin, destination, day)
+        return Response({'date': day.isoformat(), **result})
+
+
 class BoardingPointListView(generics.ListAPIView):
     serializer_class = BoardingPointSerializer
     permission_classes = [AllowAny]
@@ -79,104 +261,36 @@ class DroppingPointListView(generics.ListAPIView):
 
 
 class ScheduleSeatMapView(generics.GenericAPIView):
-    """GET schedule seat layout and occupied seats for visual seat selection."""
+    """
+    GET schedule seat layout and occupied seats for visual seat selection.
+    Served from a per-inventory-version cache; honours If-None-Match with 304.
+    ?layout=0 returns only occupancy / fares plus `layout_hash` (see SeatLayoutView).
+    """
     permission_classes = [AllowAny]
 
     def get(self, request, pk):
-        import json
-        schedule = (
-            Schedule.objects.select_related('bus', 'route_pattern')
-            .prefetch_related(
-                Prefetch(
-                    'route_pattern__stops',
-                    queryset=RoutePatternStop.objects.order_by('order'),
-                )
-            )
-            .filter(pk=pk)
-            .first()
-        )
-        if not schedule:
-            return Response({'detail': 'Schedule not found'}, status=404)
-        if schedule.status != 'ACTIVE':
-            return Response({'detail': 'Schedule is not available'}, status=404)
-        bus = schedule.bus
-        try:
-            layout = json.loads(bus.seat_map_json or '{}')
-        except Exception:
-            layout = {}
-        rows = layout.get('rows') or 10
-        cols = layout.get('cols') or 4
-        labels = layout.get('labels')
-        types = layout.get('types')
-        if not labels:
-            labels = []
-            for r in range(1, rows + 1):
-                for c in range(cols):
-                    labels.append(f"{r}{chr(65 + c)}")
-        total = rows * cols
-        if not types or len(types) != total:
-            # Infer: empty label = aisle, else seater
-            types = []
-            for i in range(total):
-                lb = labels[i] if i < len(labels) else ""
-                types.append("aisle" if (lb == "" or lb is None) else "seater")
-        # Ensure types length matches (pad with seater if labels extended)
-        while len(types) < total:
-            types.append("seater")
-        types = types[:total]
-        orientations = layout.get("orientations")
-        if not isinstance(orientations, list):
-            orientations = []
-        orientations = [str(o).lower() if o else "portrait" for o in orientations][:total]
-        while len(orientations) < total:
-            orientations.append("portrait")
-        occupied, seat_gender = get_occupied_and_seat_genders(schedule)
-        occupied_details = [{'label': s, 'gender': seat_gender.get(s)} for s in sorted(occupied)]
-        route_stops = []
-        if schedule.route_pattern_id:
-            for st in schedule.route_pattern.stops.all():
-                route_stops.append({
-                    'order': st.order,
-                    'name': st.name,
-                    'lat': str(st.lat) if st.lat is not None else None,
-                    'lng': str(st.lng) if st.lng is not None else None,
-                })
-        hud = layout.get('has_upper_deck')
-        if hud is None:
-            has_upper_deck = True
-        else:
-            has_upper_deck = bool(hud)
-        deck_split_row = None
-        dsr = layout.get('deck_split_row')
-        if dsr is not None:
-            try:
-                d = int(dsr)
-                if 1 <= d < rows:
-                    deck_split_row = d
-            except (TypeError, ValueError):
-                pass
-        layout_payload = {
-            'rows': rows,
-            'cols': cols,
-            'labels': labels,
-            'types': types,
-            'orientations': orientations,
-            'has_upper_deck': has_upper_deck,
-        }
-        if deck_split_row is not None:
-            layout_payload['deck_split_row'] = deck_split_row
-        seat_fares_merged = merged_seat_fare_map(schedule, labels, types)
-        payload = {
-            'layout': layout_payload,
-            'occupied': list(occupied),
-            'occupied_details': occupied_details,
-            'fare': str(schedule.fare),
-            'seat_fares': seat_fares_merged,
-            'route_stops': route_stops,
-        }
-        if schedule.route_pattern_id:
-            payload['route_pattern_name'] = schedule.route_pattern.name
-        return Response(payload)
+        layout_param = (request.query_params.get('layout') or '1').strip().lower()
+        include_layout = layout_param not in ('0', 'false')
+        etag, payload = cached_seat_map(pk, include_layout=include_layout)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request, etag):
+            return Response(status=304, headers=headers)
+        return Response(payload, headers=headers)
+
+
+class SeatLayoutView(generics.GenericAPIView):
+    """
+    GET static seat layout + route stops by `layout_hash` (from the seat-map response).
+    The hash changes whenever the content does, so responses are cacheable indefinitely.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, layout_hash):
+        etag = f'"{layout_hash}"'
+        headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+        if etag_matches(request, etag):
+            return Response(status=304, headers=headers)
+        return Response(cached_layout(layout_hash), headers=headers)
 
 
 class ScheduleTrackView(generics.GenericAPIView):
@@ -233,6 +347,7 @@ class ReserveView(generics.CreateAPIView):
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         schedule_id = request.data.get('schedule_id')
         seats = request.data.get('seats', [])
@@ -252,50 +367,67 @@ class ReserveView(generics.CreateAPIView):
         if ok is False:
             return Response({'detail': f'Seat {failed} not available'}, status=409)
         # ok == True -> held in Redis
-        # ok is None -> Redis unavailable; fallback to DB check (existing code)
+        # ok is None -> Redis unavailable; the schedule row lock below serializes reservers instead
         use_db_check = (ok is None)
 
-        created = []
+        seats = list(dict.fromkeys(str(s) for s in seats))
+        now = timezone.now()
         try:
-            for seat in seats:
+            with transaction.atomic():
                 if use_db_check:
-                    conflict = Reservation.objects.filter(
+                    lock_schedule_row(schedule.id)
+                # One query for every requested seat: other users' live holds + live booked seats.
+                taken = set(
+                    Reservation.objects.filter(
+                        schedule=schedule, seat_no__in=seats, status='PENDING', expires_at__gt=now,
+                    )
+                    .exclude(reserved_by=request.user)
+                    .values_list('seat_no', flat=True)
+                    .union(
+                        BookingSeat.objects.filter(
+                            schedule=schedule, seat_no__in=seats, status__in=LIVE_BOOKING_STATUSES,
+                        ).values_list('seat_no', flat=True)
+                    )
+                )
+                conflict = next((s for s in seats if s in taken), None)
+                if conflict is not None:
+                    if not use_db_check:
+                        release_seats(schedule.id, seats, request.user.id)
+                    return Response({'detail': f'Seat {conflict} not available'}, status=409)
+
+                # A retried reserve extends this user's own live holds instead of duplicating them
+                # (try_hold_seats above already reset their Redis TTL to the same window).
+                mine = Reservation.objects.filter(
+                    schedule=schedule, seat_no__in=seats, reserved_by=request.user,
+                    status='PENDING', expires_at__gt=now,
+                )
+                existing = dict(mine.values_list('seat_no', 'id'))
+                if existing:
+                    mine.update(expires_at=expires_at)
+                new_rows = Reservation.objects.bulk_create([
+                    Reservation(
                         schedule=schedule,
                         seat_no=seat,
+                        reserved_by=request.user,
+                        expires_at=expires_at,
                         status='PENDING',
-                        expires_at__gt=timezone.now()
-                    ).exists()
-                    if not conflict:
-                        import json
-                        occupied = set()
-                        for b in Booking.objects.filter(schedule=schedule, status__in=['PENDING','CONFIRMED']).only('seats'):
-                            try:
-                                for s in json.loads(b.seats or '[]'):
-                                    occupied.add(s)
-                            except Exception:
-                                pass
-                        conflict = seat in occupied
-                    if conflict:
-                        return Response({'detail': f'Seat {seat} not available'}, status=409)
-
-                r = Reservation.objects.create(
-                    schedule=schedule,
-                    seat_no=seat,
-                    reserved_by=request.user,
-                    expires_at=expires_at,
-                    status='PENDING'
-                )
-                created.append(r.id)
-            return Response({'reservation_ids': created, 'ttl_minutes': ttl_minutes}, status=201)
+                    )
+                    for seat in seats if seat not in existing
+                ])
+                ids = dict(existing)
+                ids.update((r.seat_no, r.id) for r in new_rows)
+                invalidate_occupancy(schedule.id)
         except Exception:
             # On any failure, release Redis holds
             if not use_db_check:
-                release_seats(schedule.id, seats)
+                release_seats(schedule.id, seats, request.user.id)
             raise
+        return Response({'reservation_ids': [ids[s] for s in seats], 'ttl_minutes': ttl_minutes}, status=201)
 
 class CreatePaymentView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         schedule_id = request.data.get('schedule_id')
         seats = request.data.get('seats', [])
@@ -309,8 +441,17 @@ class CreatePaymentView(generics.GenericAPIView):
             return Response({'detail': 'Invalid schedule_id'}, status=404)
         if schedule.status != 'ACTIVE':
             return Response({'detail': 'Schedule is not available for booking'}, status=400)
-        computed = total_fare_for_seats(schedule, seats)
-        if not amount:
+        # Same ladder (and price step) the seat map shows; the promo discounts those prices.
+        ladder = price_ladder(schedule)
+        try:
+            promo, discount = select_promo(
+                schedule, seats, ladder, request.data.get('promo_code'), user_id=request.user.id
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        computed = ladder.total(seats) - discount
+        client_amount = bool(amount)
+        if not client_amount:
             amount = str(computed)
         else:
             try:
@@ -329,11 +470,13 @@ class CreatePaymentView(generics.GenericAPIView):
             'schedule_id': schedule_id,
             'seats': json.dumps(seats),
             'amount': amount,
+            'discount_amount': discount,
             'status': 'PENDING',
             'contact_phone': request.data.get('contact_phone', ''),
             'contact_email': request.data.get('contact_email', ''),
             'state_of_residence': request.data.get('state_of_residence', ''),
             'whatsapp_opt_in': request.data.get('whatsapp_opt_in', False),
+            'expires_at': timezone.now() + timedelta(seconds=settings.BOOKING_PAYMENT_TTL_SECONDS),
         }
         bp_id = request.data.get('boarding_point_id')
         dp_id = request.data.get('dropping_point_id')
@@ -345,7 +488,7 @@ class CreatePaymentView(generics.GenericAPIView):
         if isinstance(passengers, dict):
             booking_kw['passenger_details'] = json.dumps(passengers)
 
-        labels, cols = layout_labels_and_cols_from_bus(schedule.bus)
+        layout = layout_for_bus(schedule.bus)
         _, seat_gender = get_occupied_and_seat_genders(schedule)
         if isinstance(passengers, dict):
             for seat in seats:
@@ -354,23 +497,63 @@ class CreatePaymentView(generics.GenericAPIView):
                 if g not in ('M', 'MALE'):
                     continue
                 err = male_reserved_seat_adjacent_to_female(
-                    labels, cols, [seat], seat_gender, seats
+                    layout, [seat], seat_gender, seats
                 )
                 if err:
                     return Response({'detail': err}, status=400)
 
+        # BookingSeat rows are created with the booking; the live-seat unique constraint
+        # rejects a seat already held by another PENDING/CONFIRMED booking.
+        repriced = None
+        try:
+            with transaction.atomic():
+                # A retried checkout replaces this user's own unpaid booking for the same seats.
+                stale = Booking.objects.filter(
+                    user=request.user,
+                    schedule_id=schedule_id,
+                    status='PENDING',
+                    seat_rows__seat_no__in=seats,
+                ).exclude(payment__status='SUCCESS').distinct()
+                for old in stale:
+                    # Its holds carry over to the new booking.
+                    transition(
+                        old, 'CANCELLED', keep_holds=True,
+                        cancelled_at=timezone.now(),
+                        cancelled_by='passenger',
+                        cancellation_reason='Superseded by a new checkout',
+                    )
+                booking = Booking.objects.create(**booking_kw)
+                link_holds(booking, seats)
+                # An automatic offer used up since selection gives way to the next one (or none).
+                applied, applied_discount = redeem_best_promo(
+                    promo, discount, booking, schedule, seats, ladder
+                )
+                if applied_discount != discount:
+                    amount = str(ladder.total(seats) - applied_discount)
+                    if client_amount:
+                        # The passenger agreed to the validated amount: never charge more
+                        # without asking; roll back and let the client confirm the new one.
+                        repriced = amount
+                        raise PromoUnavailable('The offer applied to this booking has run out.')
+                    Booking.objects.filter(pk=booking.pk).update(
+                        amount=amount, discount_amount=applied_discount
+                    )
+                    booking.amount, booking.discount_amount = amount, applied_discount
+        except IntegrityError:
+            return Response({'detail': 'One or more selected seats are no longer available.'}, status=409)
+        except PromoUnavailable as e:
+            if repriced is not None:
+                return Response({'detail': str(e), 'expected': repriced}, status=409)
+            return Response({'detail': str(e)}, status=409)
+
         use_demo = getattr(settings, 'DEMO_PAYMENTS', False) or not (settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET)
         if use_demo:
-            booking = Booking.objects.create(**booking_kw)
             payment = Payment.objects.create(booking=booking, gateway_order_id=f"order_demo_{booking.id}", status='CREATED')
             return Response({
                 'booking_id': booking.id, 'order_id': payment.gateway_order_id,
                 'amount': int(Decimal(amount) * 100), 'currency': 'INR', 'key_id': 'rzp_test_demo'
             }, status=201)
 
-        # Create booking (PENDING)
-        booking = Booking.objects.create(**booking_kw)
-
         # Create Razorpay order (amount in paise)
         client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
         order = client.order.create({
@@ -435,7 +618,7 @@ class PaymentWebhookView(generics.GenericAPIView):
             return Response({'detail': 'order_id not found in payload'}, status=400)
 
         try:
-            payment = Payment.objects.select_related('booking').get(gateway_order_id=order_id)
+            payment = Payment.objects.select_related('booking__schedule__bus').get(gateway_order_id=order_id)
         except Payment.DoesNotExist:
             return Response({'detail': 'Payment not found for order_id'}, status=404)
 
@@ -459,24 +642,21 @@ class PaymentWebhookView(generics.GenericAPIView):
         payment.raw_response = raw_response_str
         payment.save()
 
+        # One transition: PENDING (or EXPIRED, seats still free) -> CONFIRMED with the linked
+        # holds, seats and promo following. Anything else that was paid for is refunded.
         booking = payment.booking
-        if booking.status != 'CONFIRMED':
-            booking.status = 'CONFIRMED'
-            booking.payment_id = payment.gateway_payment_id
-            booking.save()
-
-        # Optional: update related Reservations to CONFIRMED as before
         try:
-            booked_seats = json.loads(booking.seats or '[]')
-        except Exception:
-            booked_seats = []
-        from .models import Reservation
-        Reservation.objects.filter(
-            schedule=booking.schedule,
-            seat_no__in=booked_seats,
-            reserved_by=booking.user,
-            status='PENDING'
-        ).update(status='CONFIRMED')
+            confirmed = booking.status == 'CONFIRMED' or (
+                booking.status in BOOKING_TRANSITIONS['CONFIRMED']
+                and confirm_booking(booking, payment.gateway_payment_id)
+            )
+        except IntegrityError:
+            # Paid after the booking expired and its seats were taken again.
+            confirmed = False
+        if not confirmed:
+            booking.refresh_from_db()
+            if booking.status != 'CONFIRMED':
+                return self._refund(booking, payment.gateway_payment_id)
 
         # Generate ticket PDF on successful payment
         if not booking.ticket_file:
@@ -484,7 +664,7 @@ class PaymentWebhookView(generics.GenericAPIView):
                 from .ticket_generator import save_ticket_to_booking
                 filename = save_ticket_to_booking(booking)
                 booking.ticket_file = filename
-                booking.save()
+                Booking.objects.filter(pk=booking.pk).update(ticket_file=filename)
             except Exception as e:
                 print(f"Failed to generate ticket for booking {booking.id}: {str(e)}")
 
@@ -497,6 +677,30 @@ class PaymentWebhookView(generics.GenericAPIView):
 
         return Response({'ok': True})
 
+    @staticmethod
+    def _refund(booking, gateway_payment_id):
+        """Refund a payment for a booking that can no longer be confirmed."""
+        from .cancellation import initiate_razorpay_refund
+        try:
+            moved = transition(
+                booking, 'REFUNDED',
+                payment_id=gateway_payment_id,
+                refund_amount=booking.amount,
+                cancelled_at=timezone.now(),
+                cancelled_by='system',
+                cancellation_reason='Seats were released before payment completed',
+            )
+        except InvalidTransition:
+            # Already REFUNDED (cancelled before the payment landed): refund this payment once.
+            moved = not booking.refund_id
+            booking.payment_id = gateway_payment_id
+            Booking.objects.filter(pk=booking.pk).update(payment_id=gateway_payment_id)
+        if moved:
+            refund_id = initiate_razorpay_refund(booking, Decimal(str(booking.amount)))
+            if refund_id:
+                Booking.objects.filter(pk=booking.pk).update(refund_id=refund_id)
+        return Response({'ok': True, 'refunded': True})
+
 class BookingListView(generics.ListAPIView):
     """
     GET: List authenticated user's bookings.
@@ -520,8 +724,9 @@ class BookingListView(generics.ListAPIView):
             "boarding_point",
             "dropping_point",
         )
-        upcoming_q = Q(schedule__departure_dt__gte=now) & ~Q(status__in=["CANCELLED", "REFUNDED"])
-        past_q = Q(schedule__departure_dt__lt=now) | Q(status__in=["CANCELLED", "REFUNDED"])
+        closed = ["CANCELLED", "REFUNDED", "EXPIRED"]
+        upcoming_q = Q(schedule__departure_dt__gte=now) & ~Q(status__in=closed)
+        past_q = Q(schedule__departure_dt__lt=now) | Q(status__in=closed)
 
         upcoming_ids = list(
             base.filter(upcoming_q).order_by("schedule__departure_dt").values_list("pk", flat=True)
@@ -579,7 +784,7 @@ class TicketView(generics.RetrieveAPIView):
             try:
                 filename = save_ticket_to_booking(booking)
                 booking.ticket_file = filename
-                booking.save()
+                Booking.objects.filter(pk=booking.pk).update(ticket_file=filename)
             except Exception as e:
                 return Response({'detail': f'Failed to generate ticket: {str(e)}'}, status=500)
         
@@ -729,13 +934,18 @@ class BusReviewListView(generics.ListAPIView):
 
     serializer_class = PublicBusReviewSerializer
     permission_classes = [AllowAny]
-    pagination_class = None
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         bus_id = self.kwargs["bus_id"]
         get_object_or_404(Bus, pk=bus_id)
-        return (
+        qs = (
             BusRating.objects.filter(bus_id=bus_id)
             .select_related("user")
-            .order_by("-created_at")[:50]
-        )
\ No newline at end of file
+            .order_by("-created_at", "-id")
+        )
+        # Without ?page_size= / ?cursor= keep the original "latest 50" list.
+        if not self.paginator.is_requested(self.request):
+            qs = qs[:50]
+        return qs
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Compiled seat layouts.
+
+`Bus.seat_map_json` is parsed once per distinct layout into a CompiledLayout: padded label grid,
+label -> grid index, bookable seats (row-major, aisles skipped), horizontal neighbours, deck
+info and layout kind. Compiled layouts are keyed by a digest of the JSON text (so an edited
+layout is simply a new key) and held in a per-process LRU backed by the shared Django cache.
+
+Treat CompiledLayout instances and their containers as read-only: they are shared.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+COMPILED_LAYOUT_CACHE_PREFIX = "layout:v2:"
+COMPILED_LAYOUT_CACHE_TTL = getattr(settings, "COMPILED_LAYOUT_CACHE_SECONDS", 24 * 60 * 60)
+
+_KIND_BY_TYPES = (
+    ({"seater"}, "seater"),
+    ({"sleeper"}, "sleeper"),
+    ({"semi_sleeper"}, "semi"),
+)
+
+
+def layout_fingerprint(seat_map_json: str) -> str:
+    return hashlib.sha1((seat_map_json or "").encode("utf-8")).hexdigest()[:20]
+
+
+def _layout_kind(raw_types) -> str:
+    """Simple category from seat map types: seater, sleeper, semi, or mixed."""
+    types = [t for t in (raw_types or []) if t and t not in ("aisle", "blank")]
+    if not types:
+        return "mixed"
+    uniq = set(types)
+    for allowed, kind in _KIND_BY_TYPES:
+        if uniq <= allowed:
+            return kind
+    return "mixed"
+
+
+class CompiledLayout:
+    """Parsed, index-ready form of one seat_map_json string."""
+
+    __slots__ = (
+        "fingerprint", "data", "rows", "cols", "labels", "types", "orientations",
+        "has_upper_deck", "deck_split_row", "kind", "index", "bookable", "bookable_index",
+        "neighbors", "neighbor_masks",
+    )
+
+    def __init__(self, seat_map_json: str):
+        self.fingerprint = layout_fingerprint(seat_map_json)
+        try:
+            data = json.loads(seat_map_json or "{}")
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        # Parsed JSON as stored (what SeatMapField exposes).
+        self.data = data
+        rows = data.get("rows") or 10
+        cols = data.get("cols") or 4
+        total = rows * cols
+        labels = data.get("labels")
+        if not labels:
+            labels = [f"{r}{chr(65 + c)}" for r in range(1, rows + 1) for c in range(cols)]
+        labels = list(labels)[:total]
+        labels += [""] * (total - len(labels))
+        raw_types = data.get("types")
+        if not raw_types or len(raw_types) != total:
+            # Infer: empty label = aisle, else seater
+            types = ["aisle" if (lb == "" or lb is None) else "seater" for lb in labels]
+        else:
+            types = list(raw_types)
+        orientations = data.get("orientations")
+        if not isinstance(orientations, list):
+            orientations = []
+        orientations = [str(o).lower() if o else "portrait" for o in orientations][:total]
+        orientations += ["portrait"] * (total - len(orientations))
+        hud = data.get("has_upper_deck")
+        deck_split_row = None
+        dsr = data.get("deck_split_row")
+        if dsr is not None:
+            try:
+                d = int(dsr)
+                if 1 <= d < rows:
+                    deck_split_row = d
+            except (TypeError, ValueError):
+                pass
+
+        self.rows = rows
+        self.cols = cols
+        self.labels = tuple(labels)
+        self.types = tuple(types)
+        self.orientations = tuple(orientations)
+        self.has_upper_deck = True if hud is None else bool(hud)
+        self.deck_split_row = deck_split_row
+        self.kind = _layout_kind(raw_types)
+
+        stripped = [str(lb).strip() if lb is not None else "" for lb in labels]
+        index = {}
+        for i, lb in enumerate(stripped):
+            if lb:
+                index.setdefault(lb, i)
+        self.index = index
+        # Bookable seats in row-major order (first occurrence wins for duplicate labels).
+        self.bookable = tuple(sorted(index, key=index.__getitem__))
+        self.bookable_index = {lb: i for i, lb in enumerate(self.bookable)}
+        neighbors = {}
+        for lb, i in index.items():
+            r, c = divmod(i, cols)
+            out = []
+            for nc in (c - 1, c + 1):
+                if 0 <= nc < cols:
+                    n = stripped[r * cols + nc]
+                    if n:
+                        out.append(n)
+            neighbors[lb] = tuple(out)
+        self.neighbors = neighbors
+        # Per bookable seat (same order as `bookable`): bitmask of its neighbours' positions.
+        masks = []
+        for lb in self.bookable:
+            m = 0
+            for n in neighbors[lb]:
+                m |= 1 << self.bookable_index[n]
+            masks.append(m)
+        self.neighbor_masks = tuple(masks)
+
+    def neighbors_of(self, label) -> tuple[str, ...]:
+        """Horizontally adjacent seats in the same row (left/right), skipping aisles."""
+        if label is None:
+            return ()
+        return self.neighbors.get(str(label).strip(), ())
+
+    def is_bookable(self, label) -> bool:
+        return label is not None and str(label).strip() in self.index
+
+    def to_payload(self) -> dict:
+        """Layout object as returned by the seat-map API."""
+        out = {
+            "rows": self.rows,
+            "cols": self.cols,
+            "labels": list(self.labels),
+            "types": list(self.types),
+            "orientations": list(self.orientations),
+            "has_upper_deck": self.has_upper_deck,
+        }
+        if self.deck_split_row is not None:
+            out["deck_split_row"] = self.deck_split_row
+        return out
+
+
+@lru_cache(maxsize=512)
+def compile_layout(seat_map_json: str) -> CompiledLayout:
+    """Compiled layout for a seat_map_json string (process LRU, then shared cache)."""
+    seat_map_json = seat_map_json or ""
+    key = f"{COMPILED_LAYOUT_CACHE_PREFIX}{layout_fingerprint(seat_map_json)}"
+    try:
+        compiled = cache.get(key)
+    except Exception:
+        compiled = None
+    if isinstance(compiled, CompiledLayout):
+        return compiled
+    compiled = CompiledLayout(seat_map_json)
+    try:
+        cache.set(key, compiled, COMPILED_LAYOUT_CACHE_TTL)
+    except Exception:
+        pass
+    return compiled
+
+
+def layout_for_bus(bus) -> CompiledLayout:
+    raw = bus.seat_map_json
+    if raw and not isinstance(raw, str):
+        # Unsaved instance still holding the field default / a dict assigned in code.
+        raw = json.dumps(raw)
+    return compile_layout(raw or "")
@@ -0,0 +1,52 @@
+# Precomputed Bus.layout_kind (was derived from seat_map_json on every serialized row).
+
+import json
+
+from django.db import migrations, models
+
+_KIND_BY_TYPES = (
+    ({"seater"}, "seater"),
+    ({"sleeper"}, "sleeper"),
+    ({"semi_sleeper"}, "semi"),
+)
+
+
+def _layout_kind(seat_map_json):
+    """Same as buses.layout._layout_kind (kept inline: migrations are frozen)."""
+    try:
+        data = json.loads(seat_map_json or "{}")
+    except Exception:
+        data = {}
+    raw_types = data.get("types") if isinstance(data, dict) else None
+    types = [t for t in (raw_types or []) if t and t not in ("aisle", "blank")]
+    uniq = set(types)
+    if not uniq:
+        return "mixed"
+    for allowed, kind in _KIND_BY_TYPES:
+        if uniq <= allowed:
+            return kind
+    return "mixed"
+
+
+def backfill_layout_kind(apps, schema_editor):
+    Bus = apps.get_model("buses", "Bus")
+    for bus in Bus.objects.only("id", "seat_map_json").iterator():
+        kind = _layout_kind(bus.seat_map_json)
+        if kind != "mixed":
+            Bus.objects.filter(pk=bus.pk).update(layout_kind=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0004_operator_kyc_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bus',
+            name='layout_kind',
+            field=models.CharField(default='mixed', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_layout_kind, migrations.RunPython.noop),
+    ]
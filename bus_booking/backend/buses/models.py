@@ -31,6 +31,17 @@ class Bus(models.Model):
     # Aggregates from passenger ratings (after completed trips)
     rating_avg = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
     rating_count = models.PositiveIntegerField(default=0)
+    # Derived from seat_map_json on save (seater / sleeper / semi / mixed) so listings don't parse it
+    layout_kind = models.CharField(max_length=12, default='mixed', editable=False)
+
+    def save(self, *args, **kwargs):
+        from .layout import layout_for_bus
+
+        self.layout_kind = layout_for_bus(self).kind
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'seat_map_json' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'layout_kind'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.registration_no} ({self.capacity})"
\ No newline at end of file
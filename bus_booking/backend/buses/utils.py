@@ -1,20 +1,23 @@
 import json
+from functools import lru_cache
+
+from .layout import compile_layout
 
 
 def infer_layout_kind(seat_map_json_str: str) -> str:
     """Derive a simple category from seat map types: seater, sleeper, semi, or mixed."""
+    return compile_layout(seat_map_json_str or "").kind
+
+
+@lru_cache(maxsize=256)
+def _parse_features(features_json: str) -> tuple:
     try:
-        m = json.loads(seat_map_json_str or "{}")
-        types = [t for t in (m.get("types") or []) if t and t not in ("aisle", "blank")]
-        if not types:
-            return "mixed"
-        uniq = set(types)
-        if uniq <= {"seater"}:
-            return "seater"
-        if uniq <= {"sleeper"}:
-            return "sleeper"
-        if uniq <= {"semi_sleeper"}:
-            return "semi"
-        return "mixed"
+        value = json.loads(features_json or "[]")
     except Exception:
-        return "mixed"
+        return ()
+    return tuple(value) if isinstance(value, list) else ()
+
+
+def bus_features(features_json: str) -> list:
+    """Feature ids from Bus.features_json; parsed once per distinct value (fleets share a few)."""
+    return list(_parse_features(features_json or "[]"))
@@ -1,10 +1,24 @@
 from django.contrib import admin
-from .models import Route, RoutePattern, RoutePatternStop
+from .models import City, CityAlias, Route, RoutePattern, RoutePatternStop
+
+
+class CityAliasInline(admin.TabularInline):
+    model = CityAlias
+    extra = 1
+    fields = ("alias",)
+
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "state")
+    search_fields = ("name", "aliases__alias")
+    inlines = (CityAliasInline,)
 
 
 @admin.register(Route)
 class RouteAdmin(admin.ModelAdmin):
-    list_display = ("id", "origin", "destination", "distance_km")
+    list_display = ("id", "origin", "destination", "origin_city", "destination_city", "distance_km")
+    readonly_fields = ("origin_city", "destination_city")
 
 
 class RoutePatternStopInline(admin.TabularInline):
@@ -0,0 +1,274 @@
+"""
+In-process city index for autocomplete and route filtering.
+
+Built from City names and CityAlias spellings (each a search key pointing at a city id)
+plus the (origin_city, destination_city) pairs of Route rows. Lookups never touch the DB:
+
+  - word-prefix dict (every prefix of every word of every key) for the as-you-type case
+  - trigram postings for substring matches and typo-tolerant fallback ("banglore")
+
+Suggestions are ranked by match quality, then by the popularity scores the nightly
+`rollup_popularity` command writes to CityPopularity / CityPairPopularity, then by name.
+
+The index is rebuilt lazily after City / CityAlias / Route rows change (or a rollup runs): signals mark this
+process dirty and bump a version in the shared cache, which other processes check every
+CITY_INDEX_CHECK_SECONDS together with the newest CityPopularity.updated_at (an aggregate
+over one row per city), so a rollup from the cron process is picked up from the database.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .city_search import normalize_city
+
+CITY_INDEX_VERSION_KEY = "cityidx:version"
+CITY_INDEX_CHECK_SECONDS = getattr(settings, "CITY_INDEX_CHECK_SECONDS", 5)
+# Minimum trigram similarity for a fuzzy (typo) match.
+FUZZY_MIN_SIMILARITY = 0.35
+
+RANK_EXACT, RANK_PREFIX, RANK_WORD_PREFIX, RANK_SUBSTRING, RANK_FUZZY = range(5)
+# Suggestion tiers: within a tier, more popular cities come first.
+_SUGGEST_TIER = {
+    RANK_EXACT: 0, RANK_PREFIX: 1, RANK_WORD_PREFIX: 1, RANK_SUBSTRING: 2, RANK_FUZZY: 3,
+}
+
+_EMPTY: frozenset = frozenset()
+
+
+def trigrams(norm: str) -> set[str]:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityIndex:
+    """Immutable snapshot built from cities, their aliases and route endpoints."""
+
+    def __init__(self, cities, aliases, pairs, city_scores=(), pair_scores=()):
+        """
+        cities: (id, name); aliases: (city_id, alias); pairs: (origin_city_id,
+        destination_city_id) per route; city_scores: (city_id, origin_score,
+        destination_score); pair_scores: (origin_city_id, destination_city_id, score).
+        """
+        self.names: dict[int, str] = {}       # city id -> display name
+        self.key_norms: list[str] = []        # search key (normalized name / alias)
+        self.key_city: list[int] = []         # search key -> city id
+        seen: set[tuple[str, int]] = set()
+
+        def add_key(city_id, text):
+            norm = normalize_city(text)
+            if norm and (norm, city_id) not in seen:
+                seen.add((norm, city_id))
+                self.key_norms.append(norm)
+                self.key_city.append(city_id)
+
+        for cid, name in cities:
+            self.names[cid] = name
+            add_key(cid, name)
+        for cid, alias in aliases:
+            if cid in self.names:
+                add_key(cid, alias)
+
+        self.origins: set[int] = set()
+        self.destinations: set[int] = set()
+        self.destinations_by_origin: dict[int, set[int]] = defaultdict(set)
+        for o, d in pairs:
+            if o is not None:
+                self.origins.add(o)
+            if d is not None:
+                self.destinations.add(d)
+            if o is not None and d is not None:
+                self.destinations_by_origin[o].add(d)
+
+        self.origin_scores: dict[int, float] = {}
+        self.destination_scores: dict[int, float] = {}
+        for cid, o_score, d_score in city_scores:
+            self.origin_scores[cid] = o_score
+            self.destination_scores[cid] = d_score
+        self.pair_scores: dict[tuple[int, int], float] = {
+            (o, d): score for o, d, score in pair_scores
+        }
+
+        self.prefixes: dict[str, set[int]] = defaultdict(set)
+        self.grams: dict[str, set[int]] = defaultdict(set)
+        self._grams_of: list[set[str]] = []
+        for kid, norm in enumerate(self.key_norms):
+            for word in norm.split(" "):
+                for i in range(1, len(word) + 1):
+                    self.prefixes[word[:i]].add(kid)
+            g = trigrams(norm)
+            self._grams_of.append(g)
+            for t in g:
+                self.grams[t].add(kid)
+
+    def _substring_ids(self, q: str) -> set[int]:
+        if len(q) < 3:
+            return {kid for kid, norm in enumerate(self.key_norms) if q in norm}
+        # Unpadded trigrams (q may sit anywhere inside the name), rarest posting first.
+        postings = sorted(
+            (self.grams.get(q[i:i + 3], _EMPTY) for i in range(len(q) - 2)), key=len
+        )
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if not candidates:
+                break
+            candidates &= ids
+        return {kid for kid in candidates if q in self.key_norms[kid]}
+
+    def _fuzzy_ids(self, q: str) -> dict[int, float]:
+        qg = trigrams(q)
+        # Trigrams shared by a large share of all keys cannot tell candidates apart.
+        common = max(len(self.key_norms) // 4, 8)
+        candidates: set[int] = set()
+        for t in qg:
+            ids = self.grams.get(t, _EMPTY)
+            if len(ids) <= common:
+                candidates |= ids
+        out = {}
+        for kid in candidates:
+            g = self._grams_of[kid]
+            sim = len(qg & g) / len(qg | g)
+            if sim >= FUZZY_MIN_SIMILARITY:
+                out[kid] = sim
+        return out
+
+    def match(self, text, fuzzy: bool = True, pool=None, limit: int | None = None):
+        """
+        City id -> sort key (rank, ...) for what `text` matches, restricted to `pool` ids.
+        With `limit`, substring matching is skipped once enough prefix hits exist.
+        """
+        q = normalize_city(text)
+        if not q:
+            return {}
+        found: dict[int, tuple] = {}
+
+        def add(kid, key):
+            cid = self.key_city[kid]
+            if pool is not None and cid not in pool:
+                return
+            if cid not in found or key < found[cid]:
+                found[cid] = key
+
+        def rank(kid):
+            norm = self.key_norms[kid]
+            if norm == q:
+                return (RANK_EXACT,)
+            if norm.startswith(q):
+                return (RANK_PREFIX,)
+            return None
+
+        for kid in self.prefixes.get(q, _EMPTY):
+            add(kid, rank(kid) or (RANK_WORD_PREFIX,))
+        if limit is None or len(found) < limit:
+            for kid in self._substring_ids(q):
+                add(kid, rank(kid) or (RANK_SUBSTRING,))
+        if fuzzy and not found and len(q) >= 3:
+            for kid, sim in self._fuzzy_ids(q).items():
+                add(kid, (RANK_FUZZY, -sim))
+        return found
+
+    def suggest(self, text, field: str = "origin", origin_text: str = "", limit: int = 28):
+        """Display names for autocomplete: best match tier, then most popular, then by name."""
+        pool = self.destinations if field == "destination" else self.origins
+        scores = self.destination_scores if field == "destination" else self.origin_scores
+        origins = ()
+        if field == "destination" and origin_text:
+            origins = tuple(self.match(origin_text, pool=self.origins))
+            allowed = set()
+            for o in origins:
+                allowed |= self.destinations_by_origin.get(o, _EMPTY)
+            pool = pool & allowed
+
+        def popularity(cid):
+            if origins:
+                return max(self.pair_scores.get((o, cid), 0.0) for o in origins)
+            return scores.get(cid, 0.0)
+
+        hits = heapq.nsmallest(
+            limit,
+            (
+                (_SUGGEST_TIER[key[0]], key[1:], -popularity(cid), self.names[cid].lower(), cid)
+                for cid, key in self.match(text, pool=pool, limit=limit).items()
+            ),
+        )
+        return [self.names[h[-1]] for h in hits]
+
+    def city_ids(self, text, pool=None) -> set[int]:
+        """City ids matching `text` (for `origin_city_id__in=` style filters)."""
+        return set(self.match(text, pool=pool))
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "checked": 0.0, "dirty": True}
+
+
+def _shared_version():
+    """
+    (cache version, latest CityPopularity.updated_at). The rollup runs in its own process
+    and rewrites CityPopularity, so its rows are the marker every process can see even
+    when the cache is not shared.
+    """
+    from django.db.models import Max
+
+    from .models import CityPopularity
+
+    try:
+        version = cache.get(CITY_INDEX_VERSION_KEY)
+    except Exception:
+        version = None
+    return version, CityPopularity.objects.aggregate(at=Max("updated_at"))["at"]
+
+
+def get_city_index() -> CityIndex:
+    """Current index for this process, rebuilding if cities, routes or popularity changed."""
+    now = time.monotonic()
+    st = _state
+    fresh = not st["dirty"] and st["index"] is not None
+    if fresh and now - st["checked"] < CITY_INDEX_CHECK_SECONDS:
+        return st["index"]
+    version = _shared_version()
+    if fresh and version == st["version"]:
+        st["checked"] = now
+        return st["index"]
+    with _lock:
+        if st["dirty"] or st["index"] is None or version != st["version"]:
+            from .models import City, CityAlias, CityPairPopularity, CityPopularity, Route
+
+            st["dirty"] = False
+            st["index"] = CityIndex(
+                City.objects.values_list("id", "name"),
+                CityAlias.objects.values_list("city_id", "alias"),
+                Route.objects.values_list("origin_city_id", "destination_city_id"),
+                CityPopularity.objects.values_list(
+                    "city_id", "origin_score", "destination_score"
+                ),
+                CityPairPopularity.objects.values_list(
+                    "origin_city_id", "destination_city_id", "score"
+                ),
+            )
+            st["version"] = version
+        st["checked"] = now
+    return st["index"]
+
+
+def invalidate_city_index() -> None:
+    """
+    Once the current transaction commits, mark this process stale and tell other processes
+    (via the shared cache) to rebuild.
+    """
+
+    def _bump():
+        _state["dirty"] = True
+        try:
+            if not cache.add(CITY_INDEX_VERSION_KEY, 1, None):
+                cache.incr(CITY_INDEX_VERSION_KEY)
+        except Exception:
+            pass
+
+    transaction.on_commit(_bump)
@@ -1,49 +1,42 @@
-"""Match typed city names to Route origin/destination (handles common spelling variants)."""
+"""Resolve typed city names to canonical City rows (spelling variants live in CityAlias)."""
 
 from __future__ import annotations
 
-from django.db.models import Q
-
-# Lowercase tokens: when the user query matches a group, we OR icontains for every member
-# so e.g. "Bengaluru" still matches DB rows that say "Bangalore".
-_CITY_EQUIVALENT_GROUPS: tuple[frozenset[str], ...] = (
-    frozenset({"bangalore", "bengaluru"}),
-    frozenset({"mysore", "mysuru"}),
-    frozenset({"pondicherry", "puducherry", "pondy"}),
-    frozenset({"chennai", "madras"}),
-)
-
-
-def _matches_city_group(low: str, group: frozenset[str]) -> bool:
-    if len(low) < 2:
-        return False
-    for g in group:
-        if low == g:
-            return True
-        if len(low) >= 3 and (low in g or g in low):
-            return True
-    return False
-
-
-def city_match_terms(user_text: str) -> list[str]:
-    """Distinct strings to use with OR + icontains against Route text fields."""
-    raw = (user_text or "").strip()
-    if not raw:
-        return []
-    low = raw.lower()
-    terms: set[str] = {raw, low}
-    for group in _CITY_EQUIVALENT_GROUPS:
-        if _matches_city_group(low, group):
-            terms.update(group)
-    return list(terms)
-
-
-def city_icontains_q(field: str, user_text: str) -> Q:
-    """Combine icontains on `field` for the raw input plus any expanded spellings."""
-    terms = city_match_terms(user_text)
-    if not terms:
-        return Q(pk__in=[])
-    q = Q()
-    for t in terms:
-        q |= Q(**{f"{field}__icontains": t})
-    return q
+import re
+import unicodedata
+
+from django.db import IntegrityError, transaction
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_city(text) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    s = unicodedata.normalize("NFKD", str(text or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return " ".join(_NON_WORD.sub(" ", s).split())
+
+
+def resolve_city(text, create: bool = False):
+    """
+    City for `text` by exact normalized name, then by alias (two indexed lookups).
+    With create=True an unknown name becomes a new City; otherwise returns None.
+    """
+    from .models import City, CityAlias
+
+    name = str(text or "").strip()
+    key = normalize_city(name)
+    if not key:
+        return None
+    city = City.objects.filter(name_key=key).first()
+    if city is None:
+        alias = CityAlias.objects.select_related("city").filter(alias_key=key).first()
+        city = alias.city if alias else None
+    if city is None and create:
+        try:
+            with transaction.atomic():
+                city = City.objects.create(name=name)
+        except IntegrityError:
+            # Created concurrently (or the display name is taken by another key).
+            city = City.objects.filter(name_key=key).first() or City.objects.filter(name=name).first()
+    return city
@@ -0,0 +1,35 @@
+"""
+Calendar-day filters on datetime columns, in the project's local time zone (IST).
+
+`departure_dt__date=d` makes the database wrap the column in a date/time-zone function, so
+the (route, departure_dt) style indexes cannot be used. These helpers turn local calendar
+days into a half-open [start, end) range on the raw column instead, which is an index seek.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def local_day_start(day: date) -> datetime:
+    """Aware datetime for local midnight at the start of `day`."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def local_day_range(field: str, start: date | None = None, end: date | None = None) -> dict:
+    """
+    Filter kwargs selecting `field` within local days start..end (both inclusive); either
+    bound may be None. E.g. Schedule.objects.filter(**local_day_range("departure_dt", d, d)).
+    """
+    out = {}
+    if start is not None:
+        out[f"{field}__gte"] = local_day_start(start)
+    if end is not None:
+        out[f"{field}__lt"] = local_day_start(end + timedelta(days=1))
+    return out
+
+
+def local_day(field: str, day: date) -> dict:
+    """Filter kwargs selecting `field` on one local calendar day."""
+    return local_day_range(field, day, day)
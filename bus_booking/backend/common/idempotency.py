@@ -0,0 +1,169 @@
+"""
+Idempotency-Key support for POST endpoints whose retries must not repeat side effects
+(create-payment creates a Booking and a gateway order; reserve holds seats).
+
+Clients send `Idempotency-Key: <unique string>` once per logical request and repeat it on
+retries. The first request claims (user, key) by inserting an IdempotencyKey row with no
+response yet; when the view returns, its response is stored on the row and in the Django
+cache. A retry with the same key and the same request gets that response back, marked
+`Idempotent-Replayed: true`, from the cache (else one indexed read) without running the
+view. A retry that arrives while the first request is still running gets 409, and the same
+key with a different request gets 422. Server errors release the key so it can be retried.
+
+Responses are replayed for IDEMPOTENCY_KEY_TTL_HOURS; `purge_idempotency_keys()` (part of
+the expire_holds sweep) deletes older rows.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_CACHE_PREFIX = "idem:v1:"
+IDEMPOTENCY_TTL = timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+# An in-progress claim older than this is treated as abandoned (worker died mid-request).
+IDEMPOTENCY_LOCK_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_cache_key(user_id: int, key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"{IDEMPOTENCY_CACHE_PREFIX}{user_id}:{digest}"
+
+
+def request_fingerprint(request) -> str:
+    """sha256 of method, path and body, so a key cannot be reused for another request."""
+    body = json.dumps(request.data, sort_keys=True, separators=(",", ":"), default=str)
+    raw = f"{request.method} {request.path}\n{body}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _mismatch() -> Response:
+    return Response(
+        {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request."},
+        status=422,
+    )
+
+
+def _replay(fingerprint: str, stored_fingerprint: str, status_code: int, body: str) -> Response:
+    if stored_fingerprint != fingerprint:
+        return _mismatch()
+    return Response(
+        json.loads(body) if body else None,
+        status=status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _in_progress() -> Response:
+    return Response(
+        {"detail": f"A request with this {IDEMPOTENCY_HEADER} is still being processed."},
+        status=409,
+    )
+
+
+def _claim(user, key: str, fingerprint: str):
+    """The new in-progress row for (user, key), or the Response to return instead."""
+    now = timezone.now()
+    for _ in range(2):
+        # Read first so a replay writes nothing; the unique constraint settles races.
+        row = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        user=user, key=key, fingerprint=fingerprint
+                    )
+            except IntegrityError:
+                continue
+        if row.status_code is not None and row.created_at > now - IDEMPOTENCY_TTL:
+            return _replay(fingerprint, row.fingerprint, row.status_code, row.response_json)
+        if row.status_code is None and row.created_at > now - timedelta(
+            seconds=IDEMPOTENCY_LOCK_SECONDS
+        ):
+            return _in_progress() if row.fingerprint == fingerprint else _mismatch()
+        # Expired response or abandoned claim: drop it and claim again.
+        IdempotencyKey.objects.filter(pk=row.pk, created_at=row.created_at).delete()
+    return _in_progress()
+
+
+def idempotent(handler):
+    """
+    Decorator for an APIView handler (e.g. `post`) honouring the Idempotency-Key header.
+    Requests without the header, or from anonymous users, run unchanged.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key or not request.user.is_authenticated:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} is too long (max {MAX_KEY_LENGTH})."},
+                status=400,
+            )
+        fingerprint = request_fingerprint(request)
+        ckey = idempotency_cache_key(request.user.pk, key)
+        try:
+            hit = cache.get(ckey)
+        except Exception:
+            hit = None
+        if hit is not None:
+            return _replay(fingerprint, *hit)
+
+        claimed = _claim(request.user, key, fingerprint)
+        if isinstance(claimed, Response):
+            return claimed
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=claimed.pk).delete()
+            raise
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(pk=claimed.pk).delete()
+            return response
+        body = json.dumps(response.data, cls=DjangoJSONEncoder)
+        IdempotencyKey.objects.filter(pk=claimed.pk).update(
+            status_code=response.status_code, response_json=body
+        )
+        try:
+            cache.set(
+                ckey,
+                (fingerprint, response.status_code, body),
+                int(IDEMPOTENCY_TTL.total_seconds()),
+            )
+        except Exception:
+            pass
+        return response
+
+    return wrapper
+
+
+def purge_idempotency_keys(now=None, batch_size: int = 500) -> int:
+    """Delete keys older than the replay window. Returns the number of rows deleted."""
+    cutoff = (now or timezone.now()) - IDEMPOTENCY_TTL
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list("id", flat=True)[
+                :batch_size
+            ]
+        )
+        if not ids:
+            break
+        total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return total
@@ -0,0 +1,113 @@
+# Canonical City / CityAlias tables; Route gets origin_city / destination_city FKs.
+# Seeds the spelling groups that used to be hardcoded in city_search.py and resolves
+# every existing Route's text to a City.
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# (preferred canonical name, other spellings) — formerly _CITY_EQUIVALENT_GROUPS
+SEED_GROUPS = (
+    ("Bengaluru", ("Bangalore",)),
+    ("Mysuru", ("Mysore",)),
+    ("Puducherry", ("Pondicherry", "Pondy")),
+    ("Chennai", ("Madras",)),
+)
+
+
+def _norm(text):
+    """Same as common.city_search.normalize_city (kept inline: migrations are frozen)."""
+    s = unicodedata.normalize("NFKD", str(text or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", s).split())
+
+
+def canonicalize_routes(apps, schema_editor):
+    City = apps.get_model("common", "City")
+    CityAlias = apps.get_model("common", "CityAlias")
+    Route = apps.get_model("common", "Route")
+
+    used = Counter()
+    for origin, destination in Route.objects.values_list("origin", "destination"):
+        used[origin.strip()] += 1
+        used[destination.strip()] += 1
+    spelling_by_key = {}
+    for name, _ in used.most_common():
+        spelling_by_key.setdefault(_norm(name), name)
+
+    by_key = {}
+    for preferred, others in SEED_GROUPS:
+        group = (preferred,) + others
+        # Keep the spelling routes already use as the display name, if any.
+        in_use = [spelling_by_key[_norm(g)] for g in group if _norm(g) in spelling_by_key]
+        name = in_use[0] if in_use else preferred
+        city = City.objects.create(name=name, name_key=_norm(name))
+        by_key[city.name_key] = city
+        for g in group:
+            if _norm(g) != city.name_key:
+                CityAlias.objects.create(city=city, alias=g, alias_key=_norm(g))
+                by_key[_norm(g)] = city
+
+    def city_for(text):
+        key = _norm(text)
+        if not key:
+            return None
+        if key not in by_key:
+            by_key[key] = City.objects.create(name=text.strip(), name_key=key)
+        return by_key[key]
+
+    for route in Route.objects.all():
+        Route.objects.filter(pk=route.pk).update(
+            origin_city=city_for(route.origin),
+            destination_city=city_for(route.destination),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_route_pattern'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('name_key', models.CharField(editable=False, max_length=100, unique=True)),
+                ('state', models.CharField(blank=True, default='', max_length=100)),
+            ],
+            options={
+                'verbose_name_plural': 'cities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='destination_city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='routes_to', to='common.city'),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='origin_city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='routes_from', to='common.city'),
+        ),
+        migrations.CreateModel(
+            name='CityAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100)),
+                ('alias_key', models.CharField(editable=False, max_length=100, unique=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='common.city')),
+            ],
+            options={
+                'verbose_name_plural': 'city aliases',
+                'ordering': ['city', 'alias'],
+            },
+        ),
+        migrations.RunPython(canonicalize_routes, migrations.RunPython.noop),
+    ]
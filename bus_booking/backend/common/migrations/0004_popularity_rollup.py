@@ -0,0 +1,56 @@
+# Popularity rollup tables for autocomplete ranking (see bookings/popularity.py).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_city_alias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_score', models.FloatField(default=0)),
+                ('destination_score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='popularity', to='common.city')),
+            ],
+            options={
+                'verbose_name_plural': 'city popularity',
+            },
+        ),
+        migrations.CreateModel(
+            name='CityPairPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='common.city')),
+                ('origin_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='common.city')),
+            ],
+            options={
+                'verbose_name_plural': 'city pair popularity',
+                'constraints': [models.UniqueConstraint(fields=('origin_city', 'destination_city'), name='common_citypairpop_pair_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RouteSearchDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_days', to='common.route')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='common_rsd_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('route', 'day'), name='common_routesearchday_route_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Stop-pair index for sub-route search (see common/stop_pairs.py), backfilled from
+# existing RoutePatternStop rows.
+
+import re
+import unicodedata
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _norm(text):
+    """Same as common.city_search.normalize_city (kept inline: migrations are frozen)."""
+    s = unicodedata.normalize("NFKD", str(text or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", s).split())
+
+
+def build_stop_pairs(apps, schema_editor):
+    RoutePatternStop = apps.get_model("common", "RoutePatternStop")
+    RouteStopPair = apps.get_model("common", "RouteStopPair")
+
+    stops_by_pattern = defaultdict(list)
+    for pattern_id, order, name in RoutePatternStop.objects.order_by(
+        "pattern_id", "order"
+    ).values_list("pattern_id", "order", "name"):
+        stops_by_pattern[pattern_id].append((order, _norm(name)))
+    rows = []
+    for pattern_id, stops in stops_by_pattern.items():
+        for i, (from_order, from_key) in enumerate(stops):
+            for to_order, to_key in stops[i + 1:]:
+                if from_key and to_key and from_key != to_key:
+                    rows.append(RouteStopPair(
+                        pattern_id=pattern_id, from_key=from_key, to_key=to_key,
+                        from_order=from_order, to_order=to_order,
+                    ))
+    RouteStopPair.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0004_popularity_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStopPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_key', models.CharField(max_length=120)),
+                ('to_key', models.CharField(max_length=120)),
+                ('from_order', models.PositiveSmallIntegerField()),
+                ('to_order', models.PositiveSmallIntegerField()),
+                ('pattern', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stop_pairs', to='common.routepattern')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['from_key', 'to_key', 'pattern'], name='common_stoppair_keys_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pattern', 'from_order', 'to_order'), name='common_stoppair_uniq')],
+            },
+        ),
+        migrations.RunPython(build_stop_pairs, migrations.RunPython.noop),
+    ]
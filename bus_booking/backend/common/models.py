@@ -1,9 +1,73 @@
+from django.conf import settings
 from django.db import models
 
 
+class City(models.Model):
+    """Canonical city; Route origin/destination text resolves to one of these."""
+    name = models.CharField(max_length=100, unique=True)
+    # normalize_city(name): lowercase, no accents / punctuation, single spaces
+    name_key = models.CharField(max_length=100, unique=True, editable=False)
+    state = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'cities'
+
+    def save(self, *args, **kwargs):
+        from .city_search import normalize_city
+
+        self.name = (self.name or '').strip()
+        self.name_key = normalize_city(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class CityAlias(models.Model):
+    """Alternate spelling / old name (e.g. Bangalore -> Bengaluru, Trichy -> Tiruchirappalli)."""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100)
+    alias_key = models.CharField(max_length=100, unique=True, editable=False)
+
+    class Meta:
+        ordering = ['city', 'alias']
+        verbose_name_plural = 'city aliases'
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        from .city_search import normalize_city
+
+        key = normalize_city(self.alias)
+        if not key:
+            raise ValidationError({'alias': 'Alias cannot be empty.'})
+        if City.objects.filter(name_key=key).exists():
+            raise ValidationError({'alias': 'A city with this name already exists.'})
+        if CityAlias.objects.filter(alias_key=key).exclude(pk=self.pk).exists():
+            raise ValidationError({'alias': 'This alias is already in use.'})
+
+    def save(self, *args, **kwargs):
+        from .city_search import normalize_city
+
+        self.alias = (self.alias or '').strip()
+        self.alias_key = normalize_city(self.alias)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.alias} → {self.city}"
+
+
 class Route(models.Model):
     origin = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
+    # Resolved from origin / destination text on save (aliases map to the canonical city)
+    origin_city = models.ForeignKey(
+        City, on_delete=models.PROTECT, null=True, blank=True, related_name='routes_from'
+    )
+    destination_city = models.ForeignKey(
+        City, on_delete=models.PROTECT, null=True, blank=True, related_name='routes_to'
+    )
     distance_km = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -11,6 +75,16 @@ class Route(models.Model):
         unique_together = ('origin', 'destination')
         ordering = ['origin', 'destination']
 
+    def save(self, *args, **kwargs):
+        from .city_search import resolve_city
+
+        self.origin_city = resolve_city(self.origin, create=True)
+        self.destination_city = resolve_city(self.destination, create=True)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'origin_city', 'destination_city'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.origin} → {self.destination}"
 
@@ -42,4 +116,105 @@ class RoutePatternStop(models.Model):
         unique_together = [('pattern', 'order')]
 
     def __str__(self):
-        return f"{self.order}. {self.name}"
\ No newline at end of file
+        return f"{self.order}. {self.name}"
+
+
+class RouteStopPair(models.Model):
+    """
+    Every ordered (boarding stop, alighting stop) pair on a pattern, so sub-route search is one
+    indexed lookup. Rebuilt from RoutePatternStop by common/stop_pairs.py (signals).
+    """
+    pattern = models.ForeignKey(RoutePattern, on_delete=models.CASCADE, related_name='stop_pairs')
+    from_key = models.CharField(max_length=120)   # normalize_city(stop name)
+    to_key = models.CharField(max_length=120)
+    from_order = models.PositiveSmallIntegerField()
+    to_order = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pattern', 'from_order', 'to_order'], name='common_stoppair_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['from_key', 'to_key', 'pattern'], name='common_stoppair_keys_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pattern_id}: {self.from_key} → {self.to_key}"
+
+
+class RouteSearchDay(models.Model):
+    """Schedule searches per route per day (flushed from bookings.popularity search counters)."""
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='search_days')
+    day = models.DateField()
+    searches = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'day'], name='common_routesearchday_route_day_uniq'),
+        ]
+        indexes = [models.Index(fields=['day'], name='common_rsd_day_idx')]
+
+    def __str__(self):
+        return f"{self.route} {self.day}: {self.searches}"
+
+
+class CityPopularity(models.Model):
+    """Nightly rollup: how popular a city is as an origin / destination (autocomplete ranking)."""
+    city = models.OneToOneField(City, on_delete=models.CASCADE, related_name='popularity')
+    origin_score = models.FloatField(default=0)
+    destination_score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'city popularity'
+
+    def __str__(self):
+        return f"{self.city}: {self.origin_score:.1f} / {self.destination_score:.1f}"
+
+
+class CityPairPopularity(models.Model):
+    """Nightly rollup of confirmed bookings + searches per origin → destination city pair."""
+    origin_city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+')
+    destination_city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+')
+    bookings = models.PositiveIntegerField(default=0)
+    searches = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'city pair popularity'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origin_city', 'destination_city'], name='common_citypairpop_pair_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.origin_city} → {self.destination_city}: {self.score:.1f}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a client `Idempotency-Key` (see common/idempotency.py). A row with
+    no status_code is a request still in progress.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and request body: a reused key must send the same request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_json = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='common_idemkey_user_key_uniq'),
+        ]
+        indexes = [models.Index(fields=['created_at'], name='common_idemkey_created_idx')]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status_code or 'in progress'})"
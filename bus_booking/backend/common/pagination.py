@@ -0,0 +1,148 @@
+"""
+Keyset (cursor) pagination.
+
+A page is "rows after the last row of the previous page" in the view's ordering, e.g.
+(departure_dt, id) > (cursor departure_dt, cursor id), so page 50 costs the same index seek
+as page 1 (no OFFSET). The cursor is the last row's ordering values, base64-encoded JSON.
+
+Opt-in per request so existing clients keep receiving plain lists: send `?page_size=` (or a
+`?cursor=` from a previous `next` link) to get {"next": url | null, "results": [...]}.
+Views set `keyset_ordering` (or `get_keyset_ordering()`); the last field must be unique
+(normally id). A leading "-" means descending; NULLs sort last either way.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Full-precision datetimes (DjangoJSONEncoder drops microseconds past milliseconds)."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def keyset_order_by(ordering) -> list:
+    """order_by() arguments for keyset fields (NULLs last, matching the cursor filter)."""
+    out = []
+    for name in ordering:
+        if name.startswith("-"):
+            out.append(F(name[1:]).desc(nulls_last=True))
+        else:
+            out.append(F(name).asc(nulls_last=True))
+    return out
+
+
+def _after_q(model, ordering, values) -> Q:
+    """Rows strictly after `values` in `ordering` (lexicographic, NULLs last)."""
+    after = Q(pk__in=[])
+    equal = Q()
+    for name, value in zip(ordering, values):
+        desc = name.startswith("-")
+        field = name.lstrip("-")
+        nullable = model._meta.get_field(field).null
+        if value is None:
+            # Only NULLs tie with NULL, and nothing non-NULL sorts after it.
+            equal &= Q(**{f"{field}__isnull": True})
+            continue
+        step = Q(**{f"{field}__{'lt' if desc else 'gt'}": value})
+        if nullable:
+            step |= Q(**{f"{field}__isnull": True})
+        after |= equal & step
+        equal &= Q(**{field: value})
+    return after
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("id",)
+
+    def is_requested(self, request) -> bool:
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, "get_keyset_ordering"):
+            return tuple(view.get_keyset_ordering())
+        return tuple(getattr(view, "keyset_ordering", None) or self.ordering)
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj, ordering) -> str:
+        values = [getattr(obj, name.lstrip("-")) for name in ordering]
+        raw = json.dumps(values, cls=_CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, model, ordering, token: str) -> list:
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                None if v is None else model._meta.get_field(name.lstrip("-")).to_python(v)
+                for name, v in zip(ordering, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound("Invalid cursor.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        ordering = self.get_ordering(view)
+        size = self.get_page_size(request)
+        qs = queryset.order_by(*keyset_order_by(ordering))
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            qs = qs.filter(_after_q(queryset.model, ordering, self.decode_cursor(
+                queryset.model, ordering, token
+            )))
+        rows = list(qs[:size + 1])
+        self.next_cursor = (
+            self.encode_cursor(rows[size - 1], ordering) if len(rows) > size else None
+        )
+        return rows[:size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.get_page_size(self.request))
+        return replace_query_param(
+            remove_query_param(url, self.cursor_query_param), self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -2,6 +2,35 @@ from rest_framework import serializers
 from .models import Route, RoutePattern, RoutePatternStop
 
 
+class SparseFieldsetMixin:
+    """
+    Serializer accepting `fields=` (iterable of top-level field names) to drop every other
+    field before serialization, so unrequested nested serializers never run. Subclasses can
+    name presets in `FIELD_VIEWS` ({"card": (...)}) for `fields_from_query()`.
+    """
+
+    FIELD_VIEWS: dict = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def fields_from_query(cls, query_params):
+        """Field names for ?view=<preset> or ?fields=a,b,c (unknown names ignored); None = all."""
+        view = (query_params.get('view') or '').strip().lower()
+        if view in cls.FIELD_VIEWS:
+            return tuple(cls.FIELD_VIEWS[view])
+        raw = (query_params.get('fields') or '').strip()
+        if not raw:
+            return None
+        known = cls.Meta.fields
+        requested = {f.strip() for f in raw.split(',')}
+        return tuple(f for f in known if f in requested) or None
+
+
 class RouteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Route
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .city_index import invalidate_city_index
+from .models import City, CityAlias, Route, RoutePatternStop
+from .stop_pairs import rebuild_stop_pairs
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=CityAlias)
+@receiver(post_delete, sender=CityAlias)
+def city_data_changed(sender, instance, **kwargs):
+    """Cities, aliases and route endpoints feed the in-process city index."""
+    invalidate_city_index()
+
+
+@receiver(post_save, sender=RoutePatternStop)
+@receiver(post_delete, sender=RoutePatternStop)
+def pattern_stops_changed(sender, instance, **kwargs):
+    """Keep the sub-route stop-pair index in step with the pattern's stops."""
+    rebuild_stop_pairs(instance.pattern_id)
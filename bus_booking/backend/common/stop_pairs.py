@@ -0,0 +1,68 @@
+"""
+Stop-pair index for sub-route search.
+
+For each RoutePattern, RouteStopPair holds one row per ordered pair of its stops (i before j)
+with the normalized stop names and their orders. "Krishnagiri → Pondicherry" is then one
+lookup on (from_key, to_key) returning every pattern — and so every schedule — that serves
+both stops in that direction. Rows are rebuilt per pattern whenever its stops change.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+
+from .city_search import normalize_city
+
+
+def rebuild_stop_pairs(pattern_id: int) -> int:
+    """Replace the stop pairs of one pattern from its current stops; returns rows written."""
+    from .models import RoutePatternStop, RouteStopPair
+
+    stops = [
+        (order, normalize_city(name))
+        for order, name in RoutePatternStop.objects.filter(pattern_id=pattern_id)
+        .order_by("order")
+        .values_list("order", "name")
+    ]
+    rows = [
+        RouteStopPair(
+            pattern_id=pattern_id,
+            from_key=from_key,
+            to_key=to_key,
+            from_order=from_order,
+            to_order=to_order,
+        )
+        for i, (from_order, from_key) in enumerate(stops)
+        for to_order, to_key in stops[i + 1:]
+        if from_key and to_key and from_key != to_key
+    ]
+    with transaction.atomic():
+        RouteStopPair.objects.filter(pattern_id=pattern_id).delete()
+        RouteStopPair.objects.bulk_create(rows)
+    return len(rows)
+
+
+def stop_keys(text) -> list[str]:
+    """
+    Normalized spellings to look up for a typed stop name: the text itself plus, when it names
+    a known City, that city's name and aliases ("Bangalore" also finds "Bengaluru" stops).
+    """
+    from .city_search import resolve_city
+
+    key = normalize_city(text)
+    if not key:
+        return []
+    keys = {key}
+    city = resolve_city(text)
+    if city is not None:
+        keys.add(city.name_key)
+        keys.update(city.aliases.values_list("alias_key", flat=True))
+    return sorted(keys)
+
+
+def patterns_serving(from_text, to_text):
+    """RouteStopPair queryset of pattern ids serving from_text → to_text (for `__in=`)."""
+    from .models import RouteStopPair
+
+    return RouteStopPair.objects.filter(
+        from_key__in=stop_keys(from_text), to_key__in=stop_keys(to_text)
+    ).values("pattern_id")
@@ -7,7 +7,7 @@ from rest_framework.permissions import AllowAny
 from django.db.models import Q
 
 from buses.constants import BUS_FEATURE_DEFINITIONS
-from .city_search import city_icontains_q
+from .city_index import get_city_index
 
 class RouteListView(generics.ListAPIView):
     queryset = Route.objects.all()
@@ -18,10 +18,14 @@ class RouteListView(generics.ListAPIView):
         qs = super().get_queryset()
         origin = self.request.query_params.get('from')
         dest = self.request.query_params.get('to')
-        if origin:
-            qs = qs.filter(city_icontains_q("origin", origin))
-        if dest:
-            qs = qs.filter(city_icontains_q("destination", dest))
+        if origin or dest:
+            index = get_city_index()
+            if origin:
+                qs = qs.filter(origin_city_id__in=index.city_ids(origin, pool=index.origins))
+            if dest:
+                qs = qs.filter(
+                    destination_city_id__in=index.city_ids(dest, pool=index.destinations)
+                )
         return qs
 
 
@@ -29,6 +33,7 @@ class RoutePlaceSuggestView(APIView):
     """
     Lightweight city suggestions for autocomplete (distinct names only, no full Route rows).
     GET ?q=B&field=origin|destination&from=Bengaluru (optional, narrows destinations)
+    Served from the in-process city index (prefix, substring, CityAlias, typo-tolerant).
     """
 
     permission_classes = [AllowAny]
@@ -46,16 +51,8 @@ class RoutePlaceSuggestView(APIView):
         if len(q) < 1:
             return Response({"results": []})
 
-        if field == "destination":
-            qs = Route.objects.filter(city_icontains_q("destination", q))
-            if origin_ctx:
-                qs = qs.filter(city_icontains_q("origin", origin_ctx))
-            names = qs.values_list("destination", flat=True).distinct()[:limit]
-        else:
-            qo = city_icontains_q("origin", q)
-            names = Route.objects.filter(qo).values_list("origin", flat=True).distinct()[:limit]
-
-        results = sorted({str(n).strip() for n in names if str(n).strip()}, key=lambda s: s.lower())
+        field = "destination" if field == "destination" else "origin"
+        results = get_city_index().suggest(q, field=field, origin_text=origin_ctx, limit=limit)
         return Response({"results": results})
 
 
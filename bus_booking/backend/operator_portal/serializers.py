@@ -5,9 +5,10 @@ from common.models import Route, RoutePattern
 from decimal import Decimal
 
 from bookings.models import Schedule, BoardingPoint, DroppingPoint, Booking, OperatorSale
-from bookings.pricing import seat_fares_dict_from_schedule
+from bookings.pricing import fare_table, seat_fares_dict_from_schedule
 from bookings.seat_rules import get_occupied_and_seat_genders
 from buses.constants import VALID_FEATURE_IDS
+from buses.layout import compile_layout
 
 OPERATOR_OFFER_STYLES = frozenset(
     {"", "last_minute", "flash_sale", "weekend_special", "festival", "custom"}
@@ -47,10 +48,9 @@ class SeatMapField(serializers.Field):
     """Exposes seat_map_json as seat_map (dict) in API."""
 
     def to_representation(self, value):
-        try:
-            return json.loads(value or "{}")
-        except Exception:
-            return {}
+        if isinstance(value, dict):
+            return value
+        return compile_layout(value or "").data
 
     def to_internal_value(self, data):
         if data is None:
@@ -246,13 +246,6 @@ class OperatorScheduleSerializer(serializers.ModelSerializer):
         occupied, seat_gender = get_occupied_and_seat_genders(obj)
         return [{"label": s, "gender": seat_gender.get(s)} for s in sorted(occupied)]
 
-    @staticmethod
-    def _effective_seat_price(schedule, label: str) -> Decimal:
-        ov = seat_fares_dict_from_schedule(schedule)
-        if label in ov:
-            return Decimal(str(ov[label])).quantize(Decimal("0.01"))
-        return Decimal(str(schedule.fare)).quantize(Decimal("0.01"))
-
     def _assert_occupied_seat_prices_unchanged(self, instance, validated_data, request):
         occupied, _ = get_occupied_and_seat_genders(instance)
         if not occupied:
@@ -262,8 +255,9 @@ class OperatorScheduleSerializer(serializers.ModelSerializer):
             new_ov = self._validate_seat_fares_dict(request.data.get("seat_fares"))
         else:
             new_ov = seat_fares_dict_from_schedule(instance)
+        old_prices = fare_table(instance)
         for label in occupied:
-            old_eff = self._effective_seat_price(instance, label)
+            old_eff = old_prices.price(label)
             new_eff = (
                 Decimal(str(new_ov[label])).quantize(Decimal("0.01"))
                 if label in new_ov
@@ -17,7 +17,9 @@ from bookings.notifications import (
     notify_operator_bulk_schedules_published,
     notify_operator_schedule_published,
 )
+from common.dates import local_day, local_day_range
 from common.models import Route, RoutePattern, RoutePatternStop
+from common.pagination import KeysetPagination
 from common.serializers import RoutePatternSerializer
 
 from .booking_manifest import build_csv_response, build_pdf_response
@@ -84,6 +86,8 @@ class ScheduleListCreateView(generics.ListCreateAPIView):
     """
     permission_classes = [IsAuthenticated, IsOperator]
     serializer_class = OperatorScheduleSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-departure_dt", "-id")
 
     def get_permissions(self):
         perms = [IsAuthenticated(), IsOperator()]
@@ -104,7 +108,9 @@ class ScheduleListCreateView(generics.ListCreateAPIView):
             op = get_operator(request)
             if not op:
                 return Response({"detail": "Operator access required."}, status=403)
-            sched_ids = Schedule.objects.filter(bus__operator=op, departure_dt__date=d).values_list("id", flat=True)
+            sched_ids = Schedule.objects.filter(
+                bus__operator=op, **local_day("departure_dt", d)
+            ).values_list("id", flat=True)
             bookings = Booking.objects.filter(schedule_id__in=sched_ids).select_related(
                 "user", "payment", "schedule", "schedule__route", "boarding_point", "dropping_point"
             ).order_by("schedule__departure_dt", "id")
@@ -144,12 +150,12 @@ class ScheduleListCreateView(generics.ListCreateAPIView):
         if df or dt:
             try:
                 if df:
-                    qs = qs.filter(departure_dt__date__gte=date.fromisoformat(df))
+                    qs = qs.filter(**local_day_range("departure_dt", start=date.fromisoformat(df)))
                 if dt:
-                    qs = qs.filter(departure_dt__date__lte=date.fromisoformat(dt))
+                    qs = qs.filter(**local_day_range("departure_dt", end=date.fromisoformat(dt)))
             except ValueError:
                 pass
-        return qs.order_by("-departure_dt")
+        return qs.order_by("-departure_dt", "-id")
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -382,7 +388,7 @@ class OperatorBookingsExportView(APIView):
                 d = date.fromisoformat(day_raw)
             except ValueError:
                 return Response({"detail": "Invalid date. Use YYYY-MM-DD."}, status=400)
-            sched_ids = Schedule.objects.filter(bus__operator=op, departure_dt__date=d).values_list(
+            sched_ids = Schedule.objects.filter(bus__operator=op, **local_day("departure_dt", d)).values_list(
                 "id", flat=True
             )
             bookings = base_qs.filter(schedule_id__in=sched_ids).order_by(
@@ -408,6 +414,8 @@ class OperatorSalesListView(generics.ListAPIView):
 
     permission_classes = [IsAuthenticated, IsOperator, IsOperatorOpsLead]
     serializer_class = OperatorSaleSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-confirmed_at", "-id")
 
     def get_queryset(self):
         op = get_operator(self.request)
@@ -421,12 +429,12 @@ class OperatorSalesListView(generics.ListAPIView):
         dt = (params.get("date_to") or "").strip()
         if df:
             try:
-                qs = qs.filter(confirmed_at__date__gte=date.fromisoformat(df))
+                qs = qs.filter(**local_day_range("confirmed_at", start=date.fromisoformat(df)))
             except ValueError:
                 pass
         if dt:
             try:
-                qs = qs.filter(confirmed_at__date__lte=date.fromisoformat(dt))
+                qs = qs.filter(**local_day_range("confirmed_at", end=date.fromisoformat(dt)))
             except ValueError:
                 pass
         active_only = (params.get("active_only") or "").strip().lower() in ("1", "true", "yes")
@@ -442,17 +450,19 @@ class OperatorSalesListView(generics.ListAPIView):
             n=Count("id"),
             seats=Sum("seat_count"),
         )
-        ser = self.get_serializer(qs, many=True)
-        return Response(
-            {
-                "summary": {
-                    "active_booking_count": agg["n"] or 0,
-                    "gross_amount": str(agg["total"] or 0),
-                    "seat_count": int(agg["seats"] or 0),
-                },
-                "results": ser.data,
-            }
-        )
+        body = {
+            "summary": {
+                "active_booking_count": agg["n"] or 0,
+                "gross_amount": str(agg["total"] or 0),
+                "seat_count": int(agg["seats"] or 0),
+            },
+        }
+        # Summary always covers the whole filter; ?page_size= / ?cursor= page the lines.
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            body["next"] = self.paginator.get_next_link()
+        body["results"] = self.get_serializer(page if page is not None else qs, many=True).data
+        return Response(body)
 
 
 class OperatorCancelBookingView(APIView):
@@ -802,12 +812,14 @@ class OperatorDashboardStatsView(APIView):
         ).select_related("bus", "route")
 
         today_schedules = list(
-            base_qs.filter(departure_dt__date=summary_date, archived=False).order_by("departure_dt")
+            base_qs.filter(**local_day("departure_dt", summary_date), archived=False)
+            .order_by("departure_dt")
         )
         week_schedules = list(
             base_qs.filter(
-                departure_dt__date__gt=calendar_today,
-                departure_dt__date__lte=week_end,
+                **local_day_range(
+                    "departure_dt", calendar_today + timedelta(days=1), week_end
+                ),
                 archived=False,
             ).order_by("departure_dt")[:20]
         )
@@ -908,17 +920,20 @@ class OperatorDashboardStatsView(APIView):
         # ── revenue aggregates via OperatorSale ───────────────────────────────
         sale_qs = OperatorSale.objects.filter(operator=operator, reversal_status="")
         rev_week = float(
-            sale_qs.filter(confirmed_at__date__gte=calendar_today - timedelta(days=7)).aggregate(t=Sum("gross_amount"))["t"] or 0
+            sale_qs.filter(
+                **local_day_range("confirmed_at", start=calendar_today - timedelta(days=7))
+            ).aggregate(t=Sum("gross_amount"))["t"] or 0
         )
         rev_month = float(
-            sale_qs.filter(confirmed_at__date__gte=month_start).aggregate(t=Sum("gross_amount"))["t"] or 0
+            sale_qs.filter(**local_day_range("confirmed_at", start=month_start)).aggregate(t=Sum("gross_amount"))["t"] or 0
         )
 
         # ── other counts ─────────────────────────────────────────────────────
         pending_count = base_qs.filter(status="PENDING", archived=False).count()
         total_buses = Bus.objects.filter(operator=operator).count()
         active_schedules = base_qs.filter(
-            status="ACTIVE", departure_dt__date__gte=calendar_today, archived=False
+            status="ACTIVE", archived=False,
+            **local_day_range("departure_dt", start=calendar_today),
         ).count()
         trips_active_today = sum(1 for s in today_schedules if s.status == "ACTIVE")
         bookings_today = Booking.objects.filter(